@@ -0,0 +1,1202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks do Sistema de Transcrição
+Mede o desempenho das etapas do pipeline sem alterar o comportamento do transcribe.py
+
+Uso:
+   python benchmark.py extraction video.mp4
+   python benchmark.py upload video.mp4
+   python benchmark.py compact transcricao.json
+   python benchmark.py backends video.mp4 [--backends groq,local]
+   python benchmark.py assembly [--hours 4]
+   python benchmark.py query [--hours 4] [--queries 20000]
+   python benchmark.py keywords [--hours 1,4,16] [--vocab 30,1000,10000]
+   python benchmark.py fastpath video.mp4 [--modes off,opus,copy,auto] [--upload-mbps 20]
+   python benchmark.py importtime [--budget-ms 100]
+   python benchmark.py pipeline [--minutes 12] [--videos 3] [--latency 0.5] [--error-rate 0.05] [--save base.json]
+"""
+
+import os
+import sys
+import json
+import math
+import re
+import difflib
+import time
+import shutil
+import subprocess
+import tempfile
+import random
+import resource
+import threading
+import multiprocessing
+from types import SimpleNamespace
+from typing import Dict, Any, List, Callable, Optional, get_args, get_origin
+
+import transcribe
+
+
+def _print_header(title: str):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+# --- EXTRAÇÃO DE ÁUDIO ---
+
+def extract_per_chunk_baseline(video_path: str, output_dir: str, duration: float) -> List[str]:
+    """Loop antigo: um ffmpeg por pedaço, com -ss depois do -i (decodifica desde o início)"""
+    chunk_paths = []
+    num_chunks = math.ceil(duration / transcribe.CHUNK_DURATION_SECONDS)
+    for i in range(num_chunks):
+        start_time = i * transcribe.CHUNK_DURATION_SECONDS
+        chunk_audio_path = os.path.join(output_dir, f"baseline_chunk_{i + 1}.{transcribe.AUDIO_FORMAT}")
+        subprocess.run([
+            transcribe.FFMPEG_PATH,
+            "-i", video_path,
+            "-ss", str(start_time),
+            "-t", str(transcribe.CHUNK_DURATION_SECONDS),
+            "-vn",
+            "-ar", str(transcribe.AUDIO_SAMPLE_RATE),
+            "-ac", str(transcribe.AUDIO_CHANNELS),
+            "-c:a", transcribe.AUDIO_CODECS.get(transcribe.AUDIO_FORMAT, transcribe.AUDIO_FORMAT),
+            "-y", chunk_audio_path
+        ], check=True, capture_output=True)
+        chunk_paths.append(chunk_audio_path)
+    return chunk_paths
+
+
+def benchmark_extraction(video_path: str) -> Dict[str, Any]:
+    """Compara o loop por pedaço com a extração em passada única"""
+    _print_header(f"EXTRAÇÃO DE ÁUDIO - {os.path.basename(video_path)}")
+
+    duration = transcribe.get_audio_duration(video_path)
+    if duration is None:
+        return {}
+    print(f"🎬 Duração: {duration:.1f}s | Pedaços de {transcribe.CHUNK_DURATION_SECONDS}s | "
+          f"{transcribe.AUDIO_FORMAT} {transcribe.AUDIO_SAMPLE_RATE}Hz {transcribe.AUDIO_CHANNELS}ch")
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_extraction_")
+    try:
+        baseline_dir = os.path.join(work_dir, "baseline")
+        single_dir = os.path.join(work_dir, "single")
+        os.makedirs(baseline_dir)
+        os.makedirs(single_dir)
+
+        started = time.perf_counter()
+        baseline_chunks = extract_per_chunk_baseline(video_path, baseline_dir, duration)
+        results["per_chunk"] = {
+            "seconds": time.perf_counter() - started,
+            "chunks": len(baseline_chunks),
+            "bytes": _dir_size(baseline_dir),
+        }
+
+        started = time.perf_counter()
+        single_chunks = list(transcribe.iter_audio_chunks(video_path, os.path.join(single_dir, "single")))
+        results["single_pass"] = {
+            "seconds": time.perf_counter() - started,
+            "chunks": len(single_chunks),
+            "bytes": _dir_size(single_dir),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for name, data in results.items():
+        realtime = duration / data["seconds"] if data["seconds"] else 0
+        print(f"   • {name:12s} {data['seconds']:8.2f}s  {data['chunks']:3d} pedaço(s)  "
+              f"{data['bytes'] / 1024 / 1024:8.1f} MB  ({realtime:.0f}x tempo real)")
+    speedup = results["per_chunk"]["seconds"] / max(results["single_pass"]["seconds"], 1e-9)
+    print(f"🚀 Ganho da passada única: {speedup:.2f}x")
+    return results
+
+
+# --- UPLOAD DOS PEDAÇOS ---
+
+def _encode_multipart(file_field: Any) -> int:
+    """Monta e consome o corpo multipart exatamente como o cliente HTTP do SDK faria"""
+    import httpx
+
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/audio/transcriptions",
+                            data={"model": transcribe.GROQ_MODEL}, files={"file": file_field})
+    return sum(len(part) for part in request.stream)
+
+
+def _run_upload(mode: str, chunk_path: str, connection: Any):
+    """No processo filho: monta o corpo multipart do pedaço lido inteiro ou por handle"""
+    try:
+        _encode_multipart(("aquecimento.bin", b""))  # httpx importado e inicializado antes da medição
+        rss_before = _current_rss_mb()
+        name = os.path.basename(chunk_path)
+        with open(chunk_path, "rb") as file:
+            _encode_multipart((name, file.read() if mode == "bytes_read" else file))
+        data = {"peak_rss_mb": _peak_rss_mb(), "working_mb": round(_peak_rss_mb() - rss_before, 2)}
+    except Exception as e:
+        data = {"error": f"{type(e).__name__}: {e}"}
+    connection.send(data)
+    connection.close()
+
+
+def benchmark_upload(video_path: str) -> Dict[str, Any]:
+    """
+    Compara o pico de RSS do upload de um pedaço lido inteiro vs. enviado por handle,
+    cada modo em um processo próprio (mesma medição do benchmark de montagem)
+    """
+    _print_header(f"UPLOAD DE PEDAÇO - {os.path.basename(video_path)}")
+
+    results: Dict[str, Any] = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_upload_")
+    try:
+        chunks = list(transcribe.iter_audio_chunks(video_path, os.path.join(work_dir, "upload")))
+        if not chunks:
+            print("❌ Nenhum pedaço extraído")
+            return {}
+        chunk_path = chunks[0].path
+        print(f"🎵 Pedaço: {os.path.getsize(chunk_path) / 1024 / 1024:.1f} MB ({transcribe.AUDIO_FORMAT})")
+        for mode in ("bytes_read", "file_handle"):
+            results[mode] = _run_isolated(_run_upload, mode, chunk_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for mode, data in results.items():
+        if "error" in data:
+            print(f"   ❌ {mode:12s} {data['error']}")
+            continue
+        print(f"   • {mode:12s} pico de RSS {data['peak_rss_mb']:7.1f} MB (+{data['working_mb']:.2f} MB no upload)")
+    if all("error" not in data for data in results.values()):
+        saved = results["bytes_read"]["working_mb"] - results["file_handle"]["working_mb"]
+        print(f"🚀 Economia por pedaço em voo: {saved:.1f} MB de RSS "
+              f"(× MAX_CONCURRENT_CHUNKS={transcribe.MAX_CONCURRENT_CHUNKS})")
+    return results
+
+
+# --- FORMATO COMPACTO ---
+
+def _best_of(fn: Callable[[], Any], repeat: int = 5) -> float:
+    """Menor tempo entre várias execuções (reduz ruído de cache/sistema)"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def benchmark_compact(transcription_path: str) -> Dict[str, Any]:
+    """Compara tamanho e tempo de carregamento do transcricao.json com o .tcol"""
+    _print_header(f"FORMATO COMPACTO - {transcription_path}")
+
+    with open(transcription_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_compact_")
+    try:
+        compact_path = transcribe.save_compact_transcription(data, os.path.join(work_dir, "transcricao.tcol"))
+
+        # Conferir que o conteúdo é o mesmo
+        loaded = transcribe.load_compact_transcription(compact_path)
+        assert loaded.text == data["text"]
+        assert len(loaded.words) == len(data["words"]) and len(loaded.segments) == len(data["segments"])
+        assert all(loaded.words[i] == data["words"][i] for i in range(len(data["words"])))
+        assert all(loaded.segments[i] == data["segments"][i] for i in range(len(data["segments"])))
+
+        def load_json_starts():
+            with open(transcription_path, "r", encoding="utf-8") as f:
+                return [word["start"] for word in json.load(f)["words"]]
+
+        def load_compact_starts():
+            return list(transcribe.load_compact_transcription(compact_path).words.column("start"))
+
+        def load_compact_records():
+            return list(transcribe.load_compact_transcription(compact_path).words)
+
+        results = {
+            "json": {"bytes": os.path.getsize(transcription_path), "load_seconds": _best_of(load_json_starts)},
+            "compact": {"bytes": os.path.getsize(compact_path), "load_seconds": _best_of(load_compact_starts)},
+            "compact_dicts": {"bytes": os.path.getsize(compact_path), "load_seconds": _best_of(load_compact_records)},
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"📄 {len(data['words']):,} palavras, {len(data['segments']):,} segmentos")
+    for label, result in results.items():
+        print(f"   • {label:14s} {result['bytes'] / 1024:8.1f} KB  {result['load_seconds'] * 1000:8.2f} ms")
+    print(f"🚀 Tamanho: {results['json']['bytes'] / results['compact']['bytes']:.1f}x menor | "
+          f"Carregamento (tempos das palavras): "
+          f"{results['json']['load_seconds'] / results['compact']['load_seconds']:.1f}x mais rápido")
+    return results
+
+# --- PIPELINE OFFLINE (APIS SIMULADAS) ---
+
+STUB_WORDS = ["então", "vamos", "criar", "o", "componente", "com", "react", "e", "depois", "rodar",
+              "npm", "install", "para", "instalar", "a", "dependência", "no", "projeto", "api", "rota"]
+STUB_WORDS_PER_SECOND = 2.5
+
+class StubAPIError(Exception):
+    """Erro HTTP simulado, com status_code e Retry-After como os dos SDKs"""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"erro simulado {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class _StubServer:
+    """Latência (com ±20% de variação), erros 5xx e 429 sorteados com semente fixa"""
+
+    def __init__(self, latency: float, error_rate: float, rate_limit_rate: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def respond(self):
+        with self._lock:
+            self.calls += 1
+            draw = self.random.random()
+            jitter = self.random.uniform(0.8, 1.2)
+            if draw < self.rate_limit_rate:
+                self.rate_limited += 1
+                failure = StubAPIError(429, retry_after=round(self.latency, 3))
+            elif draw < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                failure = StubAPIError(503)
+            else:
+                failure = None
+        time.sleep(self.latency * jitter)
+        if failure:
+            raise failure
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+class StubGroq(_StubServer):
+    """
+    Substituto do cliente Groq: consome o upload e devolve um verbose_json sintético.
+    Com upload_mbps, o envio leva o tempo do arquivo nessa banda (além da latência)
+    """
+
+    def __init__(self, *args: Any, upload_mbps: float = 0):
+        super().__init__(*args)
+        self.upload_mbps = upload_mbps
+        self.bytes_received = 0
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.create))
+
+    def create(self, file: Any, **kwargs: Any) -> SimpleNamespace:
+        name, handle = file
+        size = 0
+        while True:
+            block = handle.read(1024 * 1024)
+            if not block:
+                break
+            size += len(block)
+        with self._lock:
+            self.bytes_received += size
+        if self.upload_mbps > 0:
+            time.sleep(size * 8 / (self.upload_mbps * 1_000_000))
+        self.respond()
+        # Como o servidor real, a duração vem do próprio áudio enviado
+        duration = float(subprocess.run(
+            [transcribe.FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", handle.name],
+            capture_output=True, text=True, check=True).stdout.strip())
+        return SimpleNamespace(to_dict=lambda: _stub_transcription(duration))
+
+
+def _stub_transcription(duration: float) -> Dict[str, Any]:
+    """verbose_json sintético no formato da Groq (com tokens e demais campos por segmento)"""
+    step = 1 / STUB_WORDS_PER_SECOND
+    words = [{"word": STUB_WORDS[i % len(STUB_WORDS)], "start": round(i * step, 2), "end": round(i * step + step * 0.8, 2)}
+             for i in range(int(duration * STUB_WORDS_PER_SECOND))]
+    segments = []
+    for start in range(0, len(words), 12):
+        group = words[start:start + 12]
+        segments.append({
+            "id": len(segments), "seek": 0, "start": group[0]["start"], "end": group[-1]["end"],
+            "text": " " + " ".join(word["word"] for word in group), "tokens": list(range(50364, 50364 + 2 * len(group))),
+            "temperature": 0.0, "avg_logprob": -0.2, "compression_ratio": 1.4, "no_speech_prob": 0.01,
+        })
+    return {"task": "transcribe", "language": "portuguese", "duration": duration,
+            "text": "".join(segment["text"] for segment in segments), "segments": segments, "words": words}
+
+
+def _fake_value(annotation: Any, name: str) -> Any:
+    if get_origin(annotation) is list:
+        return [_fake_value(get_args(annotation)[0], name) for _ in range(3)]
+    if hasattr(annotation, "model_fields"):
+        return _fake_instance(annotation)
+    return f"{name} sintético"
+
+
+def _fake_instance(schema: Any) -> Any:
+    """Preenche um schema Pydantic com valores sintéticos (listas com 3 itens)"""
+    return schema(**{name: _fake_value(field.annotation, name) for name, field in schema.model_fields.items()})
+
+
+class StubGemini(_StubServer):
+    """Substituto do cliente Gemini: devolve o schema pedido preenchido e o uso de tokens"""
+
+    def __init__(self, *args: Any):
+        super().__init__(*args)
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model: str, contents: str, config: Any) -> SimpleNamespace:
+        self.respond()
+        parsed = _fake_instance(config.response_schema)
+        text = parsed.model_dump_json()
+        usage = SimpleNamespace(prompt_token_count=len(contents) // 4, candidates_token_count=len(text) // 4,
+                                thoughts_token_count=0, total_token_count=(len(contents) + len(text)) // 4)
+        return SimpleNamespace(parsed=parsed, text=text, usage_metadata=usage)
+
+
+def _make_synthetic_video(path: str, seconds: float, index: int):
+    """
+    Vídeo pequeno com 7s de tom + 3s de silêncio a cada 10s (frequência diferente por vídeo).
+    Só um ciclo de 10s é codificado; o resto é repetido com -c copy (rápido mesmo em CPU fraca)
+    """
+    frequency = 300 + 50 * index
+    unit_path = f"{path}.unit.mp4"
+    subprocess.run([
+        transcribe.FFMPEG_PATH, "-v", "error",
+        "-f", "lavfi", "-i", "color=c=black:s=160x120:r=2",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:sample_rate=16000,volume=0:enable='gte(t,7)'",
+        "-t", "10", "-c:v", "mpeg4", "-c:a", "aac", "-shortest", "-y", unit_path
+    ], check=True)
+    subprocess.run([
+        transcribe.FFMPEG_PATH, "-v", "error", "-stream_loop", "-1", "-i", unit_path,
+        "-t", str(seconds), "-c", "copy", "-y", path
+    ], check=True)
+    os.remove(unit_path)
+
+
+def _peak_rss_mb() -> float:
+    """
+    Pico de RSS deste processo. VmHWM é zerado no exec; o ru_maxrss herdaria o
+    pico do processo pai (fork), mascarando cenários que usam pouca memória
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KB no Linux
+
+
+def _enter_isolated_dir(directory: str, verbose: bool):
+    """No processo filho: silencia a saída e troca para uma pasta própria (temp/, cache e saídas relativos)"""
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+    for name in ("FFMPEG_PATH", "FFPROBE_PATH"):
+        path = getattr(transcribe, name)
+        if os.path.exists(path):
+            setattr(transcribe, name, os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+
+
+def _run_isolated(target: Callable[..., None], *args: Any) -> Dict[str, Any]:
+    """
+    Executa target(*args, conexão) em um interpretador novo (spawn): RSS, estado do
+    módulo e configurações lidas do ambiente no import ficam isolados por execução
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=target, args=args + (sender,))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"error": f"processo terminou com código {process.exitcode}"}
+    process.join()
+    return result
+
+
+def _run_pipeline_scenario(scenario: str, settings: Dict[str, Any], videos_dir: str,
+                           scenario_dir: str, connection: Any):
+    """Roda um cenário em processo próprio (pico de RSS isolado) e envia o resultado pelo pipe"""
+    try:
+        _enter_isolated_dir(scenario_dir, settings["verbose"])
+
+        # APIs simuladas; os limites locais ficam desligados (os 429 vêm do servidor simulado)
+        groq = StubGroq(settings["latency"], settings["error_rate"], settings["rate_limit_rate"], settings["seed"])
+        gemini = StubGemini(settings["gemini_latency"], settings["error_rate"], settings["rate_limit_rate"], settings["seed"])
+        os.environ["GROQ_API_KEY"] = os.environ["GEMINI_API_KEY"] = "benchmark"
+        transcribe.Groq = lambda **kwargs: groq
+        if transcribe.GEMINI_AVAILABLE:
+            transcribe.genai = SimpleNamespace(Client=lambda **kwargs: gemini)
+        transcribe.RATE_LIMITERS = {name: transcribe.RateLimiter(name, {}) for name in transcribe.RATE_LIMITERS}
+        transcribe.RETRY_BASE_DELAY = settings["retry_delay"]
+        transcribe.BATCH_PAUSE_SECONDS = 0
+        transcribe.TRANSCRIPTION_CACHE.bypass = transcribe.ANALYSIS_CACHE.bypass = True
+
+        videos = [str(path) for path in transcribe.find_videos(videos_dir)]
+        since = time.time()
+        started = time.perf_counter()
+        if scenario == "original":
+            succeeded = 0
+            for video in videos:
+                with transcribe.video_metrics(video) as video_record:
+                    result = transcribe.transcribe_video_original(video)
+                    video_record["audio_seconds"] = result["duration"] if result else 0
+                succeeded += result is not None
+        elif scenario == "complete":
+            system = transcribe.EnhancedTranscriptionSystem()
+            results = [system.process_video_complete(video, 1, aula) for aula, video in enumerate(videos, 1)]
+            succeeded = sum(1 for result in results if result.get("status") == "success")
+        else:
+            system = transcribe.EnhancedTranscriptionSystem()
+            results = system.batch_process_videos(videos_dir, 1, jobs=settings["jobs"])
+            succeeded = sum(1 for result in results if result.get("status") == "success")
+        wall = time.perf_counter() - started
+
+        # Os spans de cada vídeo são descartados após o relatório dele; os agregados ficam em METRICS
+        operations = transcribe.METRICS.summary(transcribe.METRICS.select(since=since), rolled=True)
+        audio = operations.get("video", {}).get("audio_seconds", 0)
+        result = {
+            "videos": len(videos),
+            "succeeded": succeeded,
+            "wall_seconds": round(wall, 3),
+            "audio_seconds": round(audio, 3),
+            "realtime_factor": round(audio / wall, 2) if wall else None,
+            "videos_per_minute": round(len(videos) / wall * 60, 2) if wall else None,
+            "peak_rss_mb": _peak_rss_mb(),
+            "api": {"groq": groq.stats(), "gemini": gemini.stats()},
+            "operations": {name: entry["total_seconds"] for name, entry in operations.items()},
+        }
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    connection.send(result)
+    connection.close()
+
+
+def _compare_with_baseline(results: Dict[str, Any], baseline_path: str, tolerance: float) -> bool:
+    """Compara tempo e memória com um resultado salvo; retorna True se houve regressão"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != results["settings"]:
+        print("⚠️  A linha de base foi gerada com outras configurações - comparação apenas indicativa")
+
+    print(f"\n📊 Comparação com {baseline_path} (tolerância {tolerance:.0%}):")
+    regressed = False
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous or "error" in previous or "error" in current:
+            continue
+        for metric in ("wall_seconds", "peak_rss_mb"):
+            before, after = previous[metric], current[metric]
+            change = (after - before) / before if before else 0.0
+            worse = change > tolerance
+            regressed = regressed or worse
+            print(f"   {'❌' if worse else '✅'} {scenario:9s} {metric:14s} {before:9.2f} → {after:9.2f} ({change:+.1%})")
+    return regressed
+
+
+def benchmark_pipeline(*args: str) -> Dict[str, Any]:
+    """
+    Roda transcribe_video_original, process_video_complete e batch_process_videos
+    com vídeos sintéticos e APIs simuladas (sem gastar cota), medindo throughput,
+    fator de tempo real, pico de RSS e tempo por etapa (das métricas do transcribe.py)
+    """
+    args = list(args)
+    verbose = "--verbose" in args
+    if verbose:
+        args.remove("--verbose")
+    settings = {
+        "minutes": float(transcribe._pop_option(args, "--minutes", "12")),
+        "videos": int(transcribe._pop_option(args, "--videos", "3")),
+        "latency": float(transcribe._pop_option(args, "--latency", "0.5")),
+        "gemini_latency": float(transcribe._pop_option(args, "--gemini-latency", "1.0")),
+        "error_rate": float(transcribe._pop_option(args, "--error-rate", "0")),
+        "rate_limit_rate": float(transcribe._pop_option(args, "--rate-limit-rate", "0")),
+        "retry_delay": float(transcribe._pop_option(args, "--retry-delay", "0.2")),
+        "jobs": int(transcribe._pop_option(args, "--jobs", "2")),
+        "seed": int(transcribe._pop_option(args, "--seed", "42")),
+        "chunk_seconds": transcribe.CHUNK_DURATION_SECONDS,
+        "max_concurrent_chunks": transcribe.MAX_CONCURRENT_CHUNKS,
+    }
+    scenarios = transcribe._pop_option(args, "--scenarios", "original,complete,batch").split(",")
+    baseline_path = transcribe._pop_option(args, "--baseline")
+    save_path = transcribe._pop_option(args, "--save")
+    tolerance = float(transcribe._pop_option(args, "--tolerance", "0.2"))
+    unknown = [s for s in scenarios if s not in ("original", "complete", "batch")]
+    if unknown or args:
+        print(f"❌ Argumento(s) inválido(s): {' '.join(unknown + args)}")
+        sys.exit(1)
+
+    _print_header(f"PIPELINE OFFLINE - {settings['videos']} vídeo(s) de {settings['minutes']:g} min")
+    print(f"🧪 Latência Groq {settings['latency']}s | Gemini {settings['gemini_latency']}s | "
+          f"erros {settings['error_rate']:.0%} | 429 {settings['rate_limit_rate']:.0%} | "
+          f"pedaços de {settings['chunk_seconds']}s × {settings['max_concurrent_chunks']} | jobs {settings['jobs']}")
+    settings["verbose"] = verbose
+
+    results: Dict[str, Any] = {"settings": {k: v for k, v in settings.items() if k != "verbose"}, "scenarios": {}}
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        videos_dir = os.path.join(work_dir, "videos")
+        os.makedirs(videos_dir)
+        started = time.perf_counter()
+        for i in range(settings["videos"]):
+            _make_synthetic_video(os.path.join(videos_dir, f"aula-{i + 1:02d}-sintetica.mp4"),
+                                  settings["minutes"] * 60, i)
+        print(f"🎬 Vídeos sintéticos gerados em {time.perf_counter() - started:.1f}s")
+
+        for scenario in scenarios:
+            results["scenarios"][scenario] = _run_isolated(
+                _run_pipeline_scenario, scenario, settings, videos_dir, os.path.join(work_dir, scenario))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for scenario, data in results["scenarios"].items():
+        if "error" in data:
+            print(f"   ❌ {scenario:9s} {data['error']}")
+            continue
+        api = data["api"]
+        print(f"   • {scenario:9s} {data['wall_seconds']:8.2f}s  {data['audio_seconds'] / 60:6.1f} min de áudio  "
+              f"{data['realtime_factor'] or 0:7.1f}x tempo real  {data['videos_per_minute'] or 0:6.2f} vídeos/min  "
+              f"RSS {data['peak_rss_mb']:.0f} MB  "
+              f"{data['succeeded']}/{data['videos']} ok")
+        print(f"     API: Groq {api['groq']['calls']} chamada(s), {api['groq']['errors']} erro(s), "
+              f"{api['groq']['rate_limited']} 429 | Gemini {api['gemini']['calls']} chamada(s), "
+              f"{api['gemini']['errors']} erro(s), {api['gemini']['rate_limited']} 429")
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in data["operations"].items()
+                           if name not in ("video", "batch"))
+        print(f"     Tempo por operação (soma): {stages}")
+
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultado salvo em: {save_path}")
+    if baseline_path and _compare_with_baseline(results, baseline_path, tolerance):
+        print("❌ Regressão de desempenho acima da tolerância")
+        sys.exit(1)
+    if any("error" in data for data in results["scenarios"].values()):
+        sys.exit(1)
+    return results
+
+# --- MONTAGEM DA TRANSCRIÇÃO ---
+
+def _current_rss_mb() -> float:
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def _assemble_in_memory_baseline(checkpoint_path: str, video_path: str, lesson_dir: str):
+    """Montagem anterior: todos os registros na memória, JSON com indent=2 gravado duas vezes"""
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f.readlines()[1:]]
+    all_segments, total_words, duration = [], [], 0.0
+    for record in sorted(records, key=lambda r: r["number"]):
+        all_segments.extend(record["segments"])
+        total_words.extend(record["words"])
+        duration += record["duration"]
+    full_text = " ".join([word["word"] for word in total_words])
+    result = {"text": full_text.strip(), "segments": all_segments, "words": total_words,
+              "duration": duration, "metadata": {"original_file": video_path}}
+    with open(transcribe._video_temp_path(video_path, "transcription.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    lesson_data = {"text": result["text"], "segments": list(result["segments"]), "words": list(result["words"]),
+                   "duration": duration, "metadata": result["metadata"]}
+    with open(os.path.join(lesson_dir, "transcricao.json"), "w", encoding="utf-8") as f:
+        json.dump(lesson_data, f, ensure_ascii=False, indent=2)
+    return result["text"]
+
+
+def _assemble_streaming(checkpoint_path: str, video_path: str, lesson_dir: str):
+    """Montagem atual: merge_transcription lendo o checkpoint pedaço a pedaço + gravação registro a registro"""
+    checkpoint = transcribe.ChunkCheckpoint(checkpoint_path, "benchmark")
+    checkpoint.load()
+    data = transcribe.merge_transcription(video_path, checkpoint, len(checkpoint.completed))
+    transcription = transcribe.TranscriptionResult(text=data["text"], segments=data["segments"], words=data["words"],
+                                                   duration=data["duration"], metadata=data["metadata"])
+    transcribe.write_transcription_file(os.path.join(lesson_dir, "transcricao.json"), transcription)
+    return transcription.text
+
+
+def _run_assembly(mode: str, checkpoint_path: str, work_dir: str, verbose: bool, connection: Any):
+    try:
+        _enter_isolated_dir(work_dir, verbose)
+        transcribe.TRANSCRIPTION_CACHE.enabled = False
+        os.makedirs(transcribe.TEMP_DIR, exist_ok=True)
+        lesson_dir = os.path.join(work_dir, "aula")
+        os.makedirs(lesson_dir)
+        video_path = os.path.join(work_dir, "aula-longa.mp4")
+        assemble = _assemble_in_memory_baseline if mode == "baseline" else _assemble_streaming
+        rss_before = _current_rss_mb()
+        started = time.perf_counter()
+        text = assemble(checkpoint_path, video_path, lesson_dir)
+        # O README também embute o texto completo
+        with open(os.path.join(lesson_dir, "README.md"), "w", encoding="utf-8") as f:
+            f.write(f"# Aula\n\n<details>\n\n{text}\n\n</details>\n")
+        wall = time.perf_counter() - started
+        written = sum(os.path.getsize(os.path.join(directory, name))
+                      for directory in (transcribe.TEMP_DIR, lesson_dir) for name in os.listdir(directory))
+        data = {
+            "wall_seconds": round(wall, 3),
+            "peak_rss_mb": _peak_rss_mb(),
+            "working_mb": round(_peak_rss_mb() - rss_before, 1),
+            "bytes_written": written,
+        }
+    except Exception as e:
+        data = {"error": f"{type(e).__name__}: {e}"}
+    connection.send(data)
+    connection.close()
+
+
+def benchmark_assembly(*args: str) -> Dict[str, Any]:
+    """
+    Compara a montagem da transcrição final de uma gravação longa (checkpoint sintético
+    com pedaços de CHUNK_SIZE_SECONDS): montagem em memória com JSON indent=2 vs. a
+    atual, em streaming e com os campos dispensáveis removidos na ingestão
+    """
+    args = list(args)
+    verbose = "--verbose" in args
+    if verbose:
+        args.remove("--verbose")
+    hours = float(transcribe._pop_option(args, "--hours", "4"))
+    if args:
+        print(f"❌ Argumento(s) inválido(s): {' '.join(args)}")
+        sys.exit(1)
+
+    chunk_seconds = transcribe.CHUNK_DURATION_SECONDS
+    num_chunks = math.ceil(hours * 3600 / chunk_seconds)
+    _print_header(f"MONTAGEM DA TRANSCRIÇÃO - {hours:g} h ({num_chunks} pedaços de {chunk_seconds}s)")
+
+    results: Dict[str, Any] = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_assembly_")
+    try:
+        # Checkpoints sintéticos: verbose_json completo (como antes) e com os campos reduzidos na ingestão
+        paths = {"baseline": os.path.join(work_dir, "checkpoint_full.jsonl"),
+                 "streaming": os.path.join(work_dir, "checkpoint.jsonl")}
+        for mode, path in paths.items():
+            transcribe.TRANSCRIPT_FULL_SEGMENTS = mode == "baseline"
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"type": "header", "video_key": "benchmark"}) + "\n")
+                for number in range(1, num_chunks + 1):
+                    start = (number - 1) * chunk_seconds
+                    chunk = transcribe.AudioChunk(number=number, start=start, end=start + chunk_seconds, path="")
+                    record = transcribe._chunk_record(chunk, _stub_transcription(chunk_seconds))
+                    f.write(json.dumps(dict(record, type="chunk"), ensure_ascii=False) + "\n")
+        transcribe.TRANSCRIPT_FULL_SEGMENTS = False
+        print(f"🧪 Checkpoint: {os.path.getsize(paths['baseline']) / 1024 / 1024:.1f} MB completo, "
+              f"{os.path.getsize(paths['streaming']) / 1024 / 1024:.1f} MB reduzido na ingestão")
+
+        for mode, path in paths.items():
+            results[mode] = _run_isolated(_run_assembly, mode, path, os.path.join(work_dir, mode), verbose)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for mode, data in results.items():
+        if "error" in data:
+            print(f"   ❌ {mode:9s} {data['error']}")
+            continue
+        print(f"   • {mode:9s} {data['wall_seconds']:7.2f}s  pico de RSS {data['peak_rss_mb']:7.1f} MB "
+              f"(+{data['working_mb']:.1f} MB na montagem)  {data['bytes_written'] / 1024 / 1024:7.1f} MB gravados")
+    if all("error" not in data for data in results.values()):
+        baseline, streaming = results["baseline"], results["streaming"]
+        print(f"🚀 Memória da montagem: {baseline['working_mb'] / max(streaming['working_mb'], 0.1):.1f}x menor | "
+              f"gravação: {baseline['bytes_written'] / max(streaming['bytes_written'], 1):.1f}x menos bytes | "
+              f"tempo: {baseline['wall_seconds'] / max(streaming['wall_seconds'], 1e-9):.2f}x")
+    return results
+
+
+# --- CONSULTA POR TEMPO ---
+
+def _linear_words_between(words: List[Dict[str, Any]], start: float, end: float) -> List[Dict[str, Any]]:
+    """Consulta de antes: percorre a lista inteira de words"""
+    return [word for word in words if word["start"] < end and (word["end"] > start or word["start"] >= start)]
+
+
+def benchmark_query(*args: str) -> Dict[str, Any]:
+    """
+    Compara consultas por tempo em uma aula longa sintética: transcricao.json
+    carregado inteiro + varredura linear vs. TranscriptReader (busca binária)
+    sobre o JSON e sobre o .tcol mapeado em memória
+    """
+    args = list(args)
+    hours = float(transcribe._pop_option(args, "--hours", "4"))
+    queries = int(transcribe._pop_option(args, "--queries", "20000"))
+    seed = int(transcribe._pop_option(args, "--seed", "42"))
+    if args:
+        print(f"❌ Argumento(s) inválido(s): {' '.join(args)}")
+        sys.exit(1)
+
+    duration = hours * 3600
+    _print_header(f"CONSULTA POR TEMPO - aula de {hours:g} h, {queries:,} consultas")
+    data = _stub_transcription(duration)
+    rng = random.Random(seed)
+    ranges = []
+    for _ in range(queries):
+        start = rng.uniform(0, duration)
+        ranges.append((start, start + rng.uniform(2, 30)))  # Trechos de clipes e legendas
+    frames = [i / 30 for i in range(int(min(duration, queries / 30) * 30))]  # Legenda a 30 quadros/s
+
+    results: Dict[str, Any] = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_query_")
+    try:
+        json_path = os.path.join(work_dir, "transcricao.json")
+        transcribe.write_transcription_file(json_path, transcribe.TranscriptionResult(
+            text=data["text"], segments=data["segments"], words=data["words"], duration=duration, metadata={}))
+        compact_path = transcribe.save_compact_transcription(data, os.path.join(work_dir, "transcricao.tcol"))
+        os.utime(json_path, ns=(0, 0))  # .tcol mais recente que o .json: o leitor usa o sidecar
+        print(f"📄 {len(data['words']):,} palavras, {len(data['segments']):,} segmentos | "
+              f"JSON {os.path.getsize(json_path) / 1024 / 1024:.1f} MB, .tcol {os.path.getsize(compact_path) / 1024 / 1024:.1f} MB")
+
+        # Antes: carregar o JSON inteiro e varrer a lista (amostra menor; o custo por consulta é o mesmo)
+        started = time.perf_counter()
+        with open(json_path, "r", encoding="utf-8") as f:
+            words = json.load(f)["words"]
+        open_seconds = time.perf_counter() - started
+        sample = ranges[:max(1, min(queries, 200))]
+        started = time.perf_counter()
+        expected = [_linear_words_between(words, start, end) for start, end in sample]
+        results["linear"] = {"open_seconds": open_seconds,
+                             "range_per_second": len(sample) / (time.perf_counter() - started)}
+
+        readers = {"reader_json": os.path.join(work_dir, "transcricao.json.lido"), "reader_tcol": json_path}
+        os.link(json_path, readers["reader_json"])  # Sem extensão .json: o sidecar não é usado
+        for label, path in readers.items():
+            started = time.perf_counter()
+            reader = transcribe.TranscriptReader(path)
+            open_seconds = time.perf_counter() - started
+            assert reader.path.endswith(".tcol") == (label == "reader_tcol")
+            assert [reader.words_between(start, end) for start, end in sample] == expected
+            started = time.perf_counter()
+            for start, end in ranges:
+                reader.words_between(start, end)
+            range_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            reader.segments_at(frames)
+            frame_seconds = time.perf_counter() - started
+            results[label] = {"open_seconds": open_seconds, "range_per_second": len(ranges) / range_seconds,
+                              "frames_per_second": len(frames) / frame_seconds if frames else 0.0}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for label, result in results.items():
+        frames_text = f"  {result['frames_per_second']:>12,.0f} quadros/s" if "frames_per_second" in result else ""
+        print(f"   • {label:12s} abrir {result['open_seconds'] * 1000:8.1f} ms  "
+              f"{result['range_per_second']:>10,.0f} intervalos/s{frames_text}")
+    linear, compact = results["linear"], results["reader_tcol"]
+    print(f"🚀 Intervalos: {compact['range_per_second'] / linear['range_per_second']:,.0f}x mais rápido | "
+          f"abrir: {linear['open_seconds'] / max(compact['open_seconds'], 1e-9):.1f}x mais rápido (.tcol)")
+    return results
+
+
+# --- ANÁLISE BÁSICA (VOCABULÁRIO) ---
+
+def _synthetic_vocabulary(size: int) -> Dict[str, Any]:
+    """Vocabulário padrão + termos sintéticos (1/4 com duas palavras, 1/10 comandos)"""
+    technologies = dict(transcribe.DEFAULT_TECH_KEYWORDS)
+    commands = list(transcribe.DEFAULT_COMMAND_PREFIXES)
+    for i in range(max(0, size - len(technologies))):
+        term = f"framework tec{i}" if i % 4 == 0 else f"tec{i}"
+        technologies[term] = term.title()
+        if i % 10 == 0:
+            commands.append(f"cli{i}")
+    return {"tecnologias": technologies, "comandos": commands}
+
+
+def _scan_per_keyword_baseline(text: str, vocabulary: Dict[str, Any]) -> Dict[str, Any]:
+    """Análise básica anterior: uma busca de substring por tecnologia e um re.findall por comando"""
+    text = text.lower()
+    techs = [name for keyword, name in vocabulary["tecnologias"].items() if keyword in text]
+    commands = []
+    for command in vocabulary["comandos"]:
+        commands.extend(re.findall(rf"{re.escape(command)}\s+\w+", text)[:3])
+    return {"tecnologias": techs, "comandos": commands}
+
+
+def benchmark_keywords(*args: str) -> Dict[str, Any]:
+    """
+    Tempo da análise básica por tamanho de texto e de vocabulário: uma busca por
+    termo (custo cresce com texto × vocabulário) vs. o KeywordScanner em uma passada
+    """
+    args = list(args)
+    hours_list = [float(value) for value in transcribe._pop_option(args, "--hours", "1,4,16").split(",")]
+    sizes = [int(value) for value in transcribe._pop_option(args, "--vocab", "30,1000,10000").split(",")]
+    if args:
+        print(f"❌ Argumento(s) inválido(s): {' '.join(args)}")
+        sys.exit(1)
+
+    _print_header(f"ANÁLISE BÁSICA - textos de {', '.join(f'{h:g}' for h in hours_list)} h, "
+                  f"vocabulários de {', '.join(str(size) for size in sizes)} termos")
+    transcriptions = {}
+    for hours in hours_list:
+        data = _stub_transcription(hours * 3600)
+        transcriptions[hours] = transcribe.TranscriptionResult(
+            text=data["text"], segments=data["segments"], words=data["words"], duration=hours * 3600, metadata={})
+
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        vocabulary = _synthetic_vocabulary(size)
+        started = time.perf_counter()
+        scanner = transcribe.KeywordScanner(vocabulary["tecnologias"], vocabulary["comandos"])
+        build_seconds = time.perf_counter() - started
+        print(f"\n📚 {scanner.size:,} termos (trie montada em {build_seconds * 1000:.1f} ms)")
+        for hours, transcription in transcriptions.items():
+            baseline = _best_of(lambda: _scan_per_keyword_baseline(transcription.text, vocabulary), repeat=1)
+            scan = _best_of(lambda: scanner.scan(transcribe._timed_tokens(transcription)), repeat=3)
+            found = scanner.scan(transcribe._timed_tokens(transcription))
+            words = len(transcription.words)
+            results[f"{size}/{hours:g}"] = {"terms": scanner.size, "hours": hours, "words": words,
+                                            "baseline_seconds": baseline, "scan_seconds": scan}
+            print(f"   • {hours:5g} h ({words:>7,} palavras)  por termo {baseline * 1000:9.1f} ms  "
+                  f"passada única {scan * 1000:8.1f} ms ({words / scan / 1e6:.2f} M palavras/s)  "
+                  f"{len(found['tecnologias'])} tecnologias, {len(found['comandos'])} comandos")
+
+    # Linear no texto: palavras/s estável entre os tamanhos; independente do vocabulário: mesmo tempo por palavra
+    rates = [result["words"] / result["scan_seconds"] for result in results.values()]
+    print(f"\n🚀 Passada única: {min(rates) / 1e6:.2f}-{max(rates) / 1e6:.2f} M palavras/s em todos os "
+          f"tamanhos de texto e vocabulário (variação de {max(rates) / min(rates):.2f}x)")
+    return results
+
+
+# --- BACKENDS DE TRANSCRIÇÃO ---
+
+def _normalized_words(words: List[str]) -> List[str]:
+    return [word.strip(".,!?;:\"'()").lower() for word in words if word.strip()]
+
+
+def _run_backend(video_path: str, work_dir: str, verbose: bool, connection: Any):
+    """Transcreve o vídeo com o TRANSCRIBE_BACKEND herdado do ambiente, sem cache"""
+    try:
+        _enter_isolated_dir(work_dir, verbose)
+        transcribe.TRANSCRIPTION_CACHE.bypass = True
+        since = time.time()
+        started = time.perf_counter()
+        result = transcribe.transcribe_video_original(video_path)
+        wall = time.perf_counter() - started
+        if transcribe._LOCAL_CLIENT is not None:
+            transcribe._LOCAL_CLIENT.shutdown()
+
+        summary = transcribe.METRICS.summary(transcribe.METRICS.select(since=since))
+        failed = sum(entry["errors"] for name, entry in summary.items() if name.endswith(".transcribe"))
+        if result is None or failed:
+            data = {"error": f"transcrição falhou ({failed} pedaço(s) com erro)"}
+        else:
+            data = {
+                "wall_seconds": round(wall, 3),
+                "audio_seconds": round(result["duration"], 3),
+                "realtime_factor": round(result["duration"] / wall, 2) if wall else None,
+                "words": [word["word"] for word in result["words"]],
+                "operations": {name: entry["total_seconds"] for name, entry in summary.items()},
+            }
+    except Exception as e:
+        data = {"error": f"{type(e).__name__}: {e}"}
+    connection.send(data)
+    connection.close()
+
+
+def benchmark_backends(video_path: str, *args: str) -> Dict[str, Any]:
+    """
+    Compara a transcrição pela API da Groq com o faster-whisper local no mesmo vídeo:
+    tempo de parede (incluindo o carregamento do modelo local), fator de tempo real
+    e semelhança entre os textos. Usa a API de verdade (GROQ_API_KEY) quando groq é medido
+    """
+    args = list(args)
+    verbose = "--verbose" in args
+    if verbose:
+        args.remove("--verbose")
+    backends = transcribe._pop_option(args, "--backends", "groq,local").split(",")
+    _print_header(f"BACKENDS DE TRANSCRIÇÃO - {os.path.basename(video_path)}")
+    workers, threads = transcribe.local_whisper_layout()
+    print(f"🖥️  Local: {transcribe.LOCAL_WHISPER_MODEL} ({transcribe.LOCAL_WHISPER_COMPUTE_TYPE}), "
+          f"{workers} processo(s) × {threads} thread(s) | Groq: {transcribe.GROQ_MODEL}")
+
+    results: Dict[str, Any] = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_backends_")
+    previous = os.environ.get("TRANSCRIBE_BACKEND")
+    try:
+        for backend in backends:
+            # O backend é lido do ambiente no import do transcribe.py, dentro do processo filho
+            os.environ["TRANSCRIBE_BACKEND"] = backend
+            results[backend] = _run_isolated(_run_backend, os.path.abspath(video_path),
+                                             os.path.join(work_dir, backend), verbose)
+    finally:
+        if previous is None:
+            os.environ.pop("TRANSCRIBE_BACKEND", None)
+        else:
+            os.environ["TRANSCRIBE_BACKEND"] = previous
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for backend, data in results.items():
+        if "error" in data:
+            print(f"   ❌ {backend:6s} {data['error']}")
+            continue
+        operations = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in data["operations"].items()
+                               if name != "video")
+        print(f"   • {backend:6s} {data['wall_seconds']:8.2f}s  {data['audio_seconds'] / 60:6.1f} min de áudio  "
+              f"{data['realtime_factor'] or 0:7.1f}x tempo real  {len(data['words']):,} palavras")
+        print(f"     Tempo por operação (soma): {operations}")
+
+    measured = [backend for backend, data in results.items() if "error" not in data]
+    if len(measured) == 2:
+        first, second = (results[backend] for backend in measured)
+        speedup = first["wall_seconds"] / max(second["wall_seconds"], 1e-9)
+        similarity = difflib.SequenceMatcher(None, _normalized_words(first["words"]),
+                                             _normalized_words(second["words"]), autojunk=False).ratio()
+        print(f"🚀 {measured[1]} vs {measured[0]}: {speedup:.2f}x | Semelhança das palavras: {similarity:.1%}")
+    return results
+
+
+# --- CAMINHO RÁPIDO DO ÁUDIO ---
+
+FAST_PATH_MODES = ("off", "opus", "copy", "auto")
+
+
+def _run_fast_path(video_path: str, work_dir: str, settings: Dict[str, Any], connection: Any):
+    """
+    Mede um AUDIO_FAST_PATH (herdado do ambiente): primeiro só a extração (tempo e
+    CPU do ffmpeg, bytes gerados), depois a transcrição completa com a Groq simulada
+    """
+    try:
+        _enter_isolated_dir(work_dir, settings["verbose"])
+        media = transcribe.probe_media(video_path)
+        encoding = transcribe.choose_audio_encoding(media)
+
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        started = time.perf_counter()
+        chunks = list(transcribe.iter_audio_chunks(video_path, os.path.join(work_dir, "encode"), None, encoding))
+        encode_seconds = time.perf_counter() - started
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        sizes = [os.path.getsize(chunk.path) for chunk in chunks]
+        for chunk in chunks:
+            os.remove(chunk.path)
+
+        groq = StubGroq(settings["latency"], 0, 0, 42, upload_mbps=settings["upload_mbps"])
+        os.environ["GROQ_API_KEY"] = "benchmark"
+        transcribe.Groq = lambda **kwargs: groq
+        transcribe.RATE_LIMITERS = {name: transcribe.RateLimiter(name, {}) for name in transcribe.RATE_LIMITERS}
+        transcribe.TRANSCRIPTION_CACHE.bypass = True
+        started = time.perf_counter()
+        result = transcribe.transcribe_video_original(video_path)
+        end_to_end = time.perf_counter() - started
+        data = {
+            "mode": encoding.mode,
+            "extension": encoding.extension,
+            "chunk_seconds": encoding.chunk_seconds,
+            "chunks": len(chunks),
+            "encode_seconds": round(encode_seconds, 3),
+            "encode_cpu_seconds": round(after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime, 3),
+            "upload_bytes": sum(sizes),
+            "max_chunk_bytes": max(sizes, default=0),
+            "end_to_end_seconds": round(end_to_end, 3) if result else None,
+            "uploaded_bytes": groq.bytes_received,
+        }
+    except Exception as e:
+        data = {"error": f"{type(e).__name__}: {e}"}
+    connection.send(data)
+    connection.close()
+
+
+def benchmark_fast_path(video_path: str, *args: str) -> Dict[str, Any]:
+    """
+    Compara os modos de AUDIO_FAST_PATH no mesmo vídeo: tempo e CPU da codificação,
+    bytes enviados, maior pedaço (vs. GROQ_MAX_UPLOAD_MB) e latência ponta a ponta
+    com a Groq simulada (latência fixa + tempo de upload na banda informada)
+    """
+    args = list(args)
+    verbose = "--verbose" in args
+    if verbose:
+        args.remove("--verbose")
+    modes = transcribe._pop_option(args, "--modes", ",".join(FAST_PATH_MODES)).split(",")
+    settings = {
+        "latency": float(transcribe._pop_option(args, "--latency", "0.5")),
+        "upload_mbps": float(transcribe._pop_option(args, "--upload-mbps", "20")),
+        "verbose": verbose,
+    }
+    unknown = [mode for mode in modes if mode not in FAST_PATH_MODES]
+    if unknown or args:
+        print(f"❌ Argumento(s) inválido(s): {' '.join(unknown + args)}")
+        sys.exit(1)
+
+    _print_header(f"CAMINHO RÁPIDO DO ÁUDIO - {os.path.basename(video_path)}")
+    media = transcribe.probe_media(video_path)
+    if media is None:
+        return {}
+    print(f"🎬 {media.duration:.1f}s | áudio {media.audio_codec} {media.sample_rate}Hz {media.channels}ch "
+          f"{(media.audio_bit_rate or 0) // 1000} kbps | limite {transcribe.GROQ_MAX_UPLOAD_MB:g} MB | "
+          f"upload {settings['upload_mbps']:g} Mbps + {settings['latency']}s por chamada")
+
+    results: Dict[str, Any] = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_fastpath_")
+    previous = os.environ.get("AUDIO_FAST_PATH")
+    try:
+        for mode in modes:
+            # O modo é lido do ambiente no import do transcribe.py, dentro do processo filho
+            os.environ["AUDIO_FAST_PATH"] = mode
+            results[mode] = _run_isolated(_run_fast_path, os.path.abspath(video_path),
+                                          os.path.join(work_dir, mode), settings)
+    finally:
+        if previous is None:
+            os.environ.pop("AUDIO_FAST_PATH", None)
+        else:
+            os.environ["AUDIO_FAST_PATH"] = previous
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    limit = transcribe.GROQ_MAX_UPLOAD_MB * 1024 * 1024
+    for mode, data in results.items():
+        if "error" in data:
+            print(f"   ❌ {mode:5s} {data['error']}")
+            continue
+        end_to_end = f"{data['end_to_end_seconds']:8.2f}s" if data["end_to_end_seconds"] is not None else "   falhou"
+        print(f"   • {mode:5s} → {data['mode']:6s} .{data['extension']:4s} {data['chunks']:3d} × {data['chunk_seconds']:4d}s  "
+              f"codificação {data['encode_seconds']:7.2f}s (CPU {data['encode_cpu_seconds']:7.2f}s)  "
+              f"{data['upload_bytes'] / 1024 / 1024:8.1f} MB  maior {data['max_chunk_bytes'] / 1024 / 1024:6.1f} MB"
+              f"{' ⚠️' if data['max_chunk_bytes'] > limit else ''}  ponta a ponta {end_to_end}")
+    measured = {mode: data for mode, data in results.items() if "error" not in data and data["end_to_end_seconds"]}
+    if "off" in measured and len(measured) > 1:
+        reference = measured["off"]
+        for mode, data in measured.items():
+            if mode != "off":
+                print(f"🚀 {mode} vs off: {reference['end_to_end_seconds'] / data['end_to_end_seconds']:.2f}x ponta a ponta, "
+                      f"{reference['upload_bytes'] / max(data['upload_bytes'], 1):.1f}x menos bytes")
+    return results
+
+
+# --- TEMPO DE INICIALIZAÇÃO ---
+
+# SDKs que só podem ser importados quando uma etapa realmente chama a API
+HEAVY_MODULES = ("google.genai", "pydantic", "groq", "httpx", "faster_whisper")
+
+IMPORTTIME_CASES = {
+    # nome: argumentos do python (com -X importtime)
+    "import": ["-c", "import transcribe"],
+    "help": ["transcribe.py", "--help"],
+    "only-render": ["transcribe.py", "--complete", "inexistente.mp4", "--only", "render"],
+}
+
+
+def _parse_importtime(stderr: str) -> Dict[str, Any]:
+    """Soma o tempo cumulativo dos imports de primeiro nível e lista os módulos carregados"""
+    total_us = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # Cabeçalho
+        module = name.strip()
+        modules[module] = int(cumulative)
+        if not name.startswith("  "):  # Nível 0: um espaço depois do "|"
+            total_us += int(cumulative)
+    return {"total_ms": total_us / 1000, "modules": modules}
+
+
+def benchmark_importtime(*args: str) -> Dict[str, Any]:
+    """
+    Orçamento de inicialização: mede com python -X importtime o custo dos imports de
+    "import transcribe", da ajuda e do --only render (descontando o próprio interpretador)
+    e falha se passar do orçamento ou se algum SDK pesado for importado
+    """
+    args = list(args)
+    budget_ms = float(transcribe._pop_option(args, "--budget-ms", "100"))
+    runs = int(transcribe._pop_option(args, "--runs", "5"))
+    if args:
+        print(f"❌ Argumento(s) inválido(s): {' '.join(args)}")
+        sys.exit(1)
+    _print_header(f"TEMPO DE INICIALIZAÇÃO (orçamento: {budget_ms:.0f} ms)")
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    # Chaves fictícias: setup_apis segue o caminho "configurado", que não pode criar clientes.
+    # O .pyc precisa ser gravado na primeira execução, senão toda medição inclui a compilação
+    env = dict(os.environ, GROQ_API_KEY="benchmark", GEMINI_API_KEY="benchmark")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    def measure(python_args: List[str]) -> Dict[str, Any]:
+        best = None
+        for _ in range(runs + 1):
+            started = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-X", "importtime", *python_args],
+                                       cwd=root, env=env, capture_output=True, text=True)
+            parsed = _parse_importtime(completed.stderr)
+            parsed["wall_ms"] = (time.perf_counter() - started) * 1000
+            if best is None or parsed["total_ms"] < best["total_ms"]:
+                best = parsed
+            best["wall_ms"] = min(best["wall_ms"], parsed["wall_ms"])
+        return best
+
+    interpreter = measure(["-c", "pass"])
+    results = {}
+    failed = False
+    for case, python_args in IMPORTTIME_CASES.items():
+        measured = measure(python_args)
+        own_modules = {name: us for name, us in measured["modules"].items() if name not in interpreter["modules"]}
+        heavy = sorted(name for name in own_modules if name.split(".")[0] in HEAVY_MODULES
+                       or any(name == heavy or name.startswith(f"{heavy}.") for heavy in HEAVY_MODULES))
+        cost_ms = measured["total_ms"] - interpreter["total_ms"]
+        # Processo inteiro: inclui executar o módulo e compilar o script principal (nunca há .pyc dele)
+        wall_ms = measured["wall_ms"] - interpreter["wall_ms"]
+        slowest = sorted(own_modules.items(), key=lambda item: item[1], reverse=True)[:5]
+        results[case] = {"import_ms": round(cost_ms, 1), "wall_ms": round(wall_ms, 1),
+                         "modules": len(own_modules), "heavy_modules": heavy}
+
+        ok = cost_ms <= budget_ms and not heavy
+        failed = failed or not ok
+        print(f"   {'✅' if ok else '❌'} {case:12s} imports {cost_ms:7.1f} ms | processo +{wall_ms:6.1f} ms | "
+              f"{len(own_modules):4d} módulo(s)")
+        print(f"      Mais lentos: {', '.join(f'{name} {us / 1000:.1f} ms' for name, us in slowest)}")
+        if heavy:
+            print(f"      SDKs importados cedo demais: {', '.join(heavy[:5])}")
+
+    print(f"🐍 Interpretador sozinho: {interpreter['wall_ms']:.1f} ms (descontado)")
+    if failed:
+        print("❌ Inicialização acima do orçamento")
+        sys.exit(1)
+    return results
+
+
+BENCHMARKS = {
+    # nome: (função, argumentos obrigatórios, uso)
+    "extraction": (benchmark_extraction, 1, "extraction <video>"),
+    "upload": (benchmark_upload, 1, "upload <video>"),
+    "compact": (benchmark_compact, 1, "compact <transcricao.json>"),
+    "backends": (benchmark_backends, 1, "backends <video> [--backends groq,local] [--verbose]"),
+    "assembly": (benchmark_assembly, 0, "assembly [--hours 4] [--verbose]"),
+    "query": (benchmark_query, 0, "query [--hours 4] [--queries 20000] [--seed 42]"),
+    "keywords": (benchmark_keywords, 0, "keywords [--hours 1,4,16] [--vocab 30,1000,10000]"),
+    "fastpath": (benchmark_fast_path, 1, "fastpath <video> [--modes off,opus,copy,auto] [--upload-mbps 20] "
+                 "[--latency 0.5] [--verbose]"),
+    "importtime": (benchmark_importtime, 0, "importtime [--budget-ms 100] [--runs 5]"),
+    "pipeline": (benchmark_pipeline, 0, "pipeline [--minutes 12] [--videos 3] [--latency 0.5] [--gemini-latency 1.0] "
+                 "[--error-rate 0] [--rate-limit-rate 0] [--retry-delay 0.2] [--jobs 2] [--seed 42] "
+                 "[--scenarios original,complete,batch] [--save arquivo.json] [--baseline arquivo.json] "
+                 "[--tolerance 0.2] [--verbose]"),
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Uso:")
+        for _, _, usage in BENCHMARKS.values():
+            print(f"   python benchmark.py {usage}")
+        sys.exit(1)
+
+    benchmark, required_args, usage = BENCHMARKS[sys.argv[1]]
+    args = sys.argv[2:]
+    if len(args) < required_args:
+        print(f"Uso: python benchmark.py {usage}")
+        sys.exit(1)
+    benchmark(*args)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,38 +16,98 @@ import subprocess
 import math
 import time
 import re
+import csv
+import hashlib
+import threading
+import contextvars
+import random
+import bisect
+import shutil
+import queue
+import select
+import signal
+import ctypes
+import ctypes.util
+import mmap
+import struct
+import importlib.util
+import unicodedata
+from array import array
+from collections import deque
+from collections.abc import Sequence
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
-
-# Importações condicionais para não quebrar o sistema se não tiver as dependências
-try:
-    from google import genai
-    from google.genai import types
-    from pydantic import BaseModel, Field
-    from typing import List, Dict, Optional
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed, wait
+
+# Dependências opcionais: só verifica se estão instaladas. Os SDKs custam centenas de ms
+# no import e são carregados sob demanda (_gemini_sdk, _gemini_types, _groq_class), então
+# a ajuda, o modo --only render e processos de vida curta não pagam esse custo
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:  # Pacote pai ausente (ex.: "google")
+        return False
+
+GEMINI_AVAILABLE = _module_available("google.genai") and _module_available("pydantic")
+if not GEMINI_AVAILABLE:
     print("⚠️  Google Gemini não instalado. Funcionalidades de análise desabilitadas.")
     print("   Para instalar: pip install google-genai pydantic")
 
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
-    print("❌ Groq não instalado. Sistema de transcrição não funcionará.")
-    sys.exit(1)
+NUMPY_AVAILABLE = _module_available("numpy")  # Opcional: deduplicação por impressão digital do áudio
+
+GROQ_AVAILABLE = _module_available("groq")
+if not GROQ_AVAILABLE:
+    print("⚠️  Groq não instalado. Transcrição pela API desabilitada (TRANSCRIBE_BACKEND=local continua disponível).")
+    print("   Para instalar: pip install groq")
+
+genai: Any = None  # google.genai
+types: Any = None  # google.genai.types
+Groq: Any = None  # groq.Groq
+_SDK_LOCK = threading.Lock()
+
+def _gemini_sdk() -> Any:
+    global genai
+    with _SDK_LOCK:
+        if genai is None:
+            from google import genai as sdk
+            genai = sdk
+    return genai
+
+def _gemini_types() -> Any:
+    global types
+    with _SDK_LOCK:
+        if types is None:
+            from google.genai import types as sdk_types
+            types = sdk_types
+    return types
+
+def _groq_class() -> Any:
+    global Groq
+    with _SDK_LOCK:
+        if Groq is None:
+            from groq import Groq as client_class
+            Groq = client_class
+    return Groq
 
 # --- CONFIGURAÇÕES DINÂMICAS ---
 # Todas as configurações podem ser alteradas via variáveis de ambiente
 
 # Configurações de Transcrição
+TRANSCRIBE_BACKEND = os.environ.get("TRANSCRIBE_BACKEND", "groq").lower()  # groq (API) ou local (faster-whisper)
 CHUNK_DURATION_SECONDS = int(os.environ.get("CHUNK_SIZE_SECONDS", "600"))  # 10 minutos padrão
 GROQ_MODEL = os.environ.get("GROQ_MODEL", "whisper-large-v3-turbo")
 GROQ_LANGUAGE = os.environ.get("GROQ_LANGUAGE", "pt")
+MAX_CONCURRENT_CHUNKS = max(1, int(os.environ.get("MAX_CONCURRENT_CHUNKS", "3")))  # Pedaços enviados em paralelo
+BATCH_PAUSE_SECONDS = int(os.environ.get("BATCH_PAUSE_SECONDS", "3"))  # Pausa entre vídeos no lote sequencial
+
+# Backend local (TRANSCRIBE_BACKEND=local): faster-whisper/CTranslate2 na CPU, um modelo por processo
+LOCAL_WHISPER_MODEL = os.environ.get("LOCAL_WHISPER_MODEL", "large-v3-turbo")
+LOCAL_WHISPER_COMPUTE_TYPE = os.environ.get("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+LOCAL_WHISPER_WORKERS = int(os.environ.get("LOCAL_WHISPER_WORKERS", "0"))  # 0 = um processo a cada 4 núcleos
+LOCAL_WHISPER_BEAM_SIZE = int(os.environ.get("LOCAL_WHISPER_BEAM_SIZE", "5"))
 
 # Configurações de Sistema
 REQUEST_TIMEOUT = int(os.environ.get("REQUEST_TIMEOUT", "300"))  # 5 minutos
@@ -61,12 +121,81 @@ FFPROBE_PATH = os.environ.get("FFPROBE_PATH", "./bin/ffprobe")
 TEMP_DIR = os.environ.get("TEMP_DIR_NAME", "temp")
 OUTPUT_BASE_DIR = os.environ.get("OUTPUT_BASE_DIR", "modulo-{modulo:02d}")
 VIDEOS_DIR = os.environ.get("VIDEOS_DIR", "videos")
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v']
+
+# Modo --watch (monitoramento contínuo da pasta de vídeos)
+WATCH_STABLE_SECONDS = float(os.environ.get("WATCH_STABLE_SECONDS", "10"))  # Sem mudanças por N s = cópia concluída
+WATCH_POLL_SECONDS = float(os.environ.get("WATCH_POLL_SECONDS", "5"))  # Intervalo do fallback por varredura
+WATCH_QUEUE_SIZE = max(1, int(os.environ.get("WATCH_QUEUE_SIZE", "20")))  # Vídeos estáveis aguardando processamento
+WATCH_POLLING = os.environ.get("WATCH_POLLING", "false").lower() == "true"  # Forçar varredura (ex.: pastas de rede)
+
+# Limites de Taxa das APIs (0 = sem limite; os da Groq são opcionais, o 429 já é tratado em call_api)
+GROQ_REQUESTS_PER_MINUTE = float(os.environ.get("GROQ_REQUESTS_PER_MINUTE", "0"))
+GROQ_AUDIO_SECONDS_PER_HOUR = float(os.environ.get("GROQ_AUDIO_SECONDS_PER_HOUR", "0"))
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "10"))
+GEMINI_TOKENS_PER_MINUTE = float(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "250000"))
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", "2"))  # Segundos
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", "60"))  # Segundos
+GROQ_PRICE_PER_HOUR = float(os.environ.get("GROQ_PRICE_PER_HOUR", "0.04"))  # US$ por hora de áudio (estimativa do lote)
+
+# Configurações de Cache
+CACHE_ENABLED = os.environ.get("CACHE_ENABLED", "true").lower() == "true"
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(TEMP_DIR, "cache"))
+CACHE_MAX_SIZE_MB = int(os.environ.get("CACHE_MAX_SIZE_MB", "2048"))  # 2 GB
+CACHE_MAX_AGE_DAYS = int(os.environ.get("CACHE_MAX_AGE_DAYS", "90"))
 
 # Configurações de Áudio
 AUDIO_SAMPLE_RATE = int(os.environ.get("AUDIO_SAMPLE_RATE", "16000"))
 AUDIO_CHANNELS = int(os.environ.get("AUDIO_CHANNELS", "1"))
 AUDIO_FORMAT = os.environ.get("AUDIO_FORMAT", "flac")
 
+# Caminho rápido do áudio dos pedaços: "off" sempre recodifica para AUDIO_FORMAT; "opus" grava
+# Opus de baixo bitrate; "copy" copia a faixa original quando o codec é aceito pela API;
+# "auto" copia quando possível e usa Opus nos demais casos
+AUDIO_FAST_PATH = os.environ.get("AUDIO_FAST_PATH", "off").lower()
+GROQ_MAX_UPLOAD_MB = float(os.environ.get("GROQ_MAX_UPLOAD_MB", "25"))  # Limite por arquivo enviado
+AUDIO_OPUS_KBPS = int(os.environ.get("AUDIO_OPUS_KBPS", "24"))  # Bitrate do Opus (fast path opus/auto)
+
+# Divisão em pedaços: "fixed" corta a cada CHUNK_SIZE_SECONDS; "silence" procura
+# um silêncio perto do corte para não partir palavras ao meio
+CHUNK_STRATEGY = os.environ.get("CHUNK_STRATEGY", "fixed").lower()
+SILENCE_NOISE_DB = float(os.environ.get("SILENCE_NOISE_DB", "-35"))  # Abaixo disso é silêncio
+SILENCE_MIN_SECONDS = float(os.environ.get("SILENCE_MIN_SECONDS", "0.5"))  # Duração mínima de um silêncio
+SILENCE_SEARCH_WINDOW = float(os.environ.get("SILENCE_SEARCH_WINDOW", "60"))  # Busca até N s antes do corte
+SILENCE_DROP_SECONDS = float(os.environ.get("SILENCE_DROP_SECONDS", "0"))  # Remove silêncios maiores (0 = não remove)
+
+# Encoder do ffmpeg para cada AUDIO_FORMAT (o nome do formato nem sempre é o do encoder)
+AUDIO_CODECS = {"flac": "flac", "wav": "pcm_s16le", "mp3": "libmp3lame", "m4a": "aac"}
+
+# Codecs que a API aceita sem recodificar, com o contêiner (extensão) usado nos pedaços copiados
+STREAM_COPY_CONTAINERS = {"aac": "m4a", "mp3": "mp3", "opus": "ogg", "vorbis": "ogg", "flac": "flac"}
+
+# Formato compacto (colunar) salvo ao lado do transcricao.json
+COMPACT_TRANSCRIPT = os.environ.get("COMPACT_TRANSCRIPT", "false").lower() == "true"
+
+# Campos mantidos em cada segmento; tokens, seek, temperature e compression_ratio são
+# descartados ao receber o pedaço (TRANSCRIPT_FULL_SEGMENTS=true mantém o verbose_json inteiro)
+TRANSCRIPT_FULL_SEGMENTS = os.environ.get("TRANSCRIPT_FULL_SEGMENTS", "false").lower() == "true"
+SEGMENT_FIELDS = ("id", "start", "end", "text", "avg_logprob", "no_speech_prob")
+
+# Índice de busca nas transcrições das aulas (--index / --search)
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", os.path.join(TEMP_DIR, "busca.sqlite"))
+SEARCH_INDEX_AUTO = os.environ.get("SEARCH_INDEX_AUTO", "true").lower() == "true"  # Indexa cada aula salva
+
+# Deduplicação de vídeos pelo áudio (requer numpy)
+AUDIO_DEDUP = os.environ.get("AUDIO_DEDUP", "true").lower() == "true"
+AUDIO_DEDUP_MAX_DISTANCE = float(os.environ.get("AUDIO_DEDUP_MAX_DISTANCE", "0.25"))  # Fração de bits diferentes
+AUDIO_DEDUP_MAX_OFFSET = float(os.environ.get("AUDIO_DEDUP_MAX_OFFSET", "10"))  # Segundos cortados/acrescentados no início
+FINGERPRINT_DIR = os.environ.get("FINGERPRINT_DIR", os.path.join(TEMP_DIR, "fingerprints"))
+
+# Análise básica (sem Gemini)
+KEYWORD_VOCABULARY_FILE = os.environ.get("KEYWORD_VOCABULARY_FILE", "")  # JSON com tecnologias e comandos extras
+
+# Instrumentação (relatórios de tempo/throughput por vídeo e por lote)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(TEMP_DIR, "metrics"))
+METRICS_PROMETHEUS_FILE = os.environ.get("METRICS_PROMETHEUS_FILE", "")  # Vazio = não gerar
+
 # Padrões de Diretório
 AULA_DIR_PATTERN = os.environ.get("AULA_DIR_PATTERN", "aula-{numero:02d}-{slug}")
 
@@ -79,28 +208,96 @@ class TranscriptionResult:
     duration: float
     metadata: Dict[str, Any]
 
+class TimelineMap:
+    """
+    Mapeia tempos do áudio enviado à API (sem os silêncios removidos) de volta
+    para a linha do tempo original do vídeo.
+    """
+
+    def __init__(self, keep_ranges: List[Tuple[float, float]]):
+        self.keep_ranges = keep_ranges
+        self.sent_starts = []
+        elapsed = 0.0
+        for start, end in keep_ranges:
+            self.sent_starts.append(elapsed)
+            elapsed += end - start
+        self.sent_duration = elapsed
+
+    def to_original(self, t: float) -> float:
+        i = max(0, bisect.bisect_right(self.sent_starts, t) - 1)
+        return self.keep_ranges[i][0] + (t - self.sent_starts[i])
+
+    def to_sent(self, t: float) -> float:
+        """Tempo original → tempo no áudio enviado (trechos removidos colapsam no ponto de junção)"""
+        for (start, end), sent_start in zip(self.keep_ranges, self.sent_starts):
+            if t < start:
+                return sent_start
+            if t <= end:
+                return sent_start + (t - start)
+        return self.sent_duration
+
+@dataclass
+class ChunkPlan:
+    """Plano de corte do áudio: pontos de corte e trechos mantidos"""
+    cut_points: List[float]  # Na linha do tempo do áudio enviado
+    timeline: Optional[TimelineMap] = None  # None = nenhum trecho removido
+    sent_duration: float = 0.0
+
+@dataclass
+class AudioChunk:
+    """Pedaço de áudio extraído do vídeo"""
+    number: int
+    start: float
+    end: float
+    path: str
+    cache_key: Optional[str] = None
+
 # --- MODELOS PYDANTIC PARA STRUCTURED OUTPUT ---
-if GEMINI_AVAILABLE:
-    class Conceito(BaseModel):
-        conceito: str = Field(description="Nome do conceito técnico")
-        definicao: str = Field(description="Explicação clara e concisa do conceito")
-
-    class AnalysisSchema(BaseModel):
-        titulo_sugerido: str = Field(description="Título descritivo e profissional da aula")
-        resumo_executivo: str = Field(description="Resumo conciso em 2-3 parágrafos sobre o conteúdo principal")
-        pontos_chave: List[str] = Field(description="Lista de 3-5 pontos mais importantes da aula", min_items=3, max_items=5)
-        tecnologias_mencionadas: List[str] = Field(description="Tecnologias, frameworks, ferramentas mencionadas")
-        comandos_codigo: List[str] = Field(description="Comandos de terminal, código ou scripts mencionados")
-        conceitos_importantes: List[Conceito] = Field(description="Conceitos técnicos importantes explicados na aula")
-        nivel_dificuldade: str = Field(description="Nível de dificuldade: básico, intermediário ou avançado")
-        duracao_estimada: str = Field(description="Duração estimada da aula em minutos")
-        pre_requisitos: List[str] = Field(description="Conhecimentos prévios necessários")
-        objetivos_aprendizado: List[str] = Field(description="O que o aluno aprenderá ao final da aula")
-        tags: List[str] = Field(description="Tags relevantes para categorização e busca")
+# Definidos no primeiro uso por load_analysis_schemas(): só a análise com Gemini precisa do pydantic
+Conceito: Any = None
+AnalysisSchema: Any = None
+PartialAnalysisSchema: Any = None
+
+def load_analysis_schemas():
+    """Define os schemas do structured output (uma vez, em qualquer thread)"""
+    global Conceito, AnalysisSchema, PartialAnalysisSchema
+    with _SDK_LOCK:
+        if AnalysisSchema is not None:
+            return
+        from pydantic import BaseModel, Field
+
+        class Conceito(BaseModel):
+            conceito: str = Field(description="Nome do conceito técnico")
+            definicao: str = Field(description="Explicação clara e concisa do conceito")
+
+        class AnalysisSchema(BaseModel):
+            titulo_sugerido: str = Field(description="Título descritivo e profissional da aula")
+            resumo_executivo: str = Field(description="Resumo conciso em 2-3 parágrafos sobre o conteúdo principal")
+            pontos_chave: List[str] = Field(description="Lista de 3-5 pontos mais importantes da aula", min_items=3, max_items=5)
+            tecnologias_mencionadas: List[str] = Field(description="Tecnologias, frameworks, ferramentas mencionadas")
+            comandos_codigo: List[str] = Field(description="Comandos de terminal, código ou scripts mencionados")
+            conceitos_importantes: List[Conceito] = Field(description="Conceitos técnicos importantes explicados na aula")
+            nivel_dificuldade: str = Field(description="Nível de dificuldade: básico, intermediário ou avançado")
+            duracao_estimada: str = Field(description="Duração estimada da aula em minutos")
+            pre_requisitos: List[str] = Field(description="Conhecimentos prévios necessários")
+            objetivos_aprendizado: List[str] = Field(description="O que o aluno aprenderá ao final da aula")
+            tags: List[str] = Field(description="Tags relevantes para categorização e busca")
         
-        class Config:
-            title = "Análise de Aula Técnica"
-            description = "Estrutura completa de análise de conteúdo educacional técnico"
+            class Config:
+                title = "Análise de Aula Técnica"
+                description = "Estrutura completa de análise de conteúdo educacional técnico"
+
+        class PartialAnalysisSchema(BaseModel):
+            resumo_trecho: str = Field(description="Resumo objetivo do que é ensinado neste trecho da aula")
+            topicos: List[str] = Field(description="Tópicos abordados no trecho, na ordem em que aparecem")
+            tecnologias_mencionadas: List[str] = Field(description="Tecnologias, frameworks, ferramentas mencionadas no trecho")
+            comandos_codigo: List[str] = Field(description="Comandos de terminal, código ou scripts mencionados no trecho")
+            conceitos_importantes: List[Conceito] = Field(description="Conceitos técnicos explicados no trecho")
+            pre_requisitos: List[str] = Field(description="Conhecimentos prévios que o trecho pressupõe")
+
+            class Config:
+                title = "Análise Parcial de Trecho de Aula"
+                description = "Notas estruturadas de um trecho da transcrição, combinadas depois na análise final"
 
 @dataclass
 class AnalysisResult:
@@ -117,6 +314,63 @@ class AnalysisResult:
     objetivos_aprendizado: List[str]
     tags: List[str]
 
+# --- EXECUÇÃO CONCORRENTE ---
+
+# Prefixo das linhas impressas pela tarefa atual (usado no lote paralelo)
+_LOG_PREFIX: contextvars.ContextVar[str] = contextvars.ContextVar("log_prefix", default="")
+
+class _PrefixedOutput:
+    """
+    Substitui o stdout durante o lote paralelo: cada linha recebe o prefixo do
+    vídeo que a imprimiu e é escrita inteira, sem se misturar com outras threads.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._pending: Dict[int, str] = {}
+
+    def write(self, text: str) -> int:
+        thread_id = threading.get_ident()
+        lines = (self._pending.pop(thread_id, "") + text).split("\n")
+        if lines[-1]:
+            self._pending[thread_id] = lines[-1]
+        if len(lines) > 1:
+            prefix = _LOG_PREFIX.get()
+            with self._lock:
+                self.stream.write("".join(f"{prefix}{line}\n" for line in lines[:-1]))
+                self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+_CHUNK_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_CHUNK_EXECUTOR_LOCK = threading.Lock()
+
+def _chunk_concurrency() -> int:
+    """Pedaços em voo: no backend local, pelo menos um por processo do pool"""
+    if TRANSCRIBE_BACKEND == "local":
+        return max(MAX_CONCURRENT_CHUNKS, local_whisper_layout()[0])
+    return MAX_CONCURRENT_CHUNKS
+
+def _chunk_executor() -> ThreadPoolExecutor:
+    """Pool de transcrição de pedaços, compartilhado por todos os vídeos em processamento"""
+    global _CHUNK_EXECUTOR
+    with _CHUNK_EXECUTOR_LOCK:
+        if _CHUNK_EXECUTOR is None:
+            _CHUNK_EXECUTOR = ThreadPoolExecutor(max_workers=_chunk_concurrency(),
+                                                 thread_name_prefix="chunk")
+        return _CHUNK_EXECUTOR
+
+def _submit(executor: ThreadPoolExecutor, fn, *args, **kwargs) -> Future:
+    """Submete uma tarefa preservando o contexto atual (ex.: prefixo de log do vídeo)"""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
 # --- FUNÇÕES DE DEBUG ---
 
 def debug_print(message: str):
@@ -141,177 +395,2982 @@ def save_debug_file(content: Any, filename: str):
         
         debug_print(f"Debug file saved: {debug_path}")
 
-# --- FUNÇÕES ORIGINAIS MANTIDAS ---
+# --- INSTRUMENTAÇÃO ---
 
-def get_audio_duration(file_path: str) -> Optional[float]:
+# Vídeo e operação (span) atuais da tarefa; propagados aos pools via _submit
+_CURRENT_VIDEO: contextvars.ContextVar[str] = contextvars.ContextVar("current_video", default="")
+_CURRENT_SPAN: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("current_span", default=None)
+
+# Atributos somados no resumo de cada operação
+METRIC_COUNTERS = ("bytes_in", "bytes_out", "audio_seconds", "retries", "tokens_in", "tokens_out")
+# Durações guardadas por operação (p50/p95) depois que os spans de um vídeo são descartados
+METRIC_SAMPLES = 1000
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil por posição mais próxima (lista já ordenada)"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+class Metrics:
     """
-    Obtém a duração de um arquivo de mídia usando ffprobe.
-    FUNÇÃO ORIGINAL MANTIDA INTACTA COM CONFIGURAÇÕES DINÂMICAS
+    Coletor de spans: cada operação externa ou etapa vira um registro com tempo
+    de parede e atributos (bytes, segundos de áudio, tentativas, tokens), marcado
+    com o vídeo atual. Gera relatórios JSON/JSONL e texto no formato do Prometheus.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        # Agregados dos vídeos já relatados no processo (release): o modo --watch não acumula spans
+        self.rolled: Dict[str, Dict[str, Any]] = {}
+        self.rolled_videos: set = set()
+        self._lock = threading.Lock()
+
+    def start(self, name: str, **attrs: Any) -> Dict[str, Any]:
+        record = dict(attrs, name=name, video=_CURRENT_VIDEO.get(), started_at=time.time())
+        record["_started"] = time.perf_counter()
+        return record
+
+    def finish(self, record: Optional[Dict[str, Any]], **attrs: Any):
+        if record is None or "_started" not in record:
+            return
+        record.update(attrs)
+        record["seconds"] = round(time.perf_counter() - record.pop("_started"), 6)
+        with self._lock:
+            self.records.append(record)
+
+    def add(self, name: str, seconds: float, **attrs: Any):
+        """Registra uma operação já medida"""
+        record = dict(attrs, name=name, video=_CURRENT_VIDEO.get(), started_at=time.time() - seconds,
+                      seconds=round(seconds, 6))
+        with self._lock:
+            self.records.append(record)
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Mede o bloco; o dict retornado aceita atributos extras (ex.: tokens)"""
+        record = self.start(name, **attrs)
+        token = _CURRENT_SPAN.set(record)
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            _CURRENT_SPAN.reset(token)
+            self.finish(record)
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        return _CURRENT_SPAN.get()
+
+    def select(self, video: Optional[str] = None, since: float = 0.0) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [r for r in self.records
+                    if (video is None or r["video"] == video) and r["started_at"] >= since]
+
+    @staticmethod
+    def _fold(totals: Dict[str, Dict[str, Any]], record: Dict[str, Any], max_samples: Optional[int] = None):
+        """Soma um span ao agregado da sua operação (durações limitadas a max_samples)"""
+        entry = totals.get(record["name"])
+        if entry is None:
+            entry = totals[record["name"]] = {"count": 0, "errors": 0, "total_seconds": 0.0,
+                                              "max_seconds": 0.0, "samples": deque(maxlen=max_samples)}
+        entry["count"] += 1
+        entry["errors"] += 1 if record.get("error") else 0
+        entry["total_seconds"] += record["seconds"]
+        entry["max_seconds"] = max(entry["max_seconds"], record["seconds"])
+        entry["samples"].append(record["seconds"])
+        for counter in METRIC_COUNTERS:
+            if record.get(counter):
+                entry[counter] = entry.get(counter, 0) + record[counter]
+
+    def release(self, video: str, since: float = 0.0):
+        """
+        Descarta os spans do vídeo (o relatório dele já foi gravado), mantendo só os
+        agregados por operação usados nos relatórios de lote/sessão e no Prometheus.
+        """
+        with self._lock:
+            kept = []
+            for record in self.records:
+                if record["video"] == video and record["started_at"] >= since:
+                    self._fold(self.rolled, record, METRIC_SAMPLES)
+                else:
+                    kept.append(record)
+            self.records = kept
+            self.rolled_videos.add(video)
+
+    def _totals(self, records: List[Dict[str, Any]], rolled: bool) -> Dict[str, Dict[str, Any]]:
+        totals: Dict[str, Dict[str, Any]] = {}
+        if rolled:
+            with self._lock:
+                for name, entry in self.rolled.items():
+                    totals[name] = dict(entry, samples=deque(entry["samples"]))
+        for record in records:
+            self._fold(totals, record)
+        return totals
+
+    def summary(self, records: List[Dict[str, Any]], rolled: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Por operação: contagem, tempo total, p50/p95/máx e soma dos contadores.
+        Com rolled, inclui os vídeos já descartados (p50/p95 sobre as últimas METRIC_SAMPLES durações).
+        """
+        summary = {}
+        for name, entry in sorted(self._totals(records, rolled).items()):
+            seconds = sorted(entry["samples"])
+            item = {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "total_seconds": round(entry["total_seconds"], 3),
+                "p50_seconds": round(_percentile(seconds, 0.5), 3),
+                "p95_seconds": round(_percentile(seconds, 0.95), 3),
+                "max_seconds": round(entry["max_seconds"], 3),
+            }
+            for counter in METRIC_COUNTERS:
+                if entry.get(counter):
+                    item[counter] = round(entry[counter], 3)
+            summary[name] = item
+        return summary
+
+    def report(self, records: List[Dict[str, Any]], label: str, rolled: bool = False) -> Dict[str, Any]:
+        """Relatório de um vídeo ("video"), lote ("batch") ou sessão ("watch"), com fator de tempo real"""
+        operations = self.summary(records, rolled)
+        wall = sum(r["seconds"] for r in records if r["name"] == label) or \
+            sum(entry["total_seconds"] for name, entry in operations.items() if name.startswith("stage."))
+        audio = operations.get("video", {}).get("audio_seconds", 0)
+        videos = {r["video"] for r in records if r["video"]}
+        if rolled:
+            with self._lock:
+                videos |= self.rolled_videos
+        return {
+            "label": label,
+            "generated_at": datetime.now().isoformat(),
+            "videos": sorted(videos),
+            "wall_seconds": round(wall, 3),
+            "audio_seconds": round(audio, 3),
+            "realtime_factor": round(audio / wall, 2) if wall else None,
+            "operations": operations,
+        }
+
+    def write_report(self, records: List[Dict[str, Any]], label: str, name: str,
+                     rolled: bool = False) -> Optional[str]:
+        """
+        Grava {name}_report.json (resumo) e {name}_spans.jsonl (um span por linha) em METRICS_DIR.
+        Os spans de vídeos já descartados ficam só no {video}_spans.jsonl de cada um.
+        """
+        if not METRICS_ENABLED or not (records or rolled and self.rolled):
+            return None
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        report_path = os.path.join(METRICS_DIR, f"{name}_report.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(records, label, rolled), f, ensure_ascii=False, indent=2)
+        with open(os.path.join(METRICS_DIR, f"{name}_spans.jsonl"), "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return report_path
+
+    def prometheus(self, records: List[Dict[str, Any]], rolled: bool = False) -> str:
+        """Resumo no formato texto do Prometheus (para o textfile collector do node_exporter)"""
+        summary = self.summary(records, rolled)
+        lines = [
+            "# HELP transcribe_operation_seconds Tempo de parede por operação",
+            "# TYPE transcribe_operation_seconds summary",
+        ]
+        for name, entry in summary.items():
+            lines.append(f'transcribe_operation_seconds{{operation="{name}",quantile="0.5"}} {entry["p50_seconds"]}')
+            lines.append(f'transcribe_operation_seconds{{operation="{name}",quantile="0.95"}} {entry["p95_seconds"]}')
+            lines.append(f'transcribe_operation_seconds_sum{{operation="{name}"}} {entry["total_seconds"]}')
+            lines.append(f'transcribe_operation_seconds_count{{operation="{name}"}} {entry["count"]}')
+        for metric in ("errors",) + METRIC_COUNTERS:
+            lines.append(f"# TYPE transcribe_{metric}_total counter")
+            for name, entry in summary.items():
+                if entry.get(metric):
+                    lines.append(f'transcribe_{metric}_total{{operation="{name}"}} {entry[metric]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, records: List[Dict[str, Any]], rolled: bool = False) -> Optional[str]:
+        if not METRICS_PROMETHEUS_FILE or not (records or rolled and self.rolled):
+            return None
+        os.makedirs(os.path.dirname(METRICS_PROMETHEUS_FILE) or ".", exist_ok=True)
+        tmp_path = f"{METRICS_PROMETHEUS_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus(records, rolled))
+        os.replace(tmp_path, METRICS_PROMETHEUS_FILE)
+        return METRICS_PROMETHEUS_FILE
+
+METRICS = Metrics()
+
+def _print_run_report(report_path: Optional[str], records: List[Dict[str, Any]], label: str,
+                      rolled: bool = False):
+    report = METRICS.report(records, label, rolled)
+    if report["audio_seconds"] and report["realtime_factor"]:
+        print(f"⏱️  {report['wall_seconds']:.1f}s para {report['audio_seconds'] / 60:.1f} min de áudio "
+              f"({report['realtime_factor']:.1f}x tempo real)")
+    if report_path:
+        print(f"📈 Relatório de desempenho: {report_path}")
+
+@contextmanager
+def video_metrics(video_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Marca as operações do bloco com o vídeo e grava o relatório dele ao final.
+    O chamador preenche audio_seconds no registro retornado (fator de tempo real).
+    """
+    file_name, _ = os.path.splitext(os.path.basename(video_path))
+    token = _CURRENT_VIDEO.set(file_name)
+    record = METRICS.start("video", path=video_path)
+    try:
+        yield record
+    finally:
+        METRICS.finish(record)
+        records = METRICS.select(video=file_name, since=record["started_at"])
+        _print_run_report(METRICS.write_report(records, "video", file_name), records, "video")
+        METRICS.release(file_name, since=record["started_at"])
+        _CURRENT_VIDEO.reset(token)
+
+def write_batch_report(record: Dict[str, Any], final: bool = True):
+    """
+    Encerra o span do lote e grava o relatório agregado (e o texto do Prometheus, se configurado).
+    Com final=False grava um retrato parcial, sem encerrar o span nem imprimir o resumo; as
+    gravações seguintes do mesmo lote/sessão sobrescrevem os mesmos arquivos.
+    """
+    name = record["name"]
+    records = METRICS.select(since=record["started_at"])
+    if final:
+        METRICS.finish(record)
+        records.append(record)
+    else:
+        partial = {key: value for key, value in record.items() if key != "_started"}
+        partial["seconds"] = round(time.perf_counter() - record["_started"], 6)
+        records.append(partial)
+    report_name = f"{name}_{datetime.fromtimestamp(record['started_at']).strftime('%Y%m%d_%H%M%S')}"
+    report_path = METRICS.write_report(records, name, report_name, rolled=True)
+    if not final:
+        METRICS.write_prometheus(records, rolled=True)
+        debug_print(f"Relatório parcial ({name}): {report_path}")
+        return
+    _print_run_report(report_path, records, name, rolled=True)
+    prometheus_path = METRICS.write_prometheus(records, rolled=True)
+    if prometheus_path:
+        print(f"📈 Métricas Prometheus: {prometheus_path}")
+
+@contextmanager
+def batch_metrics(name: str) -> Iterator[Dict[str, Any]]:
+    """Mede um lote inteiro e grava seu relatório ao final"""
+    record = METRICS.start(name)
+    try:
+        yield record
+    finally:
+        write_batch_report(record)
+
+# --- CACHE EM DISCO ---
+
+class DiskCache:
+    """
+    Cache persistente em disco: um arquivo JSON por chave, com evicção por idade
+    e por tamanho total (os acessados há mais tempo saem primeiro).
+    Com bypass (--no-cache) as leituras são ignoradas, mas os novos resultados
+    continuam sendo gravados e substituem as entradas antigas.
+    """
+
+    def __init__(self, name: str, max_size_mb: int = CACHE_MAX_SIZE_MB,
+                 max_age_days: int = CACHE_MAX_AGE_DAYS, enabled: bool = CACHE_ENABLED):
+        self.name = name
+        self.directory = os.path.join(CACHE_DIR, name)
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.max_age_seconds = max_age_days * 86400
+        self.enabled = enabled
+        self.bypass = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def contains(self, key: str) -> bool:
+        """Verifica a chave sem contar hit/miss"""
+        return self.enabled and not self.bypass and os.path.exists(self._path(key))
+
+    def get(self, key: str, count: bool = True) -> Optional[Any]:
+        if not self.enabled or self.bypass:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # Marca como usado recentemente para a evicção
+        except (OSError, ValueError):
+            if count:
+                with self._lock:
+                    self.misses += 1
+            return None
+        if count:
+            with self._lock:
+                self.hits += 1
+        debug_print(f"Cache hit ({self.name}): {key[:12]}")
+        return value
+
+    def put(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def evict(self) -> int:
+        """Remove entradas expiradas e, se preciso, as menos usadas até caber no limite"""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return 0
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        now = time.time()
+        removed = 0
+        total_size = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            expired = now - mtime > self.max_age_seconds
+            if not expired and total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            debug_print(f"Cache {self.name}: {removed} entrada(s) removida(s)")
+        return removed
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        return f"{self.hits} hit(s), {self.misses} miss(es) ({rate:.0f}% de acerto)"
+
+TRANSCRIPTION_CACHE = DiskCache("transcricoes")
+ANALYSIS_CACHE = DiskCache("analises")
+
+def _hash_file(path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 do conteúdo do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _file_fingerprint(path: str, sample_size: int = 4 * 1024 * 1024) -> str:
+    """
+    Impressão digital rápida de arquivos grandes: tamanho + amostras do início,
+    meio e fim. Evita ler vídeos de vários GB inteiros só para gerar a chave.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, "rb") as f:
+        for offset in (0, max(0, size // 2 - sample_size // 2), max(0, size - sample_size)):
+            f.seek(offset)
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+def _transcription_settings() -> Dict[str, Any]:
+    """Configurações que alteram o resultado da transcrição (parte das chaves de cache)"""
+    settings = {
+        "model": GROQ_MODEL,
+        "language": GROQ_LANGUAGE,
+        "chunk_seconds": CHUNK_DURATION_SECONDS,
+        "sample_rate": AUDIO_SAMPLE_RATE,
+        "channels": AUDIO_CHANNELS,
+        "format": AUDIO_FORMAT,
+        "chunk_strategy": CHUNK_STRATEGY,
+        "silence": [SILENCE_NOISE_DB, SILENCE_MIN_SECONDS, SILENCE_SEARCH_WINDOW, SILENCE_DROP_SECONDS]
+                   if CHUNK_STRATEGY == "silence" else None,
+    }
+    if AUDIO_FAST_PATH != "off":
+        settings.update(fast_path=AUDIO_FAST_PATH, max_upload_mb=GROQ_MAX_UPLOAD_MB)
+        if AUDIO_FAST_PATH in ("opus", "auto"):
+            settings["opus_kbps"] = AUDIO_OPUS_KBPS
+    if TRANSCRIBE_BACKEND == "local":
+        # Chaves da Groq ficam iguais às de antes; as do backend local nunca colidem com elas
+        settings.update(backend="local", model=LOCAL_WHISPER_MODEL,
+                        compute_type=LOCAL_WHISPER_COMPUTE_TYPE, beam_size=LOCAL_WHISPER_BEAM_SIZE)
+    return settings
+
+def _cache_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+# --- CHECKPOINT POR VÍDEO ---
+
+class ChunkCheckpoint:
+    """
+    Manifesto de checkpoint de um vídeo em JSONL: um cabeçalho identificando o vídeo
+    e as configurações, seguido de uma linha por pedaço concluído ou que falhou.
+    Cada linha é gravada assim que o pedaço termina, então uma interrupção
+    perde no máximo os pedaços que estavam em andamento. Na memória fica só o
+    resumo de cada pedaço (com o offset da linha); segments/words são relidos
+    do arquivo, um pedaço por vez, por iter_records().
+    """
+
+    def __init__(self, path: str, video_key: str):
+        self.path = path
+        self.video_key = video_key
+        self.completed: Dict[int, Dict[str, Any]] = {}  # number → resumo + offset da linha
+        self.failed: Dict[int, Dict[str, Any]] = {}
+        self.extracted: Optional[List[Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Carrega um checkpoint existente; retorna False se não existir ou for de outro vídeo/configuração"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                header_line = f.readline()
+                header = json.loads(header_line)
+                if header.get("type") != "header" or header.get("video_key") != self.video_key:
+                    return False
+                offset = len(header_line)
+                entries = []
+                for line in f:
+                    entries.append((offset, line))
+                    offset += len(line)
+        except (OSError, ValueError):
+            return False
+
+        for offset, line in entries:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Linha truncada por uma interrupção no meio da escrita
+            if entry.get("type") == "chunk":
+                self.completed[entry["number"]] = self._summary(entry, offset)
+                self.failed.pop(entry["number"], None)
+            elif entry.get("type") == "failure" and entry["number"] not in self.completed:
+                self.failed[entry["number"]] = entry
+            elif entry.get("type") == "extraction":
+                self.extracted = entry["chunks"]
+        return True
+
+    def start(self, video_path: str):
+        """Inicia um checkpoint novo, descartando o anterior"""
+        self.completed.clear()
+        self.failed.clear()
+        self.extracted = None
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "type": "header",
+                "video": video_path,
+                "video_key": self.video_key,
+                "settings": _transcription_settings(),
+                "created_at": datetime.now().isoformat(),
+            }, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _summary(entry: Dict[str, Any], offset: int) -> Dict[str, Any]:
+        summary = {key: entry.get(key) for key in ("number", "start", "end", "cache_key", "duration")}
+        summary["offset"] = offset
+        return summary
+
+    def _append(self, entry: Dict[str, Any]) -> int:
+        """Grava a linha e retorna o offset em que ela começa"""
+        with self._lock:
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        return offset
+
+    def record_chunk(self, record: Dict[str, Any]):
+        entry = dict(record, type="chunk")
+        offset = self._append(entry)
+        with self._lock:
+            self.completed[record["number"]] = self._summary(entry, offset)
+            self.failed.pop(record["number"], None)
+
+    def record_failure(self, chunk: AudioChunk):
+        entry = {"type": "failure", "number": chunk.number, "start": chunk.start, "end": chunk.end,
+                 "failed_at": datetime.now().isoformat()}
+        self._append(entry)
+        with self._lock:
+            self.failed[chunk.number] = entry
+
+    def record_extraction(self, chunks: List[AudioChunk]):
+        """Registra a lista completa de pedaços gerada pela extração"""
+        self.extracted = [{"number": c.number, "start": c.start, "end": c.end} for c in chunks]
+        self._append({"type": "extraction", "chunks": self.extracted})
+
+    def is_complete(self) -> bool:
+        return self.extracted is not None and all(c["number"] in self.completed for c in self.extracted)
+
+    def missing_chunks(self, expected_chunks: int) -> List[int]:
+        if self.extracted is not None:
+            expected = [c["number"] for c in self.extracted]
+        else:
+            expected = list(range(1, max(expected_chunks, max(self.completed, default=0)) + 1))
+        return [number for number in expected if number not in self.completed]
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Registros completos dos pedaços concluídos, em ordem, lidos um por vez do arquivo"""
+        with open(self.path, "rb") as f:
+            for number in sorted(self.completed):
+                f.seek(self.completed[number]["offset"])
+                yield json.loads(f.readline())
+
+# --- LIMITES DE TAXA E TENTATIVAS ---
+
+class TokenBucket:
+    """Token bucket thread-safe: acumula até `capacity` unidades, repostas continuamente"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _wait_time(self, amount: float) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def acquire(self, amount: float = 1.0):
+        # Um pedido maior que a capacidade esperaria para sempre; limita ao balde cheio
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                wait_time = self._wait_time(amount)
+            if wait_time <= 0:
+                return
+            time.sleep(min(wait_time, 5.0))
+
+class RateLimiter:
+    """
+    Limites de taxa de um provedor, compartilhados entre todas as threads.
+    Cada limite é um token bucket (ex.: requisições/minuto, segundos de áudio/hora);
+    um 429 com Retry-After pausa o provedor inteiro, não só a thread que o recebeu.
+    """
+
+    def __init__(self, name: str, limits: Dict[str, Tuple[float, float]]):
+        self.name = name
+        # limite: (capacidade, janela em segundos); capacidade 0 desabilita
+        self.buckets = {
+            unit: TokenBucket(capacity, capacity / window)
+            for unit, (capacity, window) in limits.items() if capacity > 0
+        }
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self, **costs: float):
+        while True:
+            with self._lock:
+                wait_time = self.paused_until - time.monotonic()
+            if wait_time <= 0:
+                break
+            time.sleep(wait_time)
+        for unit, amount in costs.items():
+            bucket = self.buckets.get(unit)
+            if bucket and amount > 0:
+                bucket.acquire(amount)
+
+RATE_LIMITERS = {
+    "groq": RateLimiter("groq", {
+        "requests": (GROQ_REQUESTS_PER_MINUTE, 60),
+        "audio_seconds": (GROQ_AUDIO_SECONDS_PER_HOUR, 3600),
+    }),
+    "gemini": RateLimiter("gemini", {
+        "requests": (GEMINI_REQUESTS_PER_MINUTE, 60),
+        "tokens": (GEMINI_TOKENS_PER_MINUTE, 60),
+    }),
+    "local": RateLimiter("local", {}),  # Limitado só pelo pool de processos
+}
+
+class NonRetryableAPIError(Exception):
+    """Erro da API que não adianta repetir (autenticação, arquivo inválido, etc.)"""
+
+def _parse_retry_after(error: Exception) -> Optional[float]:
+    """Extrai o tempo de espera sugerido pelo servidor (header Retry-After ou retryDelay do Gemini)"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+def _classify_api_error(error: Exception) -> Tuple[bool, Optional[float], str]:
+    """Classifica um erro de API: (vale tentar de novo?, espera sugerida, motivo)"""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = None
+    retry_after = _parse_retry_after(error)
+
+    if status == 429:
+        return True, retry_after, "limite de taxa (429)"
+    if status is not None and (status >= 500 or status == 408):
+        return True, retry_after, f"erro temporário do servidor ({status})"
+    if status is not None and 400 <= status < 500:
+        return False, None, f"erro não recuperável ({status})"
+
+    # Sem status HTTP: falhas de rede e timeouts são temporárias, erros locais não
+    error_name = type(error).__name__
+    if isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in error_name or "Connection" in error_name:
+        return True, None, f"falha de conexão ({error_name})"
+    if isinstance(error, (NonRetryableAPIError, OSError, ValueError, TypeError)):
+        return False, None, f"erro não recuperável ({error_name})"
+    return True, None, f"erro inesperado ({error_name})"
+
+def call_api(provider: str, fn, description: str, **costs: float) -> Any:
+    """
+    Executa uma chamada de API passando pelo rate limiter do provedor, com
+    tentativas que respeitam Retry-After/429, backoff exponencial com jitter e
+    desistência imediata em erros não recuperáveis. Relança o último erro.
+    """
+    limiter = RATE_LIMITERS[provider]
+    attempt = 0
+    span = METRICS.current()
+    while True:
+        attempt += 1
+        if attempt > 1 and span is not None:
+            span["retries"] = attempt - 1
+        limiter.acquire(requests=1, **costs)
+        try:
+            return fn()
+        except Exception as e:
+            retryable, retry_after, reason = _classify_api_error(e)
+            print(f"Erro em {description} (tentativa {attempt}/{MAX_RETRIES}): {reason}: {e}")
+            save_debug_file(str(e), f"{provider}_error_{datetime.now().strftime('%H%M%S_%f')}.log")
+            if not retryable or attempt >= MAX_RETRIES:
+                raise
+
+            # Full jitter: espera sorteada entre 0 e o teto exponencial, espalhando as threads no tempo
+            wait_time = retry_after if retry_after is not None else \
+                random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            if retry_after is not None:
+                limiter.pause(wait_time)
+            print(f"Aguardando {wait_time:.1f}s antes da próxima tentativa...")
+            time.sleep(wait_time)
+
+# --- BACKENDS DE TRANSCRIÇÃO ---
+
+def local_whisper_layout() -> Tuple[int, int]:
+    """(processos, threads do CTranslate2 por processo) usando todos os núcleos da máquina"""
+    cores = os.cpu_count() or 1
+    workers = LOCAL_WHISPER_WORKERS if LOCAL_WHISPER_WORKERS > 0 else max(1, cores // 4)
+    return workers, max(1, cores // workers)
+
+_LOCAL_MODEL = None  # Um WhisperModel por processo do pool, carregado no initializer
+
+def _init_local_worker(model_name: str, compute_type: str, cpu_threads: int):
+    global _LOCAL_MODEL
+    from faster_whisper import WhisperModel
+    _LOCAL_MODEL = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+def _local_transcribe(audio_path: str, language: str, beam_size: int) -> Dict[str, Any]:
+    """Roda no processo do pool: transcreve o arquivo e monta o mesmo verbose_json da Groq"""
+    segments, info = _LOCAL_MODEL.transcribe(audio_path, language=language or None,
+                                             beam_size=beam_size, word_timestamps=True)
+    result_segments = []
+    words = []
+    for segment in segments:
+        result_segments.append({
+            "id": len(result_segments),
+            "seek": segment.seek,
+            "start": round(segment.start, 3),
+            "end": round(segment.end, 3),
+            "text": segment.text,
+            "tokens": list(segment.tokens),
+            "temperature": segment.temperature,
+            "avg_logprob": segment.avg_logprob,
+            "compression_ratio": segment.compression_ratio,
+            "no_speech_prob": segment.no_speech_prob,
+        })
+        for word in segment.words or []:
+            words.append({"word": word.word.strip(), "start": round(word.start, 3), "end": round(word.end, 3)})
+    return {
+        "task": "transcribe",
+        "language": info.language,
+        "duration": info.duration,
+        "text": "".join(segment["text"] for segment in result_segments),
+        "segments": result_segments,
+        "words": words,
+    }
+
+class LocalWhisperClient:
+    """
+    Backend local: faster-whisper (CTranslate2, int8 por padrão) em um pool de
+    processos, cada um com seu modelo. Devolve o verbose_json no formato da Groq,
+    então o checkpoint, o cache e o merge dos pedaços não mudam.
+    """
+
+    def __init__(self):
+        # Importados aqui para não pesar na inicialização de quem usa a Groq
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.workers, threads = local_whisper_layout()
+        # spawn: o processo principal tem threads (pool de pedaços), fork seria inseguro
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_local_worker,
+            initargs=(LOCAL_WHISPER_MODEL, LOCAL_WHISPER_COMPUTE_TYPE, threads))
+        print(f"🖥️  Whisper local: {LOCAL_WHISPER_MODEL} ({LOCAL_WHISPER_COMPUTE_TYPE}), "
+              f"{self.workers} processo(s) × {threads} thread(s)")
+
+    def transcribe(self, audio_path: str) -> Dict[str, Any]:
+        return self._executor.submit(_local_transcribe, audio_path, GROQ_LANGUAGE, LOCAL_WHISPER_BEAM_SIZE).result()
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+_LOCAL_CLIENT: Optional[LocalWhisperClient] = None
+_LOCAL_CLIENT_LOCK = threading.Lock()
+
+def create_transcription_client() -> Optional[Any]:
+    """
+    Cliente do backend escolhido em TRANSCRIBE_BACKEND, ou None (com a mensagem
+    de erro) se ele não puder ser usado. O pool local é criado uma vez e
+    compartilhado por todos os vídeos, pois carregar o modelo é caro.
+    """
+    global _LOCAL_CLIENT
+    if TRANSCRIBE_BACKEND == "local":
+        if importlib.util.find_spec("faster_whisper") is None:
+            print("❌ faster-whisper não instalado. Para instalar: pip install faster-whisper")
+            return None
+        with _LOCAL_CLIENT_LOCK:
+            if _LOCAL_CLIENT is None:
+                _LOCAL_CLIENT = LocalWhisperClient()
+            return _LOCAL_CLIENT
+
+    if TRANSCRIBE_BACKEND != "groq":
+        print(f"❌ TRANSCRIBE_BACKEND inválido: {TRANSCRIBE_BACKEND} (use groq ou local)")
+        return None
+    if not GROQ_AVAILABLE:
+        print("❌ Groq não instalado. Para instalar: pip install groq")
+        return None
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        print("Erro: A variável de ambiente GROQ_API_KEY não foi encontrada.")
+        return None
+    return _groq_class()(api_key=api_key, max_retries=0)  # Tentativas ficam a cargo de call_api
+
+# --- METADADOS DE MÍDIA ---
+
+@dataclass
+class MediaInfo:
+    """Resultado de um único ffprobe: formato, duração e a primeira faixa de áudio"""
+    path: str
+    size: int
+    duration: float
+    format_name: str
+    bit_rate: Optional[int]
+    has_video: bool
+    audio_codec: Optional[str]
+    sample_rate: Optional[int]
+    channels: Optional[int]
+    audio_bit_rate: Optional[int]
+
+MEDIA_CACHE = DiskCache("midia")
+
+def _optional_int(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def probe_media(file_path: str) -> Optional[MediaInfo]:
+    """
+    Metadados do arquivo com uma chamada ao ffprobe (JSON de formato + faixas),
+    em cache por caminho + tamanho + data de modificação
     """
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        print(f"Erro ao analisar {file_path}: {e}")
+        return None
+    cache_key = _cache_key("probe", os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    cached = MEDIA_CACHE.get(cache_key, count=False)
+    if cached is not None:
+        return MediaInfo(**cached)
+
     command = [
         FFPROBE_PATH,
         "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
+        "-show_entries", "format=duration,format_name,bit_rate"
+                         ":stream=codec_type,codec_name,sample_rate,channels,bit_rate:stream_disposition=attached_pic",
+        "-of", "json",
         file_path
     ]
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=REQUEST_TIMEOUT)
-        duration = float(result.stdout)
-        debug_print(f"Audio duration: {duration:.2f}s for {file_path}")
-        return duration
-    except (subprocess.CalledProcessError, ValueError, subprocess.TimeoutExpired) as e:
-        print(f"Erro ao obter a duração do áudio de {file_path}: {e}")
+        with METRICS.span("ffprobe", bytes_in=stat.st_size):
+            result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=REQUEST_TIMEOUT)
+        data = json.loads(result.stdout)
+        media_format = data.get("format", {})
+        streams = data.get("streams", [])
+        audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), {})
+        info = MediaInfo(
+            path=file_path,
+            size=stat.st_size,
+            duration=float(media_format["duration"]),
+            format_name=media_format.get("format_name", ""),
+            bit_rate=_optional_int(media_format.get("bit_rate")),
+            # Capa embutida (attached_pic) aparece como faixa de vídeo, mas não é vídeo
+            has_video=any(stream.get("codec_type") == "video"
+                          and not stream.get("disposition", {}).get("attached_pic") for stream in streams),
+            audio_codec=audio.get("codec_name"),
+            sample_rate=_optional_int(audio.get("sample_rate")),
+            channels=_optional_int(audio.get("channels")),
+            audio_bit_rate=_optional_int(audio.get("bit_rate")),
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError, KeyError) as e:
+        print(f"Erro ao analisar a mídia {file_path}: {e}")
+        return None
+    debug_print(f"Probe: {info.duration:.2f}s, áudio {info.audio_codec} {info.sample_rate}Hz "
+                f"{info.channels}ch {info.audio_bit_rate or '?'}bps - {file_path}")
+    MEDIA_CACHE.put(cache_key, asdict(info))
+    return info
+
+@dataclass
+class AudioEncoding:
+    """Como os pedaços são gravados: argumentos do ffmpeg, extensão, tamanho estimado e duração"""
+    mode: str  # "encode" (AUDIO_FORMAT), "copy" ou "opus"
+    args: List[str]
+    extension: str
+    bytes_per_second: float
+    chunk_seconds: int
+
+def _encoded_bytes_per_second(audio_format: str) -> float:
+    """Bytes por segundo estimados (com folga) de cada AUDIO_FORMAT; FLAC de fala fica em ~60-70% do PCM"""
+    pcm = AUDIO_SAMPLE_RATE * AUDIO_CHANNELS * 2
+    return {"wav": pcm, "flac": pcm * 0.75, "mp3": 128000 / 8, "m4a": 128000 / 8}.get(audio_format, pcm)
+
+CHUNK_MIN_SECONDS = 60  # Abaixo disso a cópia da faixa original não compensa
+
+def _upload_limit_bytes() -> Optional[float]:
+    """Limite por arquivo do provedor (com 5% de folga); o backend local não envia nada"""
+    if TRANSCRIBE_BACKEND == "local" or GROQ_MAX_UPLOAD_MB <= 0:
         return None
+    return GROQ_MAX_UPLOAD_MB * 1024 * 1024 * 0.95
 
-def transcribe_video_original(video_path: str) -> Optional[Dict[str, Any]]:
+def _chunk_seconds_for(bytes_per_second: float) -> int:
+    """Maior duração de pedaço (até CHUNK_SIZE_SECONDS) que cabe no limite de upload"""
+    limit = _upload_limit_bytes()
+    if limit is None or bytes_per_second <= 0:
+        return CHUNK_DURATION_SECONDS
+    return max(1, min(CHUNK_DURATION_SECONDS, int(limit / bytes_per_second)))
+
+def _opus_encoding() -> AudioEncoding:
+    # libopus só aceita 8/12/16/24/48 kHz
+    sample_rate = AUDIO_SAMPLE_RATE if AUDIO_SAMPLE_RATE in (8000, 12000, 16000, 24000, 48000) else 16000
+    bytes_per_second = AUDIO_OPUS_KBPS * 1000 / 8 * 1.03  # + cabeçalhos do Ogg
+    return AudioEncoding("opus", ["-ar", str(sample_rate), "-ac", str(AUDIO_CHANNELS), "-c:a", "libopus",
+                                  "-b:a", f"{AUDIO_OPUS_KBPS}k", "-application", "voip"],
+                         "ogg", bytes_per_second, _chunk_seconds_for(bytes_per_second))
+
+def _copy_blocker(media: Optional[MediaInfo], drops_silence: bool) -> Optional[str]:
+    """Motivo para não copiar a faixa original (None = pode copiar)"""
+    if media is None or media.audio_codec is None:
+        return "faixa de áudio desconhecida"
+    if media.audio_codec not in STREAM_COPY_CONTAINERS:
+        return f"codec {media.audio_codec} não é aceito pela API"
+    if drops_silence:
+        return "remoção de silêncios exige recodificar"
+    if not media.audio_bit_rate:
+        return "bitrate do áudio desconhecido"
+    if _chunk_seconds_for(media.audio_bit_rate / 8) < min(CHUNK_MIN_SECONDS, CHUNK_DURATION_SECONDS):
+        return f"{media.audio_bit_rate // 1000} kbps exigiria pedaços muito curtos para {GROQ_MAX_UPLOAD_MB:g} MB"
+    return None
+
+def choose_audio_encoding(media: Optional[MediaInfo], drops_silence: bool = False,
+                          verbose: bool = True) -> AudioEncoding:
     """
-    FUNÇÃO ORIGINAL DE TRANSCRIÇÃO MANTIDA 100% INTACTA COM CONFIGURAÇÕES DINÂMICAS
-    Transcreve um arquivo de vídeo usando a API Groq, dividindo o áudio em pedaços (chunks) se necessário.
+    Codificação dos pedaços conforme AUDIO_FAST_PATH e a duração de cada pedaço,
+    reduzida automaticamente para caber no limite de upload do provedor.
+    off = recodifica para AUDIO_FORMAT; opus = Opus de baixo bitrate;
+    copy = copia a faixa original quando possível (senão AUDIO_FORMAT);
+    auto = copia quando possível, senão Opus.
     """
-    print(f"Iniciando o processo para: {video_path}")
-    debug_print(f"Configurações: CHUNK_SIZE={CHUNK_DURATION_SECONDS}s, MODEL={GROQ_MODEL}, LANG={GROQ_LANGUAGE}")
+    encoding = None
+    if AUDIO_FAST_PATH in ("copy", "auto"):
+        reason = _copy_blocker(media, drops_silence)
+        if reason is None:
+            bytes_per_second = media.audio_bit_rate / 8
+            encoding = AudioEncoding("copy", ["-c:a", "copy"], STREAM_COPY_CONTAINERS[media.audio_codec],
+                                     bytes_per_second, _chunk_seconds_for(bytes_per_second))
+            if verbose:
+                print(f"⚡ Copiando a faixa de áudio original ({media.audio_codec}, "
+                      f"{media.audio_bit_rate // 1000} kbps) sem recodificar")
+        elif verbose:
+            fallback = "Opus" if AUDIO_FAST_PATH == "auto" else AUDIO_FORMAT
+            print(f"🔄 Áudio recodificado para {fallback}: {reason}")
+    if encoding is None and AUDIO_FAST_PATH in ("opus", "auto"):
+        encoding = _opus_encoding()
+        if verbose and AUDIO_FAST_PATH == "opus":
+            print(f"⚡ Áudio dos pedaços em Opus {AUDIO_OPUS_KBPS} kbps")
+    if encoding is None:
+        bytes_per_second = _encoded_bytes_per_second(AUDIO_FORMAT)
+        encoding = AudioEncoding("encode", ["-ar", str(AUDIO_SAMPLE_RATE), "-ac", str(AUDIO_CHANNELS),
+                                            "-c:a", AUDIO_CODECS.get(AUDIO_FORMAT, AUDIO_FORMAT)],
+                                 AUDIO_FORMAT, bytes_per_second, _chunk_seconds_for(bytes_per_second))
+    if verbose and encoding.chunk_seconds < CHUNK_DURATION_SECONDS:
+        print(f"📏 Pedaços de {encoding.chunk_seconds}s (em vez de {CHUNK_DURATION_SECONDS}s) "
+              f"para caber no limite de {GROQ_MAX_UPLOAD_MB:g} MB por envio")
+    return encoding
 
-    # 1. Validar API Key
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        print("Erro: A variável de ambiente GROQ_API_KEY não foi encontrada.")
-        return None
-    client = Groq(api_key=api_key)
+def _last_realtime_factor() -> Optional[float]:
+    """Fator de tempo real do relatório de lote mais recente em METRICS_DIR"""
+    reports = sorted(Path(METRICS_DIR).glob("batch_*_report.json"), key=lambda p: p.stat().st_mtime)
+    for report_path in reversed(reports):
+        try:
+            factor = json.loads(report_path.read_text(encoding="utf-8")).get("realtime_factor")
+        except (OSError, ValueError):
+            continue
+        if factor:
+            return float(factor)
+    return None
 
-    # 2. Preparar caminhos
-    base_name = os.path.basename(video_path)
-    file_name, _ = os.path.splitext(base_name)
-    temp_dir = TEMP_DIR
-    os.makedirs(temp_dir, exist_ok=True)
-    final_transcription_path = os.path.join(temp_dir, f"{file_name}_transcription.json")
-
-    # 3. Obter duração e calcular chunks
-    duration = get_audio_duration(video_path)
-    if duration is None:
+def estimate_batch(video_paths: List[Path]) -> Optional[Dict[str, Any]]:
+    """
+    Estimativa de um lote antes de processar: duração total (ffprobe em paralelo,
+    com cache), pedaços/requisições, custo da Groq e tempo, pelo maior entre o
+    limite de taxa e o fator de tempo real do último lote.
+    """
+    if not video_paths:
         return None
-    
-    num_chunks = math.ceil(duration / CHUNK_DURATION_SECONDS)
-    print(f"Duração do vídeo: {duration:.2f}s. Dividindo em {num_chunks} pedaço(s).")
+    with ThreadPoolExecutor(max_workers=min(8, len(video_paths))) as executor:
+        infos = list(executor.map(lambda path: probe_media(str(path)), video_paths))
+    probed = [info for info in infos if info is not None]
+    if not probed:
+        return None
+    audio_seconds = sum(info.duration for info in probed)
+    drops_silence = CHUNK_STRATEGY == "silence" and SILENCE_DROP_SECONDS > 0
+    requests = sum(max(1, math.ceil(info.duration / choose_audio_encoding(info, drops_silence, verbose=False).chunk_seconds))
+                   for info in probed)
+    local = TRANSCRIBE_BACKEND == "local"
 
-    all_segments = []
-    total_words = []
-    transcribed_duration = 0.0
+    # Limite de taxa: o que passa da capacidade do balde espera a reposição
+    rate_bound = 0.0
+    if not local:
+        if GROQ_AUDIO_SECONDS_PER_HOUR > 0:
+            rate_bound = max(rate_bound, (audio_seconds - GROQ_AUDIO_SECONDS_PER_HOUR) / GROQ_AUDIO_SECONDS_PER_HOUR * 3600)
+        if GROQ_REQUESTS_PER_MINUTE > 0:
+            rate_bound = max(rate_bound, (requests - GROQ_REQUESTS_PER_MINUTE) / GROQ_REQUESTS_PER_MINUTE * 60)
+    realtime_factor = _last_realtime_factor()
+    history_bound = audio_seconds / realtime_factor if realtime_factor else None
+    return {
+        "videos": len(probed),
+        "unreadable": len(infos) - len(probed),
+        "audio_seconds": audio_seconds,
+        "requests": requests,
+        "cost_usd": 0.0 if local else audio_seconds / 3600 * GROQ_PRICE_PER_HOUR,
+        "rate_limit_seconds": rate_bound,
+        "realtime_factor": realtime_factor,
+        "estimated_seconds": max(rate_bound, history_bound) if history_bound is not None else None,
+    }
 
-    for i in range(num_chunks):
-        chunk_num = i + 1
-        start_time = i * CHUNK_DURATION_SECONDS
-        chunk_audio_path = os.path.join(temp_dir, f"{file_name}_chunk_{chunk_num}.{AUDIO_FORMAT}")
-        
-        print(f"\n--- Processando Pedaço {chunk_num}/{num_chunks} ---")
-        print(f"Convertendo áudio (início: {start_time}s)...")
-
-        # 4. Converter um pedaço do vídeo para áudio com configurações dinâmicas
-        ffmpeg_command = [
-            FFMPEG_PATH,
-            "-i", video_path,
-            "-ss", str(start_time),
-            "-t", str(CHUNK_DURATION_SECONDS),
-            "-vn", 
-            "-ar", str(AUDIO_SAMPLE_RATE), 
-            "-ac", str(AUDIO_CHANNELS), 
-            "-c:a", AUDIO_FORMAT,
-            "-y", chunk_audio_path
-        ]
-        
-        debug_print(f"FFmpeg command: {' '.join(ffmpeg_command)}")
-        
+def print_batch_estimate(video_paths: List[Path]):
+    estimate = estimate_batch(video_paths)
+    if estimate is None:
+        return
+    print(f"📊 Estimativa: {estimate['videos']} vídeos, {estimate['audio_seconds'] / 3600:.2f} h de áudio, "
+          f"{estimate['requests']} pedaços")
+    if estimate["unreadable"]:
+        print(f"   ⚠️  {estimate['unreadable']} vídeos não puderam ser analisados")
+    if TRANSCRIBE_BACKEND == "local":
+        print("   💰 Custo de transcrição: US$ 0 (backend local)")
+    else:
+        print(f"   💰 Custo de transcrição (Groq): ~US$ {estimate['cost_usd']:.2f} "
+              f"(US$ {GROQ_PRICE_PER_HOUR:g}/h de áudio)")
+    if estimate["rate_limit_seconds"] > 0:
+        print(f"   ⏳ Limites de taxa exigem pelo menos {estimate['rate_limit_seconds'] / 60:.1f} min")
+    if estimate["estimated_seconds"] is not None:
+        print(f"   ⏱️  Tempo estimado: ~{estimate['estimated_seconds'] / 60:.1f} min "
+              f"({estimate['realtime_factor']:.1f}x tempo real no último lote)")
+
+# --- IMPRESSÃO DIGITAL DO ÁUDIO ---
+#
+# Detecta a mesma aula exportada de novo com outro nome (outro container, bitrate
+# ou pequenos cortes no início/fim). O áudio é decodificado em mono a 5512 Hz e
+# dividido em quadros de ~0,74 s (passo de ~0,09 s); a energia de 33 bandas entre
+# 300 e 2000 Hz vira 32 bits por quadro: o sinal da diferença entre bandas vizinhas
+# comparado ao quadro anterior. Esses bits resistem a recompressão e mudança de
+# volume. Dois vídeos são a mesma aula quando a fração de bits diferentes, no melhor
+# alinhamento, fica abaixo de AUDIO_DEDUP_MAX_DISTANCE (áudios distintos ficam ~0,5).
+
+FINGERPRINT_SAMPLE_RATE = 5512
+FINGERPRINT_FRAME = 4096
+FINGERPRINT_HOP = 512
+FINGERPRINT_BANDS = 33  # 32 diferenças → um uint32 por quadro
+FINGERPRINT_PROBE_FRAMES = 4096  # Quadros do início usados para achar o alinhamento (~6 min)
+FINGERPRINT_FRAME_SECONDS = FINGERPRINT_HOP / FINGERPRINT_SAMPLE_RATE
+
+def audio_fingerprint(video_path: str) -> Optional[Any]:
+    """Impressão digital do áudio (array numpy uint32, um valor por quadro), ou None"""
+    import numpy as np  # Opcional: só a deduplicação precisa dele
+
+    edges = np.round(np.geomspace(300, 2000, FINGERPRINT_BANDS + 1) * FINGERPRINT_FRAME
+                     / FINGERPRINT_SAMPLE_RATE).astype(np.intp)
+    window = np.hanning(FINGERPRINT_FRAME).astype(np.float32)
+    command = [
+        FFMPEG_PATH, "-v", "error", "-i", video_path,
+        "-vn", "-ac", "1", "-ar", str(FINGERPRINT_SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    energies = []
+    tail = np.zeros(0, dtype=np.float32)
+    with METRICS.span("ffmpeg.fingerprint", bytes_in=os.path.getsize(video_path)) as span:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         try:
-            result = subprocess.run(ffmpeg_command, check=True, capture_output=True, text=True, timeout=REQUEST_TIMEOUT)
-            debug_print(f"FFmpeg success for chunk {chunk_num}")
-            if SAVE_DEBUG_FILES:
-                save_debug_file(result.stderr, f"ffmpeg_chunk_{chunk_num}_output.log")
-        except subprocess.CalledProcessError as e:
-            print(f"Erro no ffmpeg para o pedaço {chunk_num}: {e.stderr}")
-            save_debug_file(str(e), f"ffmpeg_chunk_{chunk_num}_error.log")
-            continue # Pula para o próximo pedaço
-        except subprocess.TimeoutExpired:
-            print(f"Timeout no ffmpeg para o pedaço {chunk_num}")
+            # Blocos de 60 s: a memória não depende da duração do vídeo
+            while True:
+                data = process.stdout.read(FINGERPRINT_SAMPLE_RATE * 60 * 2)
+                if not data:
+                    break
+                samples = np.concatenate([tail, np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2")
+                                          .astype(np.float32)])
+                count = (len(samples) - FINGERPRINT_FRAME) // FINGERPRINT_HOP + 1
+                if count <= 0:
+                    tail = samples
+                    continue
+                frames = np.lib.stride_tricks.sliding_window_view(samples, FINGERPRINT_FRAME)[::FINGERPRINT_HOP][:count]
+                power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+                energies.append(np.add.reduceat(power[:, edges[0]:edges[-1]], edges[:-1] - edges[0], axis=1))
+                tail = samples[count * FINGERPRINT_HOP:]
+            stderr = process.stderr.read().decode("utf-8", errors="replace")
+        finally:
+            returncode = process.wait()
+        span["audio_seconds"] = sum(len(block) for block in energies) * FINGERPRINT_FRAME_SECONDS
+    if returncode != 0 or len(energies) == 0:
+        print(f"⚠️  Não foi possível calcular a impressão digital de {video_path}: {stderr.strip() or 'sem áudio'}")
+        return None
+
+    energy = np.concatenate(energies)
+    band_difference = energy[:, :-1] - energy[:, 1:]
+    bits = band_difference[1:] > band_difference[:-1]
+    return np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+
+def _popcount(values: Any) -> int:
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return int(np.bitwise_count(values).sum())
+    return int(np.unpackbits(values.view(np.uint8)).sum())
+
+def _bit_distance(a: Any, b: Any) -> float:
+    """Fração de bits diferentes entre quadros alinhados, ignorando os que estão em silêncio nos dois"""
+    active = (a | b) != 0  # Silêncio digital vira quadro zerado: igualdade aí não indica o mesmo áudio
+    count = int(active.sum())
+    if count < len(a) // 4:
+        return 1.0  # Áudio quase todo em silêncio: nada a comparar
+    return _popcount(a[active] ^ b[active]) / (32 * count)
+
+def fingerprint_distance(a: Any, b: Any, max_offset_seconds: float) -> Tuple[float, float]:
+    """
+    Fração de bits diferentes no melhor alinhamento entre as duas impressões e o
+    deslocamento (s) desse alinhamento, procurado no início dos áudios até ±max_offset_seconds
+    """
+    max_offset = int(max_offset_seconds / FINGERPRINT_FRAME_SECONDS)
+    best = (1.0, 0)
+    for offset in range(-max_offset, max_offset + 1):
+        start_a, start_b = max(0, offset), max(0, -offset)
+        count = min(len(a) - start_a, len(b) - start_b, FINGERPRINT_PROBE_FRAMES)
+        if count <= 0:
             continue
+        distance = _bit_distance(a[start_a:start_a + count], b[start_b:start_b + count])
+        if distance < best[0]:
+            best = (distance, offset)
 
-        # 5. Transcrever o pedaço com a API
-        print(f"Enviando pedaço {chunk_num} para a API do Groq...")
-        
-        retry_count = 0
-        transcription = None
-        
-        while retry_count < MAX_RETRIES and transcription is None:
-            try:
-                with open(chunk_audio_path, "rb") as file:
-                    transcription = client.audio.transcriptions.create(
-                        file=(os.path.basename(chunk_audio_path), file.read()),
-                        model=GROQ_MODEL,
-                        response_format="verbose_json",
-                        timestamp_granularities=["word", "segment"],
-                        language=GROQ_LANGUAGE
-                    ).to_dict()
-
-                # Acumular resultados, ajustando timestamps
-                for segment in transcription.get('segments', []):
-                    segment['start'] += start_time
-                    segment['end'] += start_time
-                    all_segments.append(segment)
-                
-                for word in transcription.get('words', []):
-                    word['start'] += start_time
-                    word['end'] += start_time
-                    total_words.append(word)
-
-                chunk_transcribed_duration = transcription.get('duration', 0)
-                transcribed_duration += chunk_transcribed_duration
-                print(f"Pedaço {chunk_num} transcrito com sucesso.")
-                
-                # Salvar debug da transcrição
-                if SAVE_DEBUG_FILES:
-                    save_debug_file(transcription, f"transcription_chunk_{chunk_num}.json")
+    # Conferir o áudio inteiro no alinhamento encontrado
+    offset = best[1]
+    start_a, start_b = max(0, offset), max(0, -offset)
+    count = min(len(a) - start_a, len(b) - start_b)
+    if count <= 0:
+        return 1.0, 0.0
+    return _bit_distance(a[start_a:start_a + count], b[start_b:start_b + count]), offset * FINGERPRINT_FRAME_SECONDS
+
+class FingerprintIndex:
+    """
+    Índice local das impressões digitais (temp/fingerprints/): index.json guarda,
+    para cada vídeo processado, duração, arquivo .fp e a pasta da aula gerada.
+    find() compara só com vídeos de duração parecida cuja aula ainda existe.
+    """
+
+    def __init__(self, directory: str = FINGERPRINT_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, "index.json")
+        self.bypass = False  # --no-cache: não reaproveita, mas continua registrando
+        self._lock = threading.Lock()
+
+    def _entries(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("videos", {})
+        except (OSError, ValueError):
+            return {}
+
+    def find(self, video_path: str, fingerprint: Any, duration: float) -> Optional[Dict[str, Any]]:
+        """Aula já gerada com o mesmo áudio (a mais parecida), com distance e offset_seconds"""
+        import numpy as np
+
+        if self.bypass:
+            return None
+        key = os.path.abspath(video_path)
+        best = None
+        for path, entry in self._entries().items():
+            if path == key or abs(entry["duration"] - duration) > AUDIO_DEDUP_MAX_OFFSET + 1:
+                continue
+            output_dir = entry.get("output_dir")
+            if not output_dir or _lesson_transcript(Path(output_dir)) is None \
+                    or not os.path.exists(os.path.join(output_dir, "analise.json")):
+                continue  # Aula apagada ou incompleta
+            try:
+                candidate = np.fromfile(os.path.join(self.directory, entry["file"]), dtype="<u4")
+            except OSError:
+                continue
+            distance, offset = fingerprint_distance(fingerprint, candidate, AUDIO_DEDUP_MAX_OFFSET)
+            debug_print(f"Impressão digital: {os.path.basename(path)} a {distance:.3f} (deslocamento {offset:+.1f}s)")
+            if distance <= AUDIO_DEDUP_MAX_DISTANCE and (best is None or distance < best["distance"]):
+                best = dict(entry, video=path, distance=distance, offset_seconds=offset)
+        return best
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"videos": entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, video_path: str, fingerprint: Any, duration: float, output_dir: str):
+        key = os.path.abspath(video_path)
+        file_name = f"{_cache_key(key)[:24]}.fp"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fingerprint.astype("<u4").tofile(os.path.join(self.directory, file_name))
+            entries = self._entries()
+            stat = os.stat(key)
+            entries[key] = {"size": stat.st_size, "mtime": stat.st_mtime, "duration": duration,
+                            "frames": len(fingerprint), "file": file_name, "output_dir": output_dir,
+                            "recorded_at": datetime.now().isoformat()}
+            self._save(entries)
+
+    def remove(self, video_path: str):
+        """Esquece um vídeo apagado (--prune)"""
+        with self._lock:
+            entries = self._entries()
+            entry = entries.pop(os.path.abspath(video_path), None)
+            if entry is None:
+                return
+            fingerprint_path = os.path.join(self.directory, entry["file"])
+            if os.path.exists(fingerprint_path):
+                os.remove(fingerprint_path)
+            self._save(entries)
+
+    def fingerprint_for(self, video_path: str) -> Optional[Any]:
+        """Impressão já registrada para este arquivo (mesmo tamanho e mtime), sem decodificar de novo"""
+        import numpy as np
+
+        entry = self._entries().get(os.path.abspath(video_path))
+        if entry is None:
+            return None
+        stat = os.stat(video_path)
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+            return None
+        try:
+            return np.fromfile(os.path.join(self.directory, entry["file"]), dtype="<u4")
+        except OSError:
+            return None
+
+FINGERPRINT_INDEX = FingerprintIndex()
+
+# --- FUNÇÕES ORIGINAIS MANTIDAS ---
+
+def get_audio_duration(file_path: str) -> Optional[float]:
+    """
+    Obtém a duração de um arquivo de mídia usando ffprobe.
+    FUNÇÃO ORIGINAL MANTIDA, agora via probe_media (uma chamada, com cache)
+    """
+    info = probe_media(file_path)
+    if info is None:
+        return None
+    debug_print(f"Audio duration: {info.duration:.2f}s for {file_path}")
+    return info.duration
+
+def detect_silences(video_path: str, duration: float) -> Optional[List[Tuple[float, float]]]:
+    """Detecta silêncios com o filtro silencedetect do ffmpeg (áudio reduzido a 8 kHz mono)"""
+    command = [
+        FFMPEG_PATH,
+        "-nostdin", "-hide_banner",
+        "-i", video_path,
+        "-vn",
+        "-af", f"aformat=channel_layouts=mono,aresample=8000,"
+               f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS}",
+        "-f", "null", "-"
+    ]
+    debug_print(f"FFmpeg command: {' '.join(command)}")
+    try:
+        with METRICS.span("ffmpeg.silencedetect", audio_seconds=duration):
+            result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=REQUEST_TIMEOUT)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        print(f"Erro ao detectar silêncios em {video_path}: {e}")
+        return None
+
+    silences = []
+    silence_start = None
+    for line in result.stderr.splitlines():
+        match = re.search(r"silence_start: (-?[\d.]+)", line)
+        if match:
+            silence_start = max(0.0, float(match.group(1)))
+            continue
+        match = re.search(r"silence_end: ([\d.]+)", line)
+        if match and silence_start is not None:
+            silences.append((silence_start, float(match.group(1))))
+            silence_start = None
+    if silence_start is not None:  # Silêncio até o fim do arquivo
+        silences.append((silence_start, duration))
+    return silences
+
+def plan_chunks(video_path: str, duration: float, chunk_seconds: int = CHUNK_DURATION_SECONDS) -> Optional[ChunkPlan]:
+    """
+    Planeja os cortes com base nos silêncios: cada corte fica no silêncio mais
+    próximo (antes) do tamanho alvo, nunca ultrapassando chunk_seconds.
+    Com SILENCE_DROP_SECONDS > 0, silêncios longos são removidos do áudio enviado.
+    """
+    silences = detect_silences(video_path, duration)
+    if silences is None:
+        return None
+
+    timeline = None
+    if SILENCE_DROP_SECONDS > 0:
+        padding = min(0.25, SILENCE_DROP_SECONDS / 4)  # Mantém um respiro nas bordas
+        keep_ranges = []
+        position = 0.0
+        for start, end in silences:
+            if end - start < SILENCE_DROP_SECONDS:
+                continue
+            if start + padding > position:
+                keep_ranges.append((position, start + padding))
+            position = max(position, end - padding)
+        if position < duration:
+            keep_ranges.append((position, duration))
+        if len(keep_ranges) > 1 or (keep_ranges and keep_ranges[0] != (0.0, duration)):
+            timeline = TimelineMap(keep_ranges)
+
+    sent_duration = timeline.sent_duration if timeline else duration
+    to_sent = timeline.to_sent if timeline else (lambda t: t)
+    candidates = sorted(to_sent((start + end) / 2) for start, end in silences)
+
+    cut_points = []
+    last_cut = 0.0
+    while sent_duration - last_cut > chunk_seconds:
+        target = last_cut + chunk_seconds
+        window_start = max(last_cut + 1.0, target - SILENCE_SEARCH_WINDOW)
+        i = bisect.bisect_right(candidates, target) - 1
+        cut = candidates[i] if i >= 0 and candidates[i] >= window_start else target
+        cut_points.append(round(cut, 3))
+        last_cut = cut
+
+    if timeline:
+        removed = duration - sent_duration
+        print(f"🔇 Silêncios removidos: {removed:.1f}s ({removed / duration * 100:.1f}% do áudio)")
+    print(f"✂️  {len(silences)} silêncio(s) detectado(s); {len(cut_points) + 1} pedaço(s) planejado(s)")
+    return ChunkPlan(cut_points=cut_points, timeline=timeline, sent_duration=sent_duration)
+
+def iter_audio_chunks(video_path: str, output_prefix: str, plan: Optional[ChunkPlan] = None,
+                      encoding: Optional[AudioEncoding] = None) -> Iterator[AudioChunk]:
+    """
+    Extrai o áudio do vídeo em uma única passada usando o segment muxer do ffmpeg.
+    O vídeo é decodificado uma só vez; cada pedaço é entregue assim que o ffmpeg
+    o fecha, então a transcrição do pedaço N acontece enquanto o N+1 é extraído.
+    Os tempos de início/fim vêm da lista de segmentos do próprio ffmpeg.
+    Com um plano, os cortes seguem plan.cut_points e os silêncios removidos
+    ficam de fora (tempos na linha do tempo do áudio enviado). A codificação
+    (recodificar, Opus ou cópia da faixa original) vem de choose_audio_encoding.
+    """
+    output_dir = os.path.dirname(output_prefix) or "."
+    encoding = encoding or choose_audio_encoding(None, verbose=False)
+    # '%' no nome do arquivo seria interpretado pelo padrão do segment muxer
+    pattern = output_prefix.replace("%", "%%") + f"_chunk_%d.{encoding.extension}"
+    list_path = f"{output_prefix}_chunks.csv"
+    log_path = f"{output_prefix}_ffmpeg.log"
+    if os.path.exists(list_path):
+        os.remove(list_path)
+
+    audio_filter = []
+    if plan and plan.timeline:
+        selection = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in plan.timeline.keep_ranges)
+        audio_filter = ["-af", f"aselect='{selection}',asetpts=N/SR/TB"]
+    if plan and plan.cut_points:
+        split_args = ["-segment_times", ",".join(f"{cut:.3f}" for cut in plan.cut_points)]
+    else:
+        split_args = ["-segment_time", str(encoding.chunk_seconds)]
+
+    ffmpeg_command = [
+        FFMPEG_PATH,
+        "-nostdin",
+        "-i", video_path,
+        "-vn",
+        *audio_filter,
+        *encoding.args,
+        "-f", "segment",
+        *split_args,
+        "-segment_start_number", "1",
+        "-reset_timestamps", "1",
+        "-segment_list", list_path,
+        "-segment_list_type", "csv",
+        "-y", pattern
+    ]
+    debug_print(f"FFmpeg command: {' '.join(ffmpeg_command)}")
+
+    log_file = open(log_path, "w", encoding="utf-8")
+    extract_span = METRICS.start("ffmpeg.extract", bytes_in=os.path.getsize(video_path), bytes_out=0, audio_seconds=0.0)
+    process = subprocess.Popen(ffmpeg_command, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.DEVNULL, stderr=log_file)
+    delivered = 0
+    last_progress = time.monotonic()
+
+    def read_new_chunks() -> List[AudioChunk]:
+        if not os.path.exists(list_path):
+            return []
+        with open(list_path, "r", encoding="utf-8", newline="") as f:
+            content = f.read()
+        # Só considerar linhas completas; a última pode estar sendo escrita
+        complete_lines = content[:content.rfind("\n") + 1].splitlines()
+        chunks = []
+        for row in csv.reader(complete_lines[delivered:]):
+            number = delivered + len(chunks) + 1
+            chunks.append(AudioChunk(number=number, start=float(row[1]), end=float(row[2]),
+                                     path=os.path.join(output_dir, row[0])))
+        return chunks
+
+    try:
+        while True:
+            finished = process.poll() is not None
+            for chunk in read_new_chunks():
+                delivered += 1
+                # Tempo de cada pedaço = intervalo desde o pedaço anterior (a extração é contínua)
+                chunk_bytes = os.path.getsize(chunk.path) if os.path.exists(chunk.path) else 0
+                METRICS.add("ffmpeg.chunk", time.monotonic() - last_progress, chunk=chunk.number,
+                            bytes_out=chunk_bytes, audio_seconds=chunk.end - chunk.start)
+                extract_span["bytes_out"] += chunk_bytes
+                extract_span["audio_seconds"] += chunk.end - chunk.start
+                last_progress = time.monotonic()
+                debug_print(f"FFmpeg finished chunk {chunk.number}: {chunk.start:.2f}s-{chunk.end:.2f}s")
+                yield chunk
+            if finished:
+                break
+            if time.monotonic() - last_progress > REQUEST_TIMEOUT:
+                process.kill()
+                print(f"Timeout no ffmpeg após o pedaço {delivered}")
+                break
+            time.sleep(0.2)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        log_file.close()
+        METRICS.finish(extract_span, error="ffmpeg" if process.returncode else None)
+
+    if process.returncode and process.returncode > 0:
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            stderr_tail = f.read()[-2000:]
+        print(f"Erro no ffmpeg após o pedaço {delivered}: {stderr_tail}")
+        save_debug_file(stderr_tail, f"ffmpeg_{os.path.basename(output_prefix)}_error.log")
+    elif SAVE_DEBUG_FILES:
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            save_debug_file(f.read(), f"ffmpeg_{os.path.basename(output_prefix)}_output.log")
+
+    for path in (list_path, log_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _transcribe_chunk(client: Any, chunk: AudioChunk, num_chunks: int) -> Optional[Dict[str, Any]]:
+    """
+    Transcreve um pedaço com o backend configurado (com tentativas) e remove o arquivo temporário.
+    Retorna o verbose_json do pedaço com timestamps relativos ao início do pedaço.
+    """
+    chunk_num = chunk.number
+
+    # Cache endereçado pelo conteúdo do áudio + configurações do modelo
+    transcription = None
+    if TRANSCRIPTION_CACHE.enabled:
+        chunk.cache_key = _cache_key(_hash_file(chunk.path), _transcription_settings())
+        transcription = TRANSCRIPTION_CACHE.get(chunk.cache_key)
+    if transcription is not None:
+        print(f"♻️  Pedaço {chunk_num}/{num_chunks} encontrado no cache - chamada à API ignorada.")
+    else:
+        if isinstance(client, LocalWhisperClient):
+            print(f"Transcrevendo pedaço {chunk_num}/{num_chunks} localmente ({LOCAL_WHISPER_MODEL})...")
+        else:
+            print(f"Enviando pedaço {chunk_num}/{num_chunks} para a API do Groq...")
+
+        def request() -> Dict[str, Any]:
+            if isinstance(client, LocalWhisperClient):
+                return client.transcribe(chunk.path)
+            # O handle é enviado direto: o multipart lê o arquivo em blocos durante o
+            # upload, sem carregar o pedaço inteiro na memória
+            with open(chunk.path, "rb") as file:
+                return client.audio.transcriptions.create(
+                    file=(os.path.basename(chunk.path), file),
+                    model=GROQ_MODEL,
+                    response_format="verbose_json",
+                    timestamp_granularities=["word", "segment"],
+                    language=GROQ_LANGUAGE
+                ).to_dict()
+
+        try:
+            provider = "local" if isinstance(client, LocalWhisperClient) else "groq"
+            with METRICS.span(f"{provider}.transcribe", chunk=chunk_num, bytes_out=os.path.getsize(chunk.path),
+                              audio_seconds=chunk.end - chunk.start) as span:
+                transcription = call_api(provider, request, f"transcrição do pedaço {chunk_num}",
+                                         audio_seconds=chunk.end - chunk.start)
+                span["bytes_in"] = len(json.dumps(transcription))
+            print(f"Pedaço {chunk_num} transcrito com sucesso.")
+            TRANSCRIPTION_CACHE.put(chunk.cache_key, transcription)
+
+            # Salvar debug da transcrição
+            if SAVE_DEBUG_FILES:
+                save_debug_file(transcription, f"transcription_chunk_{chunk_num}.json")
+        except Exception as e:
+            print(f"Pedaço {chunk_num} não transcrito: {e}")
+
+    # Limpar arquivo temporário após tentativas (a menos que esteja em modo debug)
+    if os.path.exists(chunk.path) and not SAVE_DEBUG_FILES:
+        os.remove(chunk.path)
+    elif SAVE_DEBUG_FILES:
+        debug_print(f"Chunk file preserved for debug: {chunk.path}")
+
+    return transcription
+
+def _chunk_record(chunk: AudioChunk, transcription: Dict[str, Any],
+                  timeline: Optional[TimelineMap] = None) -> Dict[str, Any]:
+    """
+    Converte o resultado de um pedaço em registro de checkpoint, ajustando os
+    timestamps para a linha do tempo original do vídeo
+    """
+    if timeline:
+        to_original = lambda t: round(timeline.to_original(chunk.start + t), 3)
+    else:
+        to_original = lambda t: t + chunk.start
+
+    segments = transcription.get('segments', [])
+    if not TRANSCRIPT_FULL_SEGMENTS:
+        segments = [{field: segment[field] for field in SEGMENT_FIELDS if field in segment} for segment in segments]
+    for segment in segments:
+        segment['start'] = to_original(segment['start'])
+        segment['end'] = to_original(segment['end'])
+
+    words = transcription.get('words', [])
+    for word in words:
+        word['start'] = to_original(word['start'])
+        word['end'] = to_original(word['end'])
+
+    return {
+        "number": chunk.number,
+        "start": timeline.to_original(chunk.start) if timeline else chunk.start,
+        "end": timeline.to_original(chunk.end) if timeline else chunk.end,
+        "cache_key": chunk.cache_key,
+        "segments": segments,
+        "words": words,
+        "duration": transcription.get('duration', 0),
+    }
+
+def _process_chunk(client: Any, chunk: AudioChunk, num_chunks: int, checkpoint: "ChunkCheckpoint",
+                   timeline: Optional[TimelineMap] = None) -> Optional[Dict[str, Any]]:
+    """Transcreve um pedaço e registra o resultado (ou a falha) no checkpoint"""
+    try:
+        transcription = _transcribe_chunk(client, chunk, num_chunks)
+    except Exception as e:
+        print(f"Erro inesperado no pedaço {chunk.number}: {e}")
+        transcription = None
+    if transcription is None:
+        checkpoint.record_failure(chunk)
+        return None
+    record = _chunk_record(chunk, transcription, timeline)
+    checkpoint.record_chunk(record)
+    return record
+
+def _load_cached_chunks(video_key: str) -> Optional[Tuple[List[Tuple[AudioChunk, Dict[str, Any]]], Optional[TimelineMap]]]:
+    """Carrega todos os pedaços de um vídeo (e o mapa de silêncios removidos) do cache, ou None se faltar algum"""
+    if not TRANSCRIPTION_CACHE.contains(video_key):
+        return None
+    index = TRANSCRIPTION_CACHE.get(video_key, count=False) or {}
+    entries = index.get("chunks", [])
+    # Índices antigos podem ter "key": None (pedaço transcrito com o cache desligado): miss
+    if not entries or not all(entry.get("key") and TRANSCRIPTION_CACHE.contains(entry["key"]) for entry in entries):
+        return None
+
+    cached = []
+    for entry in entries:
+        transcription = TRANSCRIPTION_CACHE.get(entry["key"])
+        if transcription is None:
+            return None
+        chunk = AudioChunk(number=entry["number"], start=entry["start"], end=entry["end"],
+                           path="", cache_key=entry["key"])
+        cached.append((chunk, transcription))
+    keep_ranges = index.get("keep_ranges")
+    return cached, TimelineMap([tuple(r) for r in keep_ranges]) if keep_ranges else None
+
+def _video_temp_prefix(video_path: str) -> str:
+    """
+    Prefixo dos arquivos de trabalho do vídeo em temp/: nome + hash curto do caminho
+    absoluto, para que aula01.mp4 de pastas diferentes (lote recursivo, --jobs) não
+    compartilhem checkpoint, etapas e pedaços
+    """
+    file_name, _ = os.path.splitext(os.path.basename(video_path))
+    path_hash = hashlib.sha256(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(TEMP_DIR, f"{file_name}-{path_hash}")
+
+def _video_temp_path(video_path: str, suffix: str) -> str:
+    """Arquivo de trabalho do vídeo em temp/ (ex.: temp/aula01-1a2b3c4d_checkpoint.jsonl)"""
+    return f"{_video_temp_prefix(video_path)}_{suffix}"
+
+def _video_key(video_path: str) -> str:
+    """Identifica o vídeo + configurações de transcrição (checkpoint, cache e etapas)"""
+    return _cache_key(_file_fingerprint(video_path), _transcription_settings())
+
+def transcribe_video_original(video_path: str, resume: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    FUNÇÃO ORIGINAL DE TRANSCRIÇÃO MANTIDA 100% INTACTA COM CONFIGURAÇÕES DINÂMICAS
+    Transcreve um arquivo de vídeo usando a API Groq, dividindo o áudio em pedaços (chunks) se necessário.
+    """
+    prepared = transcribe_chunks(video_path, resume=resume)
+    if prepared is None:
+        return None
+    checkpoint, num_chunks = prepared
+    return merge_transcription(video_path, checkpoint, num_chunks)
+
+def transcribe_chunks(video_path: str, resume: bool = False) -> Optional[Tuple["ChunkCheckpoint", int]]:
+    """
+    Etapas extract + transcribe: extrai o áudio em pedaços e transcreve cada um,
+    registrando os resultados no checkpoint. Retorna (checkpoint, número de pedaços).
+    """
+    print(f"Iniciando o processo para: {video_path}")
+    debug_print(f"Configurações: CHUNK_SIZE={CHUNK_DURATION_SECONDS}s, MODEL={GROQ_MODEL}, LANG={GROQ_LANGUAGE}, CONCURRENCY={MAX_CONCURRENT_CHUNKS}")
+
+    # 1. Cliente do backend de transcrição (valida a API key da Groq)
+    client = create_transcription_client()
+    if client is None:
+        return None
+
+    # 2. Preparar caminhos
+    os.makedirs(TEMP_DIR, exist_ok=True)
+
+    # 3. Obter duração (e os metadados do áudio, para a extração) e calcular chunks
+    media = probe_media(video_path)
+    if media is None:
+        return None
+    duration = media.duration
+    encoding = choose_audio_encoding(media, CHUNK_STRATEGY == "silence" and SILENCE_DROP_SECONDS > 0)
+
+    num_chunks = math.ceil(duration / encoding.chunk_seconds)
+    print(f"Duração do vídeo: {duration:.2f}s. Dividindo em {num_chunks} pedaço(s).")
+
+    # 4. Checkpoint por vídeo: cada pedaço concluído é registrado assim que termina;
+    #    com resume=True, apenas os pedaços ausentes ou que falharam são refeitos
+    video_key = _video_key(video_path)
+    checkpoint = ChunkCheckpoint(_video_temp_path(video_path, "checkpoint.jsonl"), video_key)
+    if resume and checkpoint.load():
+        print(f"🔁 Retomando do checkpoint: {len(checkpoint.completed)} pedaço(s) já concluído(s)")
+    else:
+        if resume:
+            print("⚠️  Nenhum checkpoint compatível encontrado - processando do início")
+        checkpoint.start(video_path)
+
+    if checkpoint.is_complete():
+        print("🔁 Todos os pedaços já concluídos no checkpoint - extração e API ignoradas.")
+    else:
+        # Se todos os pedaços deste vídeo já estão no cache, nem o ffmpeg é executado
+        cached = _load_cached_chunks(video_key)
+        timeline = None
+        if cached is not None:
+            cached_chunks, timeline = cached
+            print(f"♻️  Todos os {len(cached_chunks)} pedaço(s) encontrados no cache - extração e API ignoradas.")
+            for chunk, transcription in cached_chunks:
+                if chunk.number not in checkpoint.completed:
+                    checkpoint.record_chunk(_chunk_record(chunk, transcription, timeline))
+            checkpoint.record_extraction([chunk for chunk, _ in cached_chunks])
+        else:
+            # Cortes em silêncios (opcional), planejados antes da extração
+            plan = None
+            if CHUNK_STRATEGY == "silence":
+                print("🔍 Procurando silêncios para posicionar os cortes...")
+                plan = plan_chunks(video_path, duration, encoding.chunk_seconds)
+                if plan:
+                    timeline = plan.timeline
+                    num_chunks = len(plan.cut_points) + 1
+                else:
+                    print("⚠️  Usando cortes fixos")
+            expected_audio = plan.sent_duration if plan else duration
+
+            # Extrair o áudio em passada única; cada pedaço chega assim que o ffmpeg o fecha
+            # e já é enviado ao pool, sobrepondo extração e chamadas à API
+            print(f"Extraindo áudio em passada única ({_chunk_concurrency()} pedaço(s) em paralelo)...")
+            extracted = []
+            pending = []
+            executor = _chunk_executor()
+            for chunk in iter_audio_chunks(video_path, _video_temp_prefix(video_path), plan, encoding):
+                extracted.append(chunk)
+                if chunk.number in checkpoint.completed:
+                    print(f"🔁 Pedaço {chunk.number}/{num_chunks} já concluído no checkpoint")
+                    os.remove(chunk.path)
+                    continue
+                print(f"\n--- Pedaço {chunk.number}/{num_chunks} extraído (início: {chunk.start:.2f}s) ---")
+                pending.append(_submit(executor, _process_chunk, client, chunk, num_chunks, checkpoint, timeline))
+            wait(pending)
+
+            # Só considerar a extração completa se os pedaços cobrem o vídeo inteiro
+            if extracted and extracted[-1].end >= expected_audio - max(5.0, expected_audio * 0.01):
+                checkpoint.record_extraction(extracted)
+
+        # Registrar o índice do vídeo no cache apenas se todos os pedaços foram transcritos
+        # e estão no cache (os concluídos com o cache desligado, antes de um --resume, não têm chave)
+        chunks = [
+            {"number": chunk["number"], "start": chunk["start"], "end": chunk["end"],
+             "key": checkpoint.completed[chunk["number"]].get("cache_key")}
+            for chunk in checkpoint.extracted
+        ] if checkpoint.is_complete() else []
+        if chunks and all(chunk["key"] for chunk in chunks):
+            TRANSCRIPTION_CACHE.put(video_key, {
+                "chunks": chunks,
+                "keep_ranges": timeline.keep_ranges if timeline else None,
+            })
+        elif chunks:
+            debug_print("Índice do vídeo não gravado no cache: há pedaços transcritos sem o cache")
+
+    return checkpoint, num_chunks
+
+class TranscriptWriter:
+    """
+    Grava o JSON de uma transcrição incrementalmente, um segment/word por linha:
+    segments vão direto para o arquivo, words e texto para arquivos auxiliares
+    concatenados no close(). A memória usada não depende do tamanho da transcrição.
+    """
+
+    def __init__(self, path: str, build_text: bool = True):
+        self.path = path
+        self.build_text = build_text
+        self.segments = 0
+        self.words = 0
+        self._tmp_path = f"{path}.tmp"
+        # newline="\n": read_transcription_json reconhece o formato pelas linhas exatas
+        self._main = open(self._tmp_path, "w", encoding="utf-8", newline="\n")
+        self._words = open(f"{path}.words.tmp", "w+", encoding="utf-8", newline="\n")
+        self._text = open(f"{path}.text.tmp", "w+", encoding="utf-8", newline="\n") if build_text else None
+        self._text_started = False
+        self._pending_space = ""  # Espaço só é gravado se vier mais texto (equivale ao strip() no fim)
+        self._main.write('{"segments": [')
+
+    def add(self, segments: Sequence, words: Sequence):
+        for segment in segments:
+            self._main.write(("\n" if not self.segments else ",\n") + json.dumps(segment, ensure_ascii=False))
+            self.segments += 1
+        for word in words:
+            self._words.write(("\n" if not self.words else ",\n") + json.dumps(word, ensure_ascii=False))
+            if self._text is not None:
+                # Mesmo resultado de " ".join(palavras).strip(), sem montar a string inteira
+                piece = (" " if self.words else "") + word["word"]
+                if not self._text_started:
+                    piece = piece.lstrip()
+                body = piece.rstrip()
+                if body:
+                    self._text.write(json.dumps(self._pending_space + body, ensure_ascii=False)[1:-1])
+                    self._text_started = True
+                    self._pending_space = piece[len(body):]
+                else:
+                    self._pending_space += piece
+            self.words += 1
+
+    def close(self, duration: float, metadata: Dict[str, Any], text: Optional[str] = None):
+        try:
+            self._main.write('\n],\n"words": [')
+            self._words.seek(0)
+            shutil.copyfileobj(self._words, self._main)
+            self._main.write('\n],\n"text": ')
+            if self._text is not None:
+                self._main.write('"')
+                self._text.seek(0)
+                shutil.copyfileobj(self._text, self._main)
+                self._main.write('"')
+            else:
+                self._main.write(json.dumps(text or "", ensure_ascii=False))
+            self._main.write(f',\n"duration": {json.dumps(duration)},\n"metadata": ')
+            self._main.write(json.dumps(metadata, ensure_ascii=False, indent=2))
+            self._main.write("\n}\n")
+        finally:
+            self.discard(keep_output=True)
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self, keep_output: bool = False):
+        for handle in (self._main, self._words, self._text):
+            if handle is not None and not handle.closed:
+                handle.close()
+                if handle is not self._main:
+                    os.remove(handle.name)
+        if not keep_output and os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+def _loads_line(line: bytes) -> Any:
+    """Registro de uma linha gravada pelo TranscriptWriter (sem a vírgula separadora)"""
+    return json.loads(line.rstrip(b"\r\n").rstrip(b","))
+
+class StreamedRecords(Sequence):
+    """
+    Lista somente-leitura das words de um JSON gravado pelo TranscriptWriter (um
+    registro por linha): guarda só o offset de cada linha, com o arquivo mapeado
+    em memória, e monta cada dicionário quando acessado
+    """
+
+    ITER_BATCH = 4096  # Registros por json.loads ao percorrer a lista inteira
+
+    def __init__(self, path: str, offsets: array):
+        self._offsets = offsets  # len(registros) + 1: o último marca o fim da última linha
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return _loads_line(self._mmap[self._offsets[index]:self._offsets[index + 1]])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Blocos de linhas consecutivas em um único json.loads: bem mais rápido que um por linha
+        for first in range(0, len(self), self.ITER_BATCH):
+            last = min(first + self.ITER_BATCH, len(self))
+            block = self._mmap[self._offsets[first]:self._offsets[last]].rstrip(b",\r\n")
+            yield from json.loads(b"[" + block + b"]")
+
+def read_transcription_json(path: str) -> Dict[str, Any]:
+    """
+    Lê uma transcrição JSON. Se foi gravada pelo TranscriptWriter, text e segments
+    vão para a memória e words fica sob demanda (StreamedRecords); outros arquivos
+    (ex.: indent=2 de versões anteriores) são carregados com json.load
+    """
+    with open(path, "rb") as f:
+        if f.readline() == b'{"segments": [\n':
+            segments = []
+            for line in f:
+                if line == b"],\n":
+                    break
+                segments.append(_loads_line(line))
+            if f.readline() == b'"words": [\n':
+                offsets = array("q", [f.tell()])
+                for line in f:
+                    if line == b"],\n":
+                        break
+                    offsets.append(offsets[-1] + len(line))
+                text_line = f.readline()
+                if text_line.startswith(b'"text": '):
+                    data = json.loads(b"{" + text_line + f.read())
+                    data["segments"] = segments
+                    data["words"] = StreamedRecords(path, offsets)
+                    return data
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_transcription_file(path: str, transcription: TranscriptionResult):
+    """Grava uma TranscriptionResult em JSON (um segment/word por linha), sem copiar as listas"""
+    writer = TranscriptWriter(path, build_text=False)
+    try:
+        writer.add(transcription.segments, transcription.words)
+    except Exception:
+        writer.discard()
+        raise
+    writer.close(transcription.duration, transcription.metadata, text=transcription.text)
+
+def merge_transcription(video_path: str, checkpoint: "ChunkCheckpoint", num_chunks: int) -> Dict[str, Any]:
+    """
+    Etapa merge: junta os pedaços do checkpoint em temp/{arquivo}_transcription.json.
+    Cada pedaço é lido do checkpoint e gravado no arquivo antes do próximo; o
+    resultado volta com as words sob demanda (read_transcription_json).
+    """
+    final_transcription_path = _video_temp_path(video_path, "transcription.json")
+
+    # 5. Juntar os resultados na ordem dos pedaços (timestamps já ajustados no checkpoint)
+    missing_chunks = checkpoint.missing_chunks(num_chunks)
+    if missing_chunks:
+        print(f"\n⚠️  {len(missing_chunks)} pedaço(s) sem transcrição: {', '.join(map(str, missing_chunks))}")
+        print("   Execute novamente com --resume para refazer apenas esses pedaços.")
+
+    # 6. Gravar o JSON final pedaço por pedaço
+    transcribed_duration = 0.0
+    with METRICS.span("write.transcription") as span:
+        writer = TranscriptWriter(final_transcription_path)
+        try:
+            for record in checkpoint.iter_records():
+                writer.add(record["segments"], record["words"])
+                transcribed_duration += record["duration"]
+        except Exception:
+            writer.discard()
+            raise
+        writer.close(transcribed_duration, {
+            "original_file": video_path,
+            "chunks_processed": num_chunks,
+            "model_used": GROQ_MODEL,
+            "language": GROQ_LANGUAGE,
+            "chunk_size_seconds": CHUNK_DURATION_SECONDS,
+            "missing_chunks": missing_chunks,
+            "processed_at": datetime.now().isoformat()
+        })
+        span["bytes_out"] = os.path.getsize(final_transcription_path)
+
+    print(f"\n--- Processo Concluído ---")
+    print(f"Transcrição final combinada e salva em: {final_transcription_path}")
+    
+    debug_print(f"Final stats: {writer.words} words, {writer.segments} segments, {transcribed_duration:.2f}s")
+
+    if TRANSCRIPTION_CACHE.enabled:
+        TRANSCRIPTION_CACHE.evict()
+        print(f"♻️  Cache de transcrições: {TRANSCRIPTION_CACHE.summary()}")
+
+    return read_transcription_json(final_transcription_path)
+
+# --- FORMATO COMPACTO (COLUNAR) ---
+#
+# Layout do arquivo .tcol:
+#   8 bytes  assinatura b"TCOL\x01\x00\x00\x00"
+#   8 bytes  tamanho do cabeçalho JSON (uint64 little-endian)
+#   N bytes  cabeçalho JSON (tabelas, colunas e seus offsets)
+#   dados    colunas como arrays contíguos, alinhados em 8 bytes
+#
+# Cada campo de segments/words vira uma coluna: números em float64/int64,
+# textos em um blob UTF-8 + offsets, listas de inteiros (tokens) achatadas
+# + offsets. O carregamento usa mmap e monta cada dicionário só quando acessado.
+
+COMPACT_MAGIC = b"TCOL\x01\x00\x00\x00"
+
+def _column_kind(values: List[Any]) -> str:
+    present = [v for v in values if v is not None]
+    if len(present) != len(values):
+        return "json"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "float"
+    if all(isinstance(v, str) for v in values):
+        return "str"
+    if all(isinstance(v, list) and all(isinstance(x, int) for x in v) for v in values):
+        return "int_list"
+    return "json"
+
+class _CompactWriter:
+    """Acumula as colunas em um buffer, registrando offset e tipo de cada uma"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.columns: Dict[str, Dict[str, Any]] = {}
+
+    def _add_array(self, name: str, values: array) -> Dict[str, Any]:
+        self.data.extend(b"\0" * (-len(self.data) % 8))
+        entry = {"typecode": values.typecode, "offset": len(self.data), "count": len(values)}
+        self.data.extend(values.tobytes())
+        self.columns[name] = entry
+        return entry
+
+    def add_blob(self, name: str, strings: List[str]):
+        offsets = array("q", [0])
+        blob = bytearray()
+        for value in strings:
+            blob.extend(value.encode("utf-8"))
+            offsets.append(len(blob))
+        self._add_array(f"{name}#offsets", offsets)
+        self.data.extend(b"\0" * (-len(self.data) % 8))
+        self.columns[f"{name}#blob"] = {"offset": len(self.data), "length": len(blob)}
+        self.data.extend(blob)
+
+    def add_column(self, name: str, kind: str, values: List[Any]):
+        if kind == "int":
+            self._add_array(name, array("q", values))
+        elif kind == "float":
+            self._add_array(name, array("d", values))
+        elif kind == "str":
+            self.add_blob(name, values)
+        elif kind == "int_list":
+            offsets = array("q", [0])
+            flat = array("q")
+            for value in values:
+                flat.extend(value)
+                offsets.append(len(flat))
+            self._add_array(f"{name}#offsets", offsets)
+            self._add_array(f"{name}#values", flat)
+        else:
+            self.add_blob(name, [json.dumps(v, ensure_ascii=False) for v in values])
+
+def save_compact_transcription(data: Dict[str, Any], path: str) -> str:
+    """Salva a transcrição (mesmo conteúdo do transcricao.json) no formato colunar .tcol"""
+    writer = _CompactWriter()
+    tables = {}
+    for table in ("segments", "words"):
+        records = list(data.get(table, []))
+        fields: List[str] = []
+        for record in records:
+            for field in record:
+                if field not in fields:
+                    fields.append(field)
+        kinds = {}
+        for field in fields:
+            values = [record.get(field) for record in records]
+            kinds[field] = _column_kind(values)
+            writer.add_column(f"{table}.{field}", kinds[field], values)
+        tables[table] = {"count": len(records), "fields": kinds}
+    writer.add_blob("text", [data.get("text", "")])
+
+    header = json.dumps({
+        "version": 1,
+        "byteorder": sys.byteorder,
+        "duration": data.get("duration", 0.0),
+        "metadata": data.get("metadata", {}),
+        "tables": tables,
+        "columns": writer.columns,
+    }, ensure_ascii=False).encode("utf-8")
+    header += b" " * (-len(header) % 8)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(COMPACT_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(writer.data)
+    os.replace(tmp_path, path)
+    return path
+
+class _CompactColumns:
+    """Acesso às colunas de um arquivo .tcol mapeado em memória"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:8] != COMPACT_MAGIC:
+            raise ValueError(f"{path} não é um arquivo de transcrição compacta")
+        header_length = struct.unpack("<Q", self._mmap[8:16])[0]
+        self.header = json.loads(bytes(self._mmap[16:16 + header_length]))
+        self._data = memoryview(self._mmap)[16 + header_length:]
+        self._swap = self.header["byteorder"] != sys.byteorder
+        self._arrays: Dict[str, Any] = {}
+
+    def array(self, name: str):
+        """Coluna numérica sem cópia (memoryview tipada), exceto se a ordem de bytes diferir"""
+        if name not in self._arrays:
+            entry = self.header["columns"][name]
+            size = array(entry["typecode"]).itemsize
+            raw = self._data[entry["offset"]:entry["offset"] + entry["count"] * size]
+            if self._swap:
+                values = array(entry["typecode"], raw.tobytes())
+                values.byteswap()
+                self._arrays[name] = values
+            else:
+                self._arrays[name] = raw.cast(entry["typecode"])
+        return self._arrays[name]
+
+    def string(self, name: str, index: int) -> str:
+        offsets = self.array(f"{name}#offsets")
+        blob = self.header["columns"][f"{name}#blob"]["offset"]
+        return bytes(self._data[blob + offsets[index]:blob + offsets[index + 1]]).decode("utf-8")
+
+    def value(self, table: str, field: str, kind: str, index: int) -> Any:
+        name = f"{table}.{field}"
+        if kind in ("int", "float"):
+            return self.array(name)[index]
+        if kind == "str":
+            return self.string(name, index)
+        if kind == "int_list":
+            offsets = self.array(f"{name}#offsets")
+            return list(self.array(f"{name}#values")[offsets[index]:offsets[index + 1]])
+        return json.loads(self.string(name, index))
+
+class CompactRecords(Sequence):
+    """Lista somente-leitura de segments/words; cada dicionário é montado sob demanda"""
+
+    def __init__(self, columns: _CompactColumns, table: str):
+        self._columns = columns
+        self._table = table
+        self._fields = columns.header["tables"][table]["fields"]
+        self._count = columns.header["tables"][table]["count"]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        record = {}
+        for field, kind in self._fields.items():
+            value = self._columns.value(self._table, field, kind, index)
+            if kind == "json" and value is None:
+                continue  # Campo ausente neste registro
+            record[field] = value
+        return record
+
+    def column(self, field: str):
+        """Coluna numérica inteira (ex.: 'start') sem montar os dicionários"""
+        return self._columns.array(f"{self._table}.{field}")
+
+def load_compact_transcription(path: str) -> TranscriptionResult:
+    """Carrega um .tcol como TranscriptionResult; segments/words são lidos sob demanda"""
+    columns = _CompactColumns(path)
+    return TranscriptionResult(
+        text=columns.string("text", 0),
+        segments=CompactRecords(columns, "segments"),
+        words=CompactRecords(columns, "words"),
+        duration=columns.header["duration"],
+        metadata=columns.header["metadata"],
+    )
+
+def load_transcription(path: str) -> TranscriptionResult:
+    """Carrega uma transcrição salva (transcricao.json ou .tcol)"""
+    if path.endswith(".tcol"):
+        return load_compact_transcription(path)
+    data = read_transcription_json(path)
+    return TranscriptionResult(
+        text=data["text"],
+        segments=data["segments"],
+        words=data["words"],
+        duration=data["duration"],
+        metadata=data.get("metadata", {}),
+    )
+
+# --- ÍNDICE DE BUSCA ---
+#
+# Índice invertido em SQLite: para cada (termo, aula) uma linha com as posições
+# das palavras e os tempos de início (ms) como arrays uint32 em BLOB. Termos
+# ficam em minúsculas e sem acentos; a busca lê só as linhas dos termos pedidos,
+# começando pelo mais raro e restringindo os demais às aulas candidatas.
+
+SEARCH_INDEX_VERSION = 1
+TRANSCRIPT_FILES = ("transcricao.tcol", "transcricao.json")  # O compacto carrega mais rápido
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def fold_text(text: str) -> str:
+    """Minúsculas e sem acentos ("Configuração" → "configuracao")"""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def search_tokens(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(fold_text(text))
+
+def _fresh_transcript(json_path: Path) -> Path:
+    """O .tcol ao lado do .json quando existe e não é mais antigo que ele (senão sobrou de um render anterior)"""
+    sidecar = json_path.with_suffix(".tcol")
+    try:
+        if sidecar.stat().st_mtime_ns >= json_path.stat().st_mtime_ns:
+            return sidecar
+    except OSError:
+        pass
+    return json_path
+
+def _lesson_transcript(lesson_dir: Path) -> Optional[Path]:
+    compact, full = (lesson_dir / name for name in TRANSCRIPT_FILES)
+    if full.exists():
+        return _fresh_transcript(full)
+    return compact if compact.exists() else None
+
+def _parse_search_query(query: str) -> List[List[str]]:
+    """Cada trecho entre aspas vira uma frase; as demais palavras são termos (todos obrigatórios)"""
+    units = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        tokens = search_tokens(phrase or word)
+        if tokens:
+            units.append(tokens)
+    return units
+
+def _sequence_starts(postings: Dict[str, Dict[int, Tuple[array, array]]], lesson_id: int,
+                     unit: List[str]) -> List[int]:
+    """Tempos (ms) em que os termos aparecem em posições consecutivas na aula"""
+    positions, starts = postings[unit[0]][lesson_id]
+    following = [set(postings[term][lesson_id][0]) for term in unit[1:]]
+    return [start for position, start in zip(positions, starts)
+            if all(position + offset in found for offset, found in enumerate(following, 1))]
+
+class SearchIndex:
+    """
+    Índice de busca das aulas (modulo-XX/aula-*): termo sem acentos → aula,
+    posição da palavra e tempo de início. sync() só reindexa aulas novas ou
+    alteradas (tamanho/mtime da transcrição) e remove as que sumiram.
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[Any]:
+        import sqlite3  # Só os modos de busca/indexação precisam dele
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=REQUEST_TIMEOUT)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version != SEARCH_INDEX_VERSION:
+                    conn.executescript(f"""
+                        DROP TABLE IF EXISTS postings;
+                        DROP TABLE IF EXISTS lessons;
+                        CREATE TABLE lessons (
+                            id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, signature TEXT NOT NULL,
+                            modulo INTEGER, aula INTEGER, title TEXT, words INTEGER NOT NULL, duration REAL
+                        );
+                        CREATE TABLE postings (
+                            term TEXT NOT NULL, lesson_id INTEGER NOT NULL, count INTEGER NOT NULL,
+                            positions BLOB NOT NULL, starts_ms BLOB NOT NULL,
+                            PRIMARY KEY (term, lesson_id)
+                        ) WITHOUT ROWID;
+                        CREATE INDEX postings_lesson ON postings (lesson_id);
+                        PRAGMA user_version = {SEARCH_INDEX_VERSION};
+                    """)
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _index_lesson(self, conn: Any, lesson_dir: Path, transcript_path: Path, signature: str):
+        transcription = load_transcription(str(transcript_path))
+        postings: Dict[str, Tuple[array, array]] = {}
+        position = 0
+        for word in transcription.words:
+            start_ms = int(round(float(word.get("start") or 0.0) * 1000))
+            for token in search_tokens(word.get("word", "")):
+                positions, starts = postings.setdefault(token, (array("I"), array("I")))
+                positions.append(position)
+                starts.append(start_ms)
+                position += 1
+
+        title = None
+        analysis_path = lesson_dir / "analise.json"
+        if analysis_path.exists():
+            try:
+                title = json.loads(analysis_path.read_text(encoding="utf-8")).get("titulo_sugerido")
+            except (OSError, ValueError):
+                pass
+        numbers = {key: re.search(rf"{key}-(\d+)", part) for key, part in
+                   (("modulo", lesson_dir.parent.name), ("aula", lesson_dir.name))}
+
+        path = str(lesson_dir)
+        conn.execute("DELETE FROM postings WHERE lesson_id = (SELECT id FROM lessons WHERE path = ?)", (path,))
+        conn.execute("DELETE FROM lessons WHERE path = ?", (path,))
+        lesson_id = conn.execute(
+            "INSERT INTO lessons (path, signature, modulo, aula, title, words, duration) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, signature, *(int(m.group(1)) if m else None for m in numbers.values()),
+             title or lesson_dir.name, position, transcription.duration)).lastrowid
+        conn.executemany(
+            "INSERT INTO postings (term, lesson_id, count, positions, starts_ms) VALUES (?, ?, ?, ?, ?)",
+            ((term, lesson_id, len(positions), positions.tobytes(), starts.tobytes())
+             for term, (positions, starts) in postings.items()))
+
+    def _signature(self, transcript_path: Path) -> str:
+        stat = transcript_path.stat()
+        return f"{transcript_path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def update_lesson(self, lesson_dir: str) -> bool:
+        """Indexa (ou reindexa) uma aula; retorna False se ela não tem transcrição"""
+        lesson = Path(lesson_dir)
+        transcript_path = _lesson_transcript(lesson)
+        if transcript_path is None:
+            return False
+        with self._connect() as conn:
+            self._index_lesson(conn, lesson, transcript_path, self._signature(transcript_path))
+        return True
+
+    def sync(self, root: str = ".") -> Dict[str, int]:
+        """Sincroniza o índice com as aulas em root/*/*/ (novas, alteradas e removidas)"""
+        lessons = {}
+        for lesson_dir in sorted({path.parent for name in TRANSCRIPT_FILES for path in Path(root).glob(f"*/*/{name}")}):
+            lessons[str(lesson_dir)] = _lesson_transcript(lesson_dir)
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        with self._connect() as conn:
+            indexed = dict(conn.execute("SELECT path, signature FROM lessons"))
+            root_prefix = str(Path(root)) + os.sep if str(Path(root)) != "." else ""
+            for path, signature in indexed.items():
+                if path not in lessons and path.startswith(root_prefix):
+                    conn.execute("DELETE FROM postings WHERE lesson_id = (SELECT id FROM lessons WHERE path = ?)", (path,))
+                    conn.execute("DELETE FROM lessons WHERE path = ?", (path,))
+                    counts["removed"] += 1
+            for path, transcript_path in lessons.items():
+                signature = self._signature(transcript_path)
+                if indexed.get(path) == signature:
+                    counts["unchanged"] += 1
+                    continue
+                try:
+                    self._index_lesson(conn, Path(path), transcript_path, signature)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️  Não foi possível indexar {path}: {e}")
+                    continue
+                counts["updated" if path in indexed else "added"] += 1
+                conn.commit()  # Uma transação por aula: interromper não perde as anteriores
+        return counts
+
+    def search(self, query: str, limit: int = 10, hits_per_lesson: int = 5) -> List[Dict[str, Any]]:
+        """
+        Aulas que contêm todos os termos/frases da consulta, ordenadas por BM25,
+        com os tempos (s) das ocorrências. Sem aspas, ocorrências das palavras em
+        sequência são preferidas como pontos de salto.
+        """
+        units = _parse_search_query(query)
+        if not units:
+            return []
+        terms = list(dict.fromkeys(token for unit in units for token in unit))
+        with self._connect() as conn:
+            total, average_words = conn.execute("SELECT COUNT(*), AVG(words) FROM lessons").fetchone()
+            if not total:
+                return []
+            frequency = {term: conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+                         for term in terms}
+            if not all(frequency.values()):
+                return []
+
+            # Do termo mais raro ao mais comum, lendo só as aulas que ainda são candidatas
+            postings: Dict[str, Dict[int, Tuple[array, array]]] = {}
+            candidates: Optional[List[int]] = None
+            for term in sorted(terms, key=frequency.get):
+                sql = "SELECT lesson_id, positions, starts_ms FROM postings WHERE term = ?"
+                params: List[Any] = [term]
+                if candidates is not None:
+                    sql += f" AND lesson_id IN ({','.join('?' * len(candidates))})"
+                    params += candidates
+                rows = {}
+                for lesson_id, positions, starts in conn.execute(sql, params):
+                    rows[lesson_id] = (array("I", positions), array("I", starts))
+                postings[term] = rows
+                candidates = sorted(rows)
+                if not candidates:
+                    return []
+
+            lesson_words = dict(conn.execute("SELECT id, words FROM lessons"))
+            results = []
+            for lesson_id in candidates:
+                matches = [_sequence_starts(postings, lesson_id, unit) for unit in units]
+                if not all(matches):
+                    continue  # Frase entre aspas sem ocorrência em sequência
+                words = lesson_words[lesson_id]
+                score = 0.0
+                for unit, found in zip(units, matches):
+                    document_frequency = min(frequency[term] for term in unit)
+                    idf = math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+                    tf = len(found)
+                    score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * words / (average_words or 1)))
+
+                jump_points = _sequence_starts(postings, lesson_id, terms) if len(units) > 1 else []
+                if jump_points:
+                    score *= 1.5  # Termos juntos valem mais que espalhados pela aula
+                else:
+                    jump_points = min(matches, key=len)
+                results.append({"lesson_id": lesson_id, "score": score,
+                                "matches": sum(len(found) for found in matches),
+                                "hits": [start / 1000 for start in jump_points[:hits_per_lesson]]})
+
+            results.sort(key=lambda result: -result["score"])
+            results = results[:limit]
+            for result in results:
+                path, modulo, aula, title, duration = conn.execute(
+                    "SELECT path, modulo, aula, title, duration FROM lessons WHERE id = ?",
+                    (result.pop("lesson_id"),)).fetchone()
+                result.update(path=path, modulo=modulo, aula=aula, title=title, duration=duration)
+        return results
+
+SEARCH_INDEX = SearchIndex()
+
+def print_search_results(query: str, limit: int = 10):
+    started = time.perf_counter()
+    results = SEARCH_INDEX.search(query, limit=limit)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"🔎 {query}: {len(results)} aula(s) em {elapsed_ms:.1f} ms")
+    for rank, result in enumerate(results, 1):
+        label = " · ".join(f"{name} {number:02d}" for name, number in
+                           (("Módulo", result["modulo"]), ("Aula", result["aula"])) if number is not None)
+        print(f"\n{rank:2d}. {label + ' - ' if label else ''}{result['title']} ({result['matches']} ocorrência(s))")
+        print(f"    📁 {result['path']}")
+        print(f"    ⏱️  {', '.join(_format_timestamp(hit) for hit in result['hits'])}")
+
+# --- CONSULTA POR TEMPO ---
+#
+# Acesso aleatório a uma transcrição salva: os tempos de início/fim de words e
+# segments ficam em arrays ordenados (no .tcol, as próprias colunas do mmap, sem
+# cópia) e cada consulta é uma busca binária em vez de percorrer a lista inteira.
+
+def parse_timestamp(value: str) -> float:
+    """Converte "750", "12:30" ou "1:02:03.5" em segundos"""
+    parts = value.strip().split(":")
+    if len(parts) > 3:
+        raise ValueError(f"Tempo inválido: {value}")
+    seconds = 0.0
+    for part in parts:
+        try:
+            number = float(part)
+        except ValueError:
+            raise ValueError(f"Tempo inválido: {value}") from None
+        if not 0 <= number < math.inf:
+            raise ValueError(f"Tempo inválido: {value}")
+        seconds = seconds * 60 + number
+    return seconds
+
+def resolve_transcript_path(path: str) -> Optional[str]:
+    """
+    Arquivo a abrir para uma pasta de aula ou transcrição: prefere o .tcol (mapeado
+    em memória) quando existe ao lado do .json e não é mais antigo que ele
+    """
+    candidate = Path(path)
+    if candidate.is_dir():
+        found = _lesson_transcript(candidate)
+        return str(found) if found else None
+    if not candidate.exists():
+        return None
+    if candidate.suffix == ".json":
+        return str(_fresh_transcript(candidate))
+    return str(candidate)
+
+def _time_columns(records: Sequence) -> Tuple[Sequence, Sequence]:
+    """Tempos de início e fim dos registros; no .tcol são as colunas do arquivo, sem montar dicionários"""
+    if isinstance(records, CompactRecords):
+        try:
+            return records.column("start"), records.column("end")
+        except KeyError:
+            pass  # Coluna com valores ausentes (gravada como JSON): lê registro a registro
+    starts, ends = array("d"), array("d")
+    for record in records:
+        starts.append(float(record.get("start") or 0.0))
+        ends.append(float(record.get("end") or 0.0))
+    return starts, ends
+
+class _TimeIndex:
+    """Tempos de uma tabela (words ou segments) ordenados pelo início, para busca binária"""
+
+    def __init__(self, records: Sequence):
+        self.records = records
+        self.starts, self.ends = _time_columns(records)
+        self.order: Optional[array] = None  # Posição ordenada → índice do registro (só se a origem estiver fora de ordem)
+        if any(previous > current for previous, current in zip(self.starts, self.starts[1:])):
+            order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+            self.order = array("q", order)
+            self.starts = array("d", (self.starts[i] for i in order))
+            self.ends = array("d", (self.ends[i] for i in order))
+        # Maior duração de um registro: limita até onde um registro anterior ainda pode cobrir um instante
+        self.max_span = max((end - start for start, end in zip(self.starts, self.ends)), default=0.0)
+
+    def record(self, position: int) -> Dict[str, Any]:
+        return self.records[self.order[position] if self.order is not None else position]
+
+    def between(self, start: float, end: float) -> List[int]:
+        """Posições dos registros que se sobrepõem a [start, end)"""
+        first = bisect.bisect_left(self.starts, start - self.max_span)
+        last = bisect.bisect_left(self.starts, end)
+        return [position for position in range(first, last)
+                if self.ends[position] > start or self.starts[position] >= start]
+
+    def at(self, t: float) -> Optional[int]:
+        """Posição do registro em andamento no instante t, ou None (silêncio)"""
+        position = bisect.bisect_right(self.starts, t) - 1
+        while position >= 0 and self.starts[position] >= t - self.max_span:
+            if self.ends[position] > t:
+                return position
+            position -= 1
+        return None
+
+class TranscriptReader:
+    """
+    Consultas por tempo em uma transcrição salva (pasta da aula, transcricao.json
+    ou .tcol), aberta uma única vez: o que foi dito entre dois instantes e o que
+    estava sendo dito em um instante. Os dicionários só são montados para os
+    registros devolvidos.
+    """
+
+    def __init__(self, path: str):
+        resolved = resolve_transcript_path(path)
+        if resolved is None:
+            raise FileNotFoundError(f"Transcrição não encontrada: {path}")
+        self.path = resolved
+        self.transcription = load_transcription(resolved)
+        self.duration = self.transcription.duration
+        self._words = _TimeIndex(self.transcription.words)
+        self._segments = _TimeIndex(self.transcription.segments)
+
+    def words_between(self, start: float, end: float) -> List[Dict[str, Any]]:
+        return [self._words.record(position) for position in self._words.between(start, end)]
+
+    def segments_between(self, start: float, end: float) -> List[Dict[str, Any]]:
+        return [self._segments.record(position) for position in self._segments.between(start, end)]
+
+    def text_between(self, start: float, end: float) -> str:
+        """Texto das palavras entre os dois instantes (mais preciso que os segmentos inteiros)"""
+        return " ".join(word.get("word", "").strip() for word in self.words_between(start, end)).strip()
+
+    def word_at(self, t: float) -> Optional[Dict[str, Any]]:
+        position = self._words.at(t)
+        return self._words.record(position) if position is not None else None
+
+    def segment_at(self, t: float) -> Optional[Dict[str, Any]]:
+        position = self._segments.at(t)
+        return self._segments.record(position) if position is not None else None
+
+    def segments_at(self, times: Sequence[float]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Segmento em andamento em cada instante (ex.: quadros de uma legenda ao vivo);
+        cada segmento é montado uma vez, mesmo que vários instantes caiam nele
+        """
+        built: Dict[int, Dict[str, Any]] = {}
+        results = []
+        for t in times:
+            position = self._segments.at(t)
+            if position is None:
+                results.append(None)
+                continue
+            if position not in built:
+                built[position] = self._segments.record(position)
+            results.append(built[position])
+        return results
+
+def print_transcript_query(reader: TranscriptReader, start: float, end: Optional[float] = None,
+                           as_json: bool = False):
+    """Mostra o que foi dito em um instante (end=None) ou entre dois instantes"""
+    if end is None:
+        segment, word = reader.segment_at(start), reader.word_at(start)
+        if as_json:
+            print(json.dumps({"time": start, "segment": segment, "word": word}, ensure_ascii=False, indent=2))
+            return
+        print(f"⏱️  {_format_timestamp(start)} em {reader.path}")
+        if segment is None:
+            print("🤫 Nada sendo dito neste instante")
+            return
+        print(f"🗣️  [{_format_timestamp(segment.get('start'))}-{_format_timestamp(segment.get('end'))}] "
+              f"{segment.get('text', '').strip()}")
+        if word is not None:
+            print(f"💬 Palavra: {word.get('word', '').strip()} ({word.get('start', 0):.2f}s)")
+        return
+
+    words = reader.words_between(start, end)
+    if as_json:
+        print(json.dumps({"start": start, "end": end, "text": reader.text_between(start, end),
+                          "segments": reader.segments_between(start, end), "words": words},
+                         ensure_ascii=False, indent=2))
+        return
+    segments = reader.segments_between(start, end)
+    print(f"⏱️  {_format_timestamp(start)} até {_format_timestamp(end)} em {reader.path}: "
+          f"{len(words)} palavra(s), {len(segments)} segmento(s)")
+    for segment in segments:
+        print(f"   [{_format_timestamp(segment.get('start'))}] {segment.get('text', '').strip()}")
+
+# --- VOCABULÁRIO DE TECNOLOGIAS E COMANDOS ---
+#
+# Análise básica (sem Gemini): uma trie de sequências de tokens, montada uma vez
+# a partir do vocabulário, percorre as palavras da transcrição em uma única
+# passada. Cada posição anda no máximo a profundidade da trie, então o custo é
+# linear no texto e não depende de quantos termos o vocabulário tem. Como a
+# comparação é por token inteiro, "api" não casa dentro de "rapidamente".
+#
+# Arquivo de vocabulário (KEYWORD_VOCABULARY_FILE), somado ao padrão abaixo:
+#   {"tecnologias": {"node.js": "Node.js", "next js": "Next.js"},
+#    "comandos": ["docker compose", "kubectl", "terraform"]}
+# Um comando casa com o prefixo seguido de mais uma palavra ("docker compose up").
+
+DEFAULT_TECH_KEYWORDS = {
+    "docker": "Docker", "n8n": "N8N", "postgres": "PostgreSQL", "redis": "Redis",
+    "traefik": "Traefik", "portainer": "Portainer", "javascript": "JavaScript",
+    "python": "Python", "nodejs": "Node.js", "node.js": "Node.js", "react": "React", "vue": "Vue.js",
+    "api": "API", "webhook": "Webhook", "json": "JSON", "sql": "SQL", "html": "HTML", "css": "CSS",
+}
+DEFAULT_COMMAND_PREFIXES = ["docker", "npm", "pip", "git", "sudo", "chmod", "mkdir", "cd"]
+_KEYWORD_TOKEN_PATTERN = re.compile(r"\w+(?:\+\+|#)?")  # Mantém "c++" e "c#" como um token
+
+def keyword_tokens(text: str) -> List[str]:
+    return _KEYWORD_TOKEN_PATTERN.findall(fold_text(text))
+
+def _timed_tokens(transcription: TranscriptionResult) -> Iterator[Tuple[str, Optional[float]]]:
+    """Tokens da transcrição com o início (s) da palavra; sem words, usa os segmentos ou o texto"""
+    records = transcription.words if len(transcription.words) else transcription.segments
+    if not len(records):
+        for token in keyword_tokens(transcription.text):
+            yield token, None
+        return
+    field = "word" if records is transcription.words else "text"
+    for record in records:
+        start = record.get("start")
+        for token in keyword_tokens(record.get(field, "")):
+            yield token, start
+
+class KeywordScanner:
+    """
+    Busca simultânea de todas as tecnologias e comandos do vocabulário. scan()
+    devolve, para cada tecnologia e cada comando encontrado, a contagem e o
+    tempo da primeira ocorrência.
+    """
+
+    def __init__(self, technologies: Dict[str, str], commands: List[str]):
+        self._root: Dict[str, Any] = {}
+        self.size = 0
+        depth = 0
+        for kind, entries in (("tech", technologies.items()), ("command", ((c, c) for c in commands))):
+            for term, label in entries:
+                tokens = keyword_tokens(term)
+                if not tokens:
+                    continue
+                node = self._root
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                node.setdefault("", {})[kind] = label  # "" nunca é token: guarda o que termina neste nó
+                depth = max(depth, len(tokens))
+                self.size += 1
+        self.depth = depth + 1  # Tokens olhados à frente: o termo mais longo + o argumento do comando
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordScanner":
+        """Vocabulário padrão somado ao do arquivo JSON"""
+        technologies = dict(DEFAULT_TECH_KEYWORDS)
+        commands = list(DEFAULT_COMMAND_PREFIXES)
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                vocabulary = json.load(f)
+            technologies.update(vocabulary.get("tecnologias", {}))
+            commands.extend(vocabulary.get("comandos", []))
+        return cls(technologies, commands)
+
+    def scan(self, tokens: Iterator[Tuple[str, Optional[float]]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        {"tecnologias": {nome: {"count", "first"}}, "comandos": {"npm install": {...}}}.
+        Em cada posição vale o termo mais longo, e os tokens cobertos por ele
+        não iniciam outro termo do mesmo tipo ("node js" não conta também "js").
+        """
+        found: Dict[str, Dict[str, Dict[str, Any]]] = {"tecnologias": {}, "comandos": {}}
+        window: deque = deque()
+        skip = {"tech": 0, "command": 0}
+
+        def record(kind: str, name: str, first: Optional[float]):
+            table = found["tecnologias" if kind == "tech" else "comandos"]
+            if name in table:
+                table[name]["count"] += 1
+            else:
+                table[name] = {"count": 1, "first": first}
+
+        def match_window():
+            longest: Dict[str, Tuple[int, str]] = {}
+            node = self._root
+            for length, (token, _) in enumerate(window, 1):
+                node = node.get(token)
+                if node is None:
+                    break
+                for kind, label in node.get("", {}).items():
+                    if kind == "command" and length == len(window):
+                        continue  # Comando sem argumento (fim da transcrição)
+                    longest[kind] = (length, label)
+            start = window[0][1]
+            for kind in ("tech", "command"):
+                if skip[kind]:
+                    skip[kind] -= 1
+                elif kind in longest:
+                    length, label = longest[kind]
+                    if kind == "command":
+                        label = f"{label} {window[length][0]}"
+                        length += 1
+                    record(kind, label, start)
+                    skip[kind] = length - 1
+
+        for item in tokens:
+            window.append(item)
+            if len(window) > self.depth:
+                match_window()
+                window.popleft()
+        while window:
+            match_window()
+            window.popleft()
+        return found
+
+_KEYWORD_SCANNER: Optional[KeywordScanner] = None
+_KEYWORD_SCANNER_LOCK = threading.Lock()
+
+def keyword_scanner() -> KeywordScanner:
+    """Scanner do vocabulário configurado, montado uma vez por processo"""
+    global _KEYWORD_SCANNER
+    with _KEYWORD_SCANNER_LOCK:
+        if _KEYWORD_SCANNER is None:
+            try:
+                _KEYWORD_SCANNER = KeywordScanner.from_file(KEYWORD_VOCABULARY_FILE)
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"⚠️  Não foi possível carregar o vocabulário {KEYWORD_VOCABULARY_FILE}: {e}")
+                _KEYWORD_SCANNER = KeywordScanner(DEFAULT_TECH_KEYWORDS, DEFAULT_COMMAND_PREFIXES)
+            debug_print(f"Vocabulário da análise básica: {_KEYWORD_SCANNER.size} termos")
+        return _KEYWORD_SCANNER
+
+def _keyword_vocabulary_signature() -> Optional[str]:
+    """Conteúdo do vocabulário (entra no fingerprint da análise básica)"""
+    if KEYWORD_VOCABULARY_FILE and os.path.exists(KEYWORD_VOCABULARY_FILE):
+        return _hash_file(KEYWORD_VOCABULARY_FILE)
+    return None
+
+def _ranked(found: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Mais citados primeiro; empate pela primeira ocorrência"""
+    return sorted(found, key=lambda name: (-found[name]["count"], found[name]["first"] or 0.0))
+
+# --- DIVISÃO DA TRANSCRIÇÃO PARA ANÁLISE ---
+
+# Versão dos prompts de análise: incremente ao alterar qualquer prompt
+# para invalidar as análises guardadas no cache
+ANALYSIS_PROMPT_VERSION = 1
+
+# System instruction otimizada para análise educacional
+ANALYSIS_SYSTEM_INSTRUCTION = """Você é um especialista em análise de conteúdo educacional técnico. 
+        Sua função é extrair informações estruturadas de transcrições de aulas técnicas, 
+        identificando conceitos, tecnologias, comandos e organizando o conhecimento de forma didática.
+        
+        Seja preciso, técnico e educativo. Extraia apenas informações que estão explicitamente 
+        presentes na transcrição. Mantenha consistência terminológica."""
+
+def split_transcript_for_analysis(text: str, segments: List[Dict], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Divide a transcrição em partes de até ~max_tokens (1 token ≈ 4 caracteres),
+    sempre em fronteiras de segmento para não cortar frases ao meio.
+    Cada parte: {"start", "end", "text"} com tempos em segundos.
+    """
+    max_chars = max(1, max_tokens * 4)
+    parts = []
+
+    if not segments:
+        # Sem segmentos: cortar o texto no último espaço antes do limite
+        position = 0
+        while position < len(text):
+            end = len(text) if len(text) - position <= max_chars else \
+                text.rfind(" ", position, position + max_chars)
+            if end <= position:
+                end = position + max_chars
+            parts.append({"start": None, "end": None, "text": text[position:end].strip()})
+            position = end
+        return [part for part in parts if part["text"]]
+
+    current: List[Dict] = []
+    current_chars = 0
+    for segment in segments:
+        segment_text = segment.get("text", "").strip()
+        if current and current_chars + len(segment_text) + 1 > max_chars:
+            parts.append(current)
+            current, current_chars = [], 0
+        current.append(segment)
+        current_chars += len(segment_text) + 1
+    if current:
+        parts.append(current)
+
+    return [{
+        "start": part[0].get("start", 0),
+        "end": part[-1].get("end", 0),
+        "text": " ".join(segment.get("text", "").strip() for segment in part),
+    } for part in parts]
+
+def _format_timestamp(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{secs:02d}"
+
+# --- PIPELINE POR ETAPAS ---
+
+# extract e transcribe rodam juntas: cada pedaço é enviado assim que o ffmpeg o fecha
+PIPELINE_STAGES = ["extract", "transcribe", "merge", "analyse", "render"]
+FUSED_STAGES = ("extract", "transcribe")
+
+# Versão do template do README/arquivos da aula: incremente ao alterá-lo
+# para que a etapa render seja refeita mesmo sem --only/--from
+README_TEMPLATE_VERSION = 1
+
+class StageState:
+    """
+    Estado das etapas de um vídeo em temp/{arquivo}_stages.json: para cada etapa,
+    o fingerprint das entradas e os arquivos gerados. Como em um sistema de build,
+    a etapa é pulada quando o fingerprint não mudou e as saídas ainda existem.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.stages: Dict[str, Dict[str, Any]] = json.load(f)
+        except (OSError, ValueError):
+            self.stages = {}
+
+    def output(self, stage: str) -> Optional[Dict[str, Any]]:
+        """Saída registrada da etapa, se os arquivos dela ainda existem"""
+        entry = self.stages.get(stage)
+        if entry and all(os.path.exists(path) for path in entry.get("files", [])):
+            return entry
+        return None
+
+    def is_fresh(self, stage: str, fingerprint: str) -> bool:
+        entry = self.output(stage)
+        return entry is not None and entry["fingerprint"] == fingerprint
+
+    def record(self, stage: str, fingerprint: str, files: List[str], **output: Any):
+        self.stages[stage] = dict(output, fingerprint=fingerprint, files=files,
+                                  completed_at=datetime.now().isoformat())
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stages, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+class BatchManifest:
+    """
+    Manifesto do lote incremental (temp/batch_manifest.json): para cada vídeo,
+    tamanho, mtime e fingerprint do conteúdo → diretório de saída e status.
+    Um vídeo só é reprocessado se for novo, tiver mudado ou tiver falhado antes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(TEMP_DIR, "batch_manifest.json")
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.videos: Dict[str, Dict[str, Any]] = json.load(f).get("videos", {})
+        except (OSError, ValueError):
+            self.videos = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"videos": self.videos}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _status(self, key: str, stat: os.stat_result, touched: Dict[str, float]) -> str:
+        """Status do vídeo; arquivos com mtime novo e o mesmo conteúdo vão para touched (key → mtime)"""
+        entry = self.videos.get(key)
+        if entry is None:
+            return "new"
+        if entry.get("status") != "success":
+            return "failed"
+        if entry.get("output_dir") and not os.path.isdir(entry["output_dir"]):
+            return "changed"  # Saída apagada: refazer (as etapas salvas tornam isso barato)
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return "unchanged"
+        # Tamanho/mtime mudaram (ex.: arquivo copiado de novo): conferir o conteúdo
+        if entry["size"] == stat.st_size and entry.get("fingerprint") == _file_fingerprint(key):
+            touched[key] = stat.st_mtime
+            return "unchanged"
+        return "changed"
+
+    def status(self, video_path: str) -> str:
+        """Status de um único vídeo: new, changed, failed ou unchanged"""
+        key = os.path.abspath(video_path)
+        touched: Dict[str, float] = {}
+        with self._lock:
+            status = self._status(key, os.stat(key), touched)
+            self._touch(touched)
+            return status
+
+    def _touch(self, touched: Dict[str, float]):
+        """Atualiza o mtime de vídeos cujo conteúdo não mudou (evita recalcular o fingerprint)"""
+        for key, mtime in touched.items():
+            self.videos[key]["mtime"] = mtime
+
+    def plan(self, videos_dir: str, video_files: List[Path], persist: bool = True) -> Dict[str, List[str]]:
+        """
+        Classifica os vídeos: new, changed, failed, unchanged e deleted (no manifesto
+        mas não no disco). Com persist=False (dry run) nada é alterado nem gravado.
+        """
+        plan: Dict[str, List[str]] = {"new": [], "changed": [], "failed": [], "unchanged": [], "deleted": []}
+        present = set()
+        touched: Dict[str, float] = {}
+        with self._lock:
+            for video_path in video_files:
+                key = os.path.abspath(video_path)
+                present.add(key)
+                plan[self._status(key, os.stat(key), touched)].append(key)
+            prefix = os.path.join(os.path.abspath(videos_dir), "")
+            plan["deleted"] = [key for key in self.videos if key.startswith(prefix) and key not in present]
+            if persist and touched:
+                self._touch(touched)
+                self._save()
+        return plan
+
+    def record(self, video_path: str, result: Dict[str, Any]):
+        """Registra o resultado de um vídeo assim que ele termina"""
+        key = os.path.abspath(video_path)
+        stat = os.stat(key)
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "fingerprint": _file_fingerprint(key),
+            "output_dir": result.get("output_dir"),
+            "status": result.get("status"),
+            "message": result.get("message"),
+            "processed_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self.videos[key] = entry
+            self._save()
+
+    def prune(self, key: str) -> List[str]:
+        """Remove a saída e os arquivos de trabalho de um vídeo apagado"""
+        removed = []
+        with self._lock:
+            entry = self.videos.pop(key, {})
+            output_dir = entry.get("output_dir")
+            if output_dir and os.path.isdir(output_dir):
+                shutil.rmtree(output_dir)
+                removed.append(output_dir)
+            for suffix in ("checkpoint.jsonl", "transcription.json", "analysis.json", "stages.json"):
+                path = _video_temp_path(key, suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed.append(path)
+            FINGERPRINT_INDEX.remove(key)
+            self._save()
+        return removed
+
+def select_stages(only: Optional[str] = None, from_stage: Optional[str] = None) -> Optional[List[str]]:
+    """
+    Converte --only a,b / --from x na lista de etapas forçadas (None = todas, incremental).
+    Retorna [] se alguma etapa for inválida.
+    """
+    if only is None and from_stage is None:
+        return None
+    if only is not None:
+        requested = [stage.strip() for stage in only.split(",") if stage.strip()]
+    else:
+        requested = [from_stage]
+    invalid = [stage for stage in requested if stage not in PIPELINE_STAGES]
+    if invalid or not requested:
+        print(f"❌ Etapa(s) inválida(s): {', '.join(invalid) or '(nenhuma)'}. "
+              f"Opções: {', '.join(PIPELINE_STAGES)}")
+        return []
+    if from_stage is not None and only is None:
+        requested = PIPELINE_STAGES[PIPELINE_STAGES.index(from_stage):]
+    if any(stage in FUSED_STAGES for stage in requested):
+        requested = list(FUSED_STAGES) + [stage for stage in requested if stage not in FUSED_STAGES]
+    return [stage for stage in PIPELINE_STAGES if stage in requested]
+
+# --- MONITORAMENTO DE PASTA ---
+
+def find_videos(videos_dir: str) -> List[Path]:
+    """Vídeos suportados na pasta (recursivo), ordenados por caminho"""
+    video_files = []
+    for ext in VIDEO_EXTENSIONS:
+        video_files.extend(Path(videos_dir).glob(f"**/*{ext}"))
+    return sorted(video_files)
+
+def _stat_signature(path: str) -> Optional[Tuple[int, float]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+class _InotifyWatcher:
+    """Eventos de arquivo via inotify (Linux, por ctypes), incluindo subpastas criadas depois"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+    def __init__(self, directory: str):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify indisponível nesta plataforma")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._watches: Dict[int, str] = {}
+        for root, _, _ in os.walk(directory):
+            self._add(root)
+
+    def _add(self, directory: str):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falhou em {directory}")
+        self._watches[wd] = directory
+
+    def poll(self, timeout: float) -> List[str]:
+        """Caminhos alterados desde a última chamada (espera até timeout segundos)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if wd not in self._watches or not name:
+                continue
+            path = os.path.join(self._watches[wd], os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # Pasta nova: monitorar e considerar os vídeos que já vieram nela
+                    for root, _, _ in os.walk(path):
+                        self._add(root)
+                    changed.extend(str(video) for video in find_videos(path))
+            else:
+                changed.append(path)
+        return changed
 
-            except Exception as e:
-                retry_count += 1
-                print(f"Erro na transcrição do pedaço {chunk_num} (tentativa {retry_count}/{MAX_RETRIES}): {e}")
-                save_debug_file(str(e), f"transcription_chunk_{chunk_num}_error_{retry_count}.log")
-                
-                if retry_count < MAX_RETRIES:
-                    wait_time = 2 ** retry_count  # Backoff exponencial
-                    print(f"Aguardando {wait_time}s antes da próxima tentativa...")
-                    time.sleep(wait_time)
-        
-        # Limpar arquivo temporário após tentativas (a menos que esteja em modo debug)
-        if os.path.exists(chunk_audio_path) and not SAVE_DEBUG_FILES:
-            os.remove(chunk_audio_path)
-        elif SAVE_DEBUG_FILES:
-            debug_print(f"Chunk file preserved for debug: {chunk_audio_path}")
-
-    # 6. Montar o JSON final
-    full_text = " ".join([word['word'] for word in total_words])
-    final_result = {
-        "text": full_text.strip(),
-        "segments": all_segments,
-        "words": total_words,
-        "duration": transcribed_duration,
-        "metadata": {
-            "original_file": video_path,
-            "chunks_processed": num_chunks,
-            "model_used": GROQ_MODEL,
-            "language": GROQ_LANGUAGE,
-            "chunk_size_seconds": CHUNK_DURATION_SECONDS,
-            "processed_at": datetime.now().isoformat()
-        }
-    }
+    def close(self):
+        os.close(self.fd)
 
-    with open(final_transcription_path, "w", encoding="utf-8") as f:
-        json.dump(final_result, f, ensure_ascii=False, indent=2)
+class _PollingWatcher:
+    """Fallback: varre a pasta periodicamente comparando tamanho e mtime"""
 
-    print(f"\n--- Processo Concluído ---")
-    print(f"Transcrição final combinada e salva em: {final_transcription_path}")
-    
-    debug_print(f"Final stats: {len(total_words)} words, {len(all_segments)} segments, {transcribed_duration:.2f}s")
-    
-    return final_result
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._seen: Dict[str, Optional[Tuple[int, float]]] = {}
+
+    def poll(self, timeout: float) -> List[str]:
+        time.sleep(timeout)
+        changed = []
+        for video in find_videos(self.directory):
+            path = str(video)
+            signature = _stat_signature(path)
+            if self._seen.get(path) != signature:
+                self._seen[path] = signature
+                changed.append(path)
+        return changed
+
+    def close(self):
+        pass
+
+def create_folder_watcher(directory: str):
+    """inotify quando disponível; senão (ou com WATCH_POLLING=true) varredura periódica"""
+    if not WATCH_POLLING:
+        try:
+            return _InotifyWatcher(directory), 1.0
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify indisponível ({e}) - usando varredura a cada {WATCH_POLL_SECONDS:.0f}s")
+    return _PollingWatcher(directory), WATCH_POLL_SECONDS
 
 # --- NOVAS FUNCIONALIDADES ENHANCED ---
 
@@ -319,24 +3378,31 @@ class EnhancedTranscriptionSystem:
     """Sistema avançado de transcrição e análise de conteúdo educacional"""
     
     def __init__(self):
+        self.analysis_tokens_saved = 0
+        self._stats_lock = threading.Lock()
         self.setup_apis()
         # Não criar diretórios automaticamente - apenas quando processar vídeos
         
     def setup_apis(self):
         """Configura as APIs necessárias"""
-        # Groq para transcrição
+        # Transcrição: Groq (API) ou faster-whisper local (o pool só é criado na primeira transcrição)
         self.groq_api_key = os.environ.get("GROQ_API_KEY")
-        if not self.groq_api_key:
+        if TRANSCRIBE_BACKEND == "local":
+            self.transcription_available = importlib.util.find_spec("faster_whisper") is not None
+            if self.transcription_available:
+                print(f"✅ Whisper local configurado: {LOCAL_WHISPER_MODEL} ({LOCAL_WHISPER_COMPUTE_TYPE})")
+            else:
+                print("❌ faster-whisper não instalado. Para instalar: pip install faster-whisper")
+        elif not GROQ_AVAILABLE:
+            print("❌ Groq não instalado. Para instalar: pip install groq")
+            self.transcription_available = False
+        elif not self.groq_api_key:
             print("❌ GROQ_API_KEY não encontrada")
-            self.groq_available = False
+            self.transcription_available = False
         else:
-            try:
-                self.groq_client = Groq(api_key=self.groq_api_key)
-                self.groq_available = True
-                print("✅ Groq configurado")
-            except Exception as e:
-                print(f"❌ Erro ao configurar Groq: {e}")
-                self.groq_available = False
+            # O cliente é criado por create_transcription_client() quando um vídeo é transcrito
+            self.transcription_available = True
+            print("✅ Groq configurado")
         
         # Gemini para análise (opcional)
         self.gemini_api_key = os.environ.get("GEMINI_API_KEY")
@@ -346,14 +3412,21 @@ class EnhancedTranscriptionSystem:
             self.gemini_available = False
         else:
             try:
-                # Configurar cliente Gemini com nova API
-                self.gemini_client = genai.Client(api_key=self.gemini_api_key)
-                
+                # O cliente (e o SDK) só é criado na primeira análise: ver gemini_client
+                self._gemini_client = None
+
                 # Configurações opcionais do ambiente
                 self.gemini_model = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
                 self.thinking_enabled = os.environ.get("GEMINI_THINKING", "true").lower() == "true"
                 self.thinking_budget = int(os.environ.get("GEMINI_THINKING_BUDGET", "-1"))  # -1 = dinâmico
                 self.max_context = int(os.environ.get("GEMINI_MAX_CONTEXT", "1000000"))  # 1M tokens por padrão
+
+                # Análise map-reduce de transcrições longas
+                self.analysis_mode = os.environ.get("GEMINI_ANALYSIS_MODE", "auto").lower()  # auto, single, mapreduce
+                self.map_model = os.environ.get("GEMINI_MAP_MODEL", "gemini-2.5-flash-lite")
+                self.map_chunk_tokens = int(os.environ.get("GEMINI_MAP_CHUNK_TOKENS", "30000"))
+                self.mapreduce_threshold = int(os.environ.get("GEMINI_MAPREDUCE_THRESHOLD", "100000"))
+                self.map_concurrency = max(1, int(os.environ.get("GEMINI_MAP_CONCURRENCY", "4")))
                 
                 print(f"✅ Gemini configurado: {self.gemini_model}")
                 if self.thinking_enabled:
@@ -361,30 +3434,42 @@ class EnhancedTranscriptionSystem:
                 else:
                     print("⚡ Thinking desabilitado para performance")
                 print(f"📄 Contexto máximo: {self.max_context:,} tokens")
+                if self.analysis_mode != "single":
+                    print(f"🗂️  Análise {self.analysis_mode}: partes de {self.map_chunk_tokens:,} tokens com {self.map_model}")
                 
                 self.gemini_available = True
             except Exception as e:
                 print(f"❌ Erro ao configurar Gemini: {e}")
                 self.gemini_available = False
         
+    @property
+    def gemini_client(self) -> Any:
+        """Cliente Gemini, criado no primeiro uso"""
+        with self._stats_lock:
+            if self._gemini_client is None:
+                self._gemini_client = _gemini_sdk().Client(api_key=self.gemini_api_key)
+            return self._gemini_client
+
     def ensure_directories(self):
         """Garante que os diretórios necessários existam"""
         os.makedirs(TEMP_DIR, exist_ok=True)
         os.makedirs("videos", exist_ok=True)
         
-    def transcribe_video(self, video_path: str) -> Optional[TranscriptionResult]:
+    def transcribe_video(self, video_path: str, resume: bool = False) -> Optional[TranscriptionResult]:
         """
         Transcreve vídeo usando a função original
         """
-        if not self.groq_available:
-            print("❌ Groq não disponível. Não é possível transcrever.")
+        if not self.transcription_available:
+            print("❌ Backend de transcrição não disponível. Não é possível transcrever.")
             return None
             
-        result = transcribe_video_original(video_path)
+        result = transcribe_video_original(video_path, resume=resume)
         if not result:
             return None
-            
-        # Converter para TranscriptionResult
+        return self._to_transcription_result(result, video_path)
+
+    def _to_transcription_result(self, result: Dict[str, Any], video_path: str) -> TranscriptionResult:
+        """Converte o JSON da transcrição original para TranscriptionResult"""
         base_name = os.path.basename(video_path)
         file_name, _ = os.path.splitext(base_name)
         
@@ -396,39 +3481,198 @@ class EnhancedTranscriptionSystem:
             metadata={
                 "file_name": file_name,
                 "original_path": video_path,
-                "transcription_date": datetime.now().isoformat(),
-                "chunks_processed": math.ceil(result["duration"] / CHUNK_DURATION_SECONDS)
+                "transcription_date": result["metadata"].get("processed_at", datetime.now().isoformat()),
+                "chunks_processed": math.ceil(result["duration"] / CHUNK_DURATION_SECONDS),
+                "missing_chunks": result["metadata"].get("missing_chunks", [])
             }
         )
 
     def analyze_content_with_gemini(self, transcription: TranscriptionResult) -> Optional[AnalysisResult]:
         """Analisa conteúdo transcrito usando Gemini com structured output e thinking"""
+        analysis, _ = self._analyze(transcription)
+        return analysis
+
+    def _analyze(self, transcription: TranscriptionResult) -> Tuple[AnalysisResult, str]:
+        """Análise + origem do resultado: "gemini", "cache", "basic" ou "fallback" (Gemini falhou)"""
         if not self.gemini_available:
             print("⚠️  Gemini não disponível. Usando análise básica.")
-            return self._basic_analysis(transcription)
-            
+            return self._basic_analysis(transcription), "basic"
+        load_analysis_schemas()
+
         # Aproveitar o contexto longo do Gemini (até 1M+ tokens)
         # Calcular tokens aproximados (1 token ≈ 4 caracteres em português)
         estimated_tokens = len(transcription.text) // 4
-        
+        mode = self._choose_analysis_mode(estimated_tokens)
+
+        # Mesma transcrição + mesmos prompts/modelo/schema = mesma análise
+        cache_key = None
+        if ANALYSIS_CACHE.enabled:
+            cache_key = self._analysis_cache_key(transcription, mode, estimated_tokens)
+            cached = ANALYSIS_CACHE.get(cache_key)
+            if cached is not None:
+                saved = sum(call["total"] for call in cached["calls"])
+                with self._stats_lock:
+                    self.analysis_tokens_saved += saved
+                print(f"♻️  Análise encontrada no cache ({cached['mode']}) - "
+                      f"{len(cached['calls'])} chamada(s) e {saved:,} tokens economizados")
+                return AnalysisResult(**cached["analysis"]), "cache"
+
+        try:
+            print("🧠 Iniciando análise inteligente com Gemini...")
+            started = time.perf_counter()
+
+            if mode == "mapreduce":
+                analysis_data, calls = self._analyze_mapreduce(transcription, estimated_tokens)
+            else:
+                analysis_data, calls = self._analyze_single(transcription, estimated_tokens)
+
+            analysis = self._to_analysis_result(analysis_data, transcription)
+            self._print_analysis_stats(mode, calls, time.perf_counter() - started)
+
+            if cache_key:
+                ANALYSIS_CACHE.put(cache_key, {"mode": mode, "calls": calls, "analysis": asdict(analysis)})
+                ANALYSIS_CACHE.evict()
+            
+            print("✅ Análise inteligente concluída com sucesso")
+            return analysis, "gemini"
+            
+        except Exception as e:
+            print(f"❌ Erro na análise Gemini: {e}")
+            print("🔄 Tentando análise básica como fallback...")
+            return self._basic_analysis(transcription), "fallback"
+
+    def _choose_analysis_mode(self, estimated_tokens: int) -> str:
+        """single = uma chamada com a transcrição inteira; mapreduce = partes em paralelo + combinação"""
+        if self.analysis_mode in ("single", "mapreduce"):
+            return self.analysis_mode
+        if estimated_tokens > self.max_context or estimated_tokens > self.mapreduce_threshold:
+            return "mapreduce"
+        return "single"
+
+    def _text_sample(self, transcription: TranscriptionResult, estimated_tokens: int) -> str:
+        """Texto enviado no modo single (truncado no meio se exceder o contexto)"""
         if estimated_tokens > self.max_context:
             # Se exceder, usar estratégia inteligente de truncamento
             # Manter início e final, resumir meio
             text_start = transcription.text[:self.max_context//3 * 4]
             text_end = transcription.text[-self.max_context//3 * 4:]
-            text_sample = f"{text_start}\n\n[... CONTEÚDO INTERMEDIÁRIO OMITIDO ...]\n\n{text_end}"
-            print(f"📊 Texto truncado: {estimated_tokens:,} → {self.max_context:,} tokens")
+            return f"{text_start}\n\n[... CONTEÚDO INTERMEDIÁRIO OMITIDO ...]\n\n{text_end}"
+        return transcription.text
+
+    def _analysis_cache_key(self, transcription: TranscriptionResult, mode: str, estimated_tokens: int) -> str:
+        """Chave do cache de análises: texto enviado + tudo que muda a resposta do Gemini"""
+        load_analysis_schemas()
+        if mode == "mapreduce":
+            text = transcription.text
+            mode_settings = [self.map_model, self.map_chunk_tokens, PartialAnalysisSchema.model_json_schema()]
         else:
-            text_sample = transcription.text
-            print(f"📊 Processando {estimated_tokens:,} tokens de contexto")
+            text = self._text_sample(transcription, estimated_tokens)
+            mode_settings = None
+        return _cache_key(
+            hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            # Contexto incluído nos prompts
+            round(transcription.duration, 1), len(transcription.words), len(transcription.segments),
+            self._analysis_settings(), mode, mode_settings,
+        )
 
-        # System instruction otimizada para análise educacional
-        system_instruction = """Você é um especialista em análise de conteúdo educacional técnico. 
-        Sua função é extrair informações estruturadas de transcrições de aulas técnicas, 
-        identificando conceitos, tecnologias, comandos e organizando o conhecimento de forma didática.
+    def _analysis_fingerprint(self, transcription: TranscriptionResult) -> str:
+        """Fingerprint das entradas da etapa analyse"""
+        if not self.gemini_available:
+            return _cache_key(hashlib.sha256(transcription.text.encode("utf-8")).hexdigest(),
+                              transcription.metadata.get("file_name"), round(transcription.duration, 1),
+                              self._analysis_settings())
+        estimated_tokens = len(transcription.text) // 4
+        return self._analysis_cache_key(transcription, self._choose_analysis_mode(estimated_tokens), estimated_tokens)
+
+    def _analysis_settings(self) -> Dict[str, Any]:
+        """Configurações que alteram a análise (cache de análises e fingerprint da etapa analyse)"""
+        if not self.gemini_available:
+            return {"gemini": False, "vocabulary": _keyword_vocabulary_signature()}
+        load_analysis_schemas()
+        return {
+            "prompt_version": ANALYSIS_PROMPT_VERSION,
+            "system_instruction": ANALYSIS_SYSTEM_INSTRUCTION,
+            "model": self.gemini_model,
+            "thinking": [self.thinking_enabled, self.thinking_budget],
+            "schema": AnalysisSchema.model_json_schema(),
+        }
+
+    def _thinking_config(self):
+        """Configuração de thinking do modelo principal (None se desabilitado/indisponível)"""
+        if not self.thinking_enabled:
+            return None
+        try:
+            thinking_config = _gemini_types().GenerationConfigThinkingConfig(
+                thinking_budget=self.thinking_budget if self.thinking_budget != -1 else None,
+                include_thoughts=False  # Não incluir thoughts na resposta para economizar tokens
+            )
+            print(f"🧠 Using thinking with budget: {self.thinking_budget}")
+            return thinking_config
+        except AttributeError:
+            print("⚠️  Thinking não disponível nesta versão do SDK")
+            return None
+
+    def _call_gemini(self, model: str, prompt: str, schema, system_instruction: str,
+                     description: str, thinking_config=None) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Uma chamada de structured output ao Gemini (via rate limiter/tentativas).
+        Retorna (dados, estatísticas da chamada: latência e tokens).
+        """
+        # Configuração de geração com structured output
+        generation_config_params = {
+            "response_mime_type": "application/json",
+            "response_schema": schema,
+            "temperature": 0.1,  # Baixa temperatura para consistência
+            "system_instruction": system_instruction,
+        }
         
-        Seja preciso, técnico e educativo. Extraia apenas informações que estão explicitamente 
-        presentes na transcrição. Mantenha consistência terminológica."""
+        # Adicionar thinking config se disponível
+        if thinking_config:
+            generation_config_params["thinking_config"] = thinking_config
+
+        started = time.perf_counter()
+        with METRICS.span("gemini.generate", model=model, description=description,
+                          bytes_out=len(prompt.encode("utf-8"))) as span:
+            response = call_api(
+                "gemini",
+                lambda: self.gemini_client.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=_gemini_types().GenerateContentConfig(**generation_config_params)
+                ),
+                description,
+                tokens=len(prompt) // 4
+            )
+        stats = {"description": description, "model": model, "seconds": time.perf_counter() - started,
+                 "input": 0, "output": 0, "thinking": 0, "total": 0}
+        
+        # Usar structured output direto (response.parsed)
+        if hasattr(response, 'parsed') and response.parsed:
+            data = response.parsed
+            debug_print(f"Structured output recebido: {description}")
+        else:
+            # Fallback para parsing manual se structured output falhar
+            print(f"⚠️  Fallback para parsing manual ({description})")
+            data = json.loads(response.text.strip())
+
+        usage = getattr(response, 'usage_metadata', None)
+        if usage:
+            stats["input"] = usage.prompt_token_count or 0
+            stats["output"] = usage.candidates_token_count or 0
+            stats["thinking"] = getattr(usage, 'thoughts_token_count', None) or 0
+            stats["total"] = usage.total_token_count or 0
+        span["tokens_in"] = stats["input"]
+        span["tokens_out"] = stats["output"] + stats["thinking"]
+        return data, stats
+
+    def _analyze_single(self, transcription: TranscriptionResult,
+                        estimated_tokens: int) -> Tuple[Any, List[Dict[str, Any]]]:
+        """Análise em uma única chamada com a transcrição inteira"""
+        text_sample = self._text_sample(transcription, estimated_tokens)
+        if estimated_tokens > self.max_context:
+            print(f"📊 Texto truncado: {estimated_tokens:,} → {self.max_context:,} tokens")
+        else:
+            print(f"📊 Processando {estimated_tokens:,} tokens de contexto")
 
         # Prompt otimizado para thinking e long context
         analysis_prompt = f"""Analise esta transcrição de aula técnica em português e extraia informações estruturadas:
@@ -453,162 +3697,153 @@ INSTRUÇÕES PARA ANÁLISE:
 
 Seja detalhado na análise e precise nas informações extraídas."""
 
+        data, stats = self._call_gemini(self.gemini_model, analysis_prompt, AnalysisSchema,
+                                        ANALYSIS_SYSTEM_INSTRUCTION, "análise com Gemini",
+                                        self._thinking_config())
+        stats["stage"] = "single"
+        return data, [stats]
+
+    def _analyze_mapreduce(self, transcription: TranscriptionResult,
+                           estimated_tokens: int) -> Tuple[Any, List[Dict[str, Any]]]:
+        """
+        Map: cada parte da transcrição (em fronteiras de segmento) é analisada em
+        paralelo pelo modelo mais barato. Reduce: o modelo principal combina as
+        análises parciais em um único AnalysisSchema. Nenhum trecho é descartado.
+        """
+        parts = split_transcript_for_analysis(transcription.text, transcription.segments, self.map_chunk_tokens)
+        print(f"🗂️  Map-reduce: {estimated_tokens:,} tokens em {len(parts)} parte(s) "
+              f"({self.map_model} → {self.gemini_model})")
+
+        def map_part(index: int, part: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+            prompt = f"""Analise este TRECHO ({index + 1} de {len(parts)}) de uma transcrição de aula técnica em português.
+
+TRECHO: {_format_timestamp(part["start"])} até {_format_timestamp(part["end"])} de uma aula de {transcription.duration/60:.1f} minutos
+
+TRANSCRIÇÃO DO TRECHO:
+{part["text"]}
+
+Extraia apenas o que está presente neste trecho: resumo, tópicos na ordem em que aparecem,
+tecnologias, comandos/código, conceitos explicados (com definição) e pré-requisitos pressupostos."""
+            return self._call_gemini(self.map_model, prompt, PartialAnalysisSchema,
+                                     ANALYSIS_SYSTEM_INSTRUCTION, f"análise da parte {index + 1}/{len(parts)}")
+
+        executor = ThreadPoolExecutor(max_workers=min(self.map_concurrency, len(parts)),
+                                      thread_name_prefix="gemini-map")
         try:
-            print("🧠 Iniciando análise inteligente com Gemini...")
-            
-            # Configurar thinking se habilitado
-            thinking_config = None
-            if self.thinking_enabled:
-                try:
-                    thinking_config = types.GenerationConfigThinkingConfig(
-                        thinking_budget=self.thinking_budget if self.thinking_budget != -1 else None,
-                        include_thoughts=False  # Não incluir thoughts na resposta para economizar tokens
-                    )
-                    print(f"🧠 Using thinking with budget: {self.thinking_budget}")
-                except AttributeError:
-                    print("⚠️  Thinking não disponível nesta versão do SDK")
-                    thinking_config = None
-            
-            # Configuração de geração com structured output
-            generation_config_params = {
-                "response_mime_type": "application/json",
-                "response_schema": AnalysisSchema,
-                "temperature": 0.1,  # Baixa temperatura para consistência
-                "system_instruction": system_instruction,
-            }
-            
-            # Adicionar thinking config se disponível
-            if thinking_config:
-                generation_config_params["thinking_config"] = thinking_config
-            
-            # Fazer a chamada para o Gemini
-            response = self.gemini_client.models.generate_content(
-                model=self.gemini_model,
-                contents=analysis_prompt,
-                config=types.GenerateContentConfig(**generation_config_params)
+            futures = [_submit(executor, map_part, i, part) for i, part in enumerate(parts)]
+            results = [future.result() for future in futures]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        calls = []
+        partials = []
+        for part, (data, stats) in zip(parts, results):
+            stats["stage"] = "map"
+            calls.append(stats)
+            partial = data.model_dump() if hasattr(data, "model_dump") else data
+            partial["trecho"] = f"{_format_timestamp(part['start'])}-{_format_timestamp(part['end'])}"
+            partials.append(partial)
+        save_debug_file(partials, f"gemini_partials_{datetime.now().strftime('%H%M%S')}.json")
+
+        reduce_prompt = f"""Abaixo estão análises parciais, em ordem cronológica, de trechos consecutivos de UMA aula técnica em português.
+Combine-as em uma única análise estruturada da aula completa.
+
+CONTEXTO DA AULA:
+- Duração da gravação: {transcription.duration/60:.1f} minutos
+- Palavras transcritas: {len(transcription.words):,}
+- Segmentos de áudio: {len(transcription.segments)}
+- Trechos analisados: {len(parts)}
+
+ANÁLISES PARCIAIS (JSON):
+{json.dumps(partials, ensure_ascii=False, indent=1)}
+
+INSTRUÇÕES PARA A COMBINAÇÃO:
+1. Escreva o resumo executivo cobrindo a aula inteira, do início ao fim
+2. Escolha os 3-5 pontos-chave mais importantes considerando todos os trechos
+3. Una tecnologias, comandos e conceitos sem duplicatas (mesmo item com grafias diferentes = um só)
+4. Determine o nível de dificuldade e os pré-requisitos da aula como um todo
+5. Defina objetivos de aprendizado específicos e mensuráveis
+6. Use apenas informações presentes nas análises parciais"""
+
+        data, stats = self._call_gemini(self.gemini_model, reduce_prompt, AnalysisSchema,
+                                        ANALYSIS_SYSTEM_INSTRUCTION, "combinação das análises",
+                                        self._thinking_config())
+        stats["stage"] = "reduce"
+        calls.append(stats)
+        return data, calls
+
+    def _print_analysis_stats(self, mode: str, calls: List[Dict[str, Any]], elapsed: float):
+        """Mostra latência e tokens por etapa da análise"""
+        print(f"📊 Análise ({mode}): {len(calls)} chamada(s) em {elapsed:.1f}s")
+        for stage in ("single", "map", "reduce"):
+            stage_calls = [call for call in calls if call["stage"] == stage]
+            if not stage_calls:
+                continue
+            print(f"   • {stage}: {len(stage_calls)} chamada(s), "
+                  f"latência máx. {max(call['seconds'] for call in stage_calls):.1f}s | "
+                  f"Input: {sum(call['input'] for call in stage_calls):,} | "
+                  f"Output: {sum(call['output'] for call in stage_calls):,} | "
+                  f"Thinking: {sum(call['thinking'] for call in stage_calls):,}")
+        print(f"   • Total: {sum(call['total'] for call in calls):,} tokens")
+        self.last_analysis_stats = {"mode": mode, "seconds": elapsed, "calls": calls}
+        save_debug_file(self.last_analysis_stats, f"gemini_stats_{datetime.now().strftime('%H%M%S')}.json")
+
+    def _to_analysis_result(self, analysis_data: Any, transcription: TranscriptionResult) -> AnalysisResult:
+        """Converte a resposta do Gemini (objeto Pydantic ou dict) para AnalysisResult"""
+        # Converter conceitos para formato compatível
+        conceitos_convertidos = []
+        if hasattr(analysis_data, 'conceitos_importantes'):
+            for conceito in analysis_data.conceitos_importantes:
+                if hasattr(conceito, 'conceito') and hasattr(conceito, 'definicao'):
+                    conceitos_convertidos.append({
+                        "conceito": conceito.conceito,
+                        "definicao": conceito.definicao
+                    })
+        elif isinstance(analysis_data, dict) and 'conceitos_importantes' in analysis_data:
+            conceitos_convertidos = analysis_data['conceitos_importantes']
+        
+        # Converter para AnalysisResult (compatibilidade)
+        if hasattr(analysis_data, 'titulo_sugerido'):
+            # Objeto Pydantic
+            return AnalysisResult(
+                titulo_sugerido=analysis_data.titulo_sugerido,
+                resumo_executivo=analysis_data.resumo_executivo,
+                pontos_chave=analysis_data.pontos_chave,
+                tecnologias_mencionadas=analysis_data.tecnologias_mencionadas,
+                comandos_codigo=analysis_data.comandos_codigo,
+                conceitos_importantes=conceitos_convertidos,
+                nivel_dificuldade=analysis_data.nivel_dificuldade,
+                duracao_estimada=analysis_data.duracao_estimada,
+                pre_requisitos=analysis_data.pre_requisitos,
+                objetivos_aprendizado=analysis_data.objetivos_aprendizado,
+                tags=analysis_data.tags
             )
-            
-            # Usar structured output direto (response.parsed)
-            if hasattr(response, 'parsed') and response.parsed:
-                analysis_data = response.parsed
-                print("✅ Structured output recebido com sucesso")
-            else:
-                # Fallback para parsing manual se structured output falhar
-                print("⚠️  Fallback para parsing manual")
-                response_text = response.text.strip()
-                analysis_data = json.loads(response_text)
-            
-            # Converter conceitos para formato compatível
-            conceitos_convertidos = []
-            if hasattr(analysis_data, 'conceitos_importantes'):
-                for conceito in analysis_data.conceitos_importantes:
-                    if hasattr(conceito, 'conceito') and hasattr(conceito, 'definicao'):
-                        conceitos_convertidos.append({
-                            "conceito": conceito.conceito,
-                            "definicao": conceito.definicao
-                        })
-            elif isinstance(analysis_data, dict) and 'conceitos_importantes' in analysis_data:
-                conceitos_convertidos = analysis_data['conceitos_importantes']
-            
-            # Converter para AnalysisResult (compatibilidade)
-            if hasattr(analysis_data, 'titulo_sugerido'):
-                # Objeto Pydantic
-                analysis = AnalysisResult(
-                    titulo_sugerido=analysis_data.titulo_sugerido,
-                    resumo_executivo=analysis_data.resumo_executivo,
-                    pontos_chave=analysis_data.pontos_chave,
-                    tecnologias_mencionadas=analysis_data.tecnologias_mencionadas,
-                    comandos_codigo=analysis_data.comandos_codigo,
-                    conceitos_importantes=conceitos_convertidos,
-                    nivel_dificuldade=analysis_data.nivel_dificuldade,
-                    duracao_estimada=analysis_data.duracao_estimada,
-                    pre_requisitos=analysis_data.pre_requisitos,
-                    objetivos_aprendizado=analysis_data.objetivos_aprendizado,
-                    tags=analysis_data.tags
-                )
-            else:
-                # Dict normal
-                analysis = AnalysisResult(
-                    titulo_sugerido=analysis_data.get("titulo_sugerido", "Aula Técnica"),
-                    resumo_executivo=analysis_data.get("resumo_executivo", ""),
-                    pontos_chave=analysis_data.get("pontos_chave", []),
-                    tecnologias_mencionadas=analysis_data.get("tecnologias_mencionadas", []),
-                    comandos_codigo=analysis_data.get("comandos_codigo", []),
-                    conceitos_importantes=conceitos_convertidos,
-                    nivel_dificuldade=analysis_data.get("nivel_dificuldade", "intermediário"),
-                    duracao_estimada=analysis_data.get("duracao_estimada", f"{int(transcription.duration//60)} minutos"),
-                    pre_requisitos=analysis_data.get("pre_requisitos", []),
-                    objetivos_aprendizado=analysis_data.get("objetivos_aprendizado", []),
-                    tags=analysis_data.get("tags", [])
-                )
-            
-            # Mostrar estatísticas do uso
-            if hasattr(response, 'usage_metadata'):
-                usage = response.usage_metadata
-                print(f"📊 Tokens utilizados:")
-                print(f"   • Input: {usage.prompt_token_count:,}")
-                print(f"   • Output: {usage.candidates_token_count:,}")
-                if hasattr(usage, 'thoughts_token_count') and usage.thoughts_token_count:
-                    print(f"   • Thinking: {usage.thoughts_token_count:,}")
-                print(f"   • Total: {usage.total_token_count:,}")
-            
-            print("✅ Análise inteligente concluída com sucesso")
-            return analysis
-            
-        except Exception as e:
-            print(f"❌ Erro na análise Gemini: {e}")
-            print("🔄 Tentando análise básica como fallback...")
-            return self._basic_analysis(transcription)
+        # Dict normal
+        return AnalysisResult(
+            titulo_sugerido=analysis_data.get("titulo_sugerido", "Aula Técnica"),
+            resumo_executivo=analysis_data.get("resumo_executivo", ""),
+            pontos_chave=analysis_data.get("pontos_chave", []),
+            tecnologias_mencionadas=analysis_data.get("tecnologias_mencionadas", []),
+            comandos_codigo=analysis_data.get("comandos_codigo", []),
+            conceitos_importantes=conceitos_convertidos,
+            nivel_dificuldade=analysis_data.get("nivel_dificuldade", "intermediário"),
+            duracao_estimada=analysis_data.get("duracao_estimada", f"{int(transcription.duration//60)} minutos"),
+            pre_requisitos=analysis_data.get("pre_requisitos", []),
+            objetivos_aprendizado=analysis_data.get("objetivos_aprendizado", []),
+            tags=analysis_data.get("tags", [])
+        )
 
     def _basic_analysis(self, transcription: TranscriptionResult) -> AnalysisResult:
         """Análise básica quando Gemini não está disponível"""
         file_name = transcription.metadata.get("file_name", "Aula")
         
-        # Extrair algumas informações básicas do texto
-        text = transcription.text.lower()
-        
-        # Detectar tecnologias comuns
-        tech_keywords = {
-            "docker": "Docker",
-            "n8n": "N8N", 
-            "postgres": "PostgreSQL",
-            "redis": "Redis",
-            "traefik": "Traefik",
-            "portainer": "Portainer",
-            "javascript": "JavaScript",
-            "python": "Python",
-            "nodejs": "Node.js",
-            "react": "React",
-            "vue": "Vue.js",
-            "api": "API",
-            "webhook": "Webhook",
-            "json": "JSON",
-            "sql": "SQL",
-            "html": "HTML",
-            "css": "CSS"
-        }
-        
-        detected_techs = []
-        for keyword, tech_name in tech_keywords.items():
-            if keyword in text:
-                detected_techs.append(tech_name)
-        
-        # Detectar comandos básicos
-        command_patterns = [
-            r'docker\s+\w+',
-            r'npm\s+\w+',
-            r'pip\s+\w+',
-            r'git\s+\w+',
-            r'sudo\s+\w+',
-            r'chmod\s+\d+',
-            r'mkdir\s+\w+',
-            r'cd\s+\w+'
-        ]
-        
-        detected_commands = []
-        for pattern in command_patterns:
-            matches = re.findall(pattern, text)
-            detected_commands.extend(matches[:3])  # Limitar a 3 por padrão
+        # Detectar tecnologias e comandos do vocabulário em uma única passada pelas palavras
+        found = keyword_scanner().scan(_timed_tokens(transcription))
+        detected_techs = _ranked(found["tecnologias"])
+        detected_commands = _ranked(found["comandos"])
+        debug_print("Vocabulário encontrado: " + ", ".join(
+            f"{name} ({found['tecnologias'][name]['count']}x, desde {_format_timestamp(found['tecnologias'][name]['first'])})"
+            for name in detected_techs[:10]))
         
         return AnalysisResult(
             titulo_sugerido=f"Aula - {file_name}",
@@ -733,24 +3968,43 @@ Seja detalhado na análise e precise nas informações extraídas."""
         
         return readme_content
 
-    def save_analysis_files(self, transcription: TranscriptionResult, analysis: AnalysisResult, output_dir: str) -> List[str]:
-        """Salva todos os arquivos da análise"""
+    def save_analysis_files(self, transcription: TranscriptionResult, analysis: AnalysisResult,
+                            output_dir: str) -> Optional[List[str]]:
+        """Salva todos os arquivos da análise; None se algum deles não pôde ser gravado"""
+        with METRICS.span("write.lesson_files") as span:
+            files_created = self._save_analysis_files(transcription, analysis, output_dir)
+            if files_created is None:
+                span["error"] = "write"
+            else:
+                span["bytes_out"] = sum(os.path.getsize(path) for path in files_created if os.path.exists(path))
+        return files_created
+
+    def _save_analysis_files(self, transcription: TranscriptionResult, analysis: AnalysisResult,
+                             output_dir: str) -> Optional[List[str]]:
         files_created = []
         
         try:
-            # 1. Salvar transcrição JSON
+            # 1. Salvar transcrição JSON (gravada registro a registro, sem copiar as listas)
             transcription_path = os.path.join(output_dir, "transcricao.json")
-            transcription_data = {
-                "text": transcription.text,
-                "segments": transcription.segments,
-                "words": transcription.words,
-                "duration": transcription.duration,
-                "metadata": transcription.metadata
-            }
-            with open(transcription_path, "w", encoding="utf-8") as f:
-                json.dump(transcription_data, f, ensure_ascii=False, indent=2)
+            write_transcription_file(transcription_path, transcription)
             files_created.append(transcription_path)
             print(f"✅ Transcrição salva: {transcription_path}")
+
+            # 1b. Formato compacto opcional (carregamento rápido para busca/reprocessamento)
+            if COMPACT_TRANSCRIPT:
+                transcription_data = {
+                    "text": transcription.text,
+                    "segments": transcription.segments,
+                    "words": transcription.words,
+                    "duration": transcription.duration,
+                    "metadata": transcription.metadata
+                }
+                compact_path = save_compact_transcription(transcription_data, os.path.join(output_dir, "transcricao.tcol"))
+                files_created.append(compact_path)
+                print(f"✅ Transcrição compacta salva: {compact_path}")
+            elif os.path.exists(os.path.join(output_dir, "transcricao.tcol")):
+                # Sobra de um render com COMPACT_TRANSCRIPT ligado: seria lido no lugar do .json novo
+                os.remove(os.path.join(output_dir, "transcricao.tcol"))
             
             # 2. Salvar análise JSON
             analysis_path = os.path.join(output_dir, "analise.json")
@@ -792,54 +4046,272 @@ Seja detalhado na análise e precise nas informações extraídas."""
                 print(f"✅ Comandos salvos: {commands_file}")
                 
         except Exception as e:
+            # Aula incompleta: não pode ser registrada como renderizada nem usada na deduplicação
             print(f"❌ Erro ao salvar arquivos: {e}")
+            return None
             
         return files_created
 
-    def process_video_complete(self, video_path: str, modulo: int = 1, aula: int = 1) -> Dict[str, Any]:
-        """Processa um vídeo completamente: transcrição + análise + documentação"""
+    def _update_search_index(self, output_dir: str):
+        """Adiciona a aula ao índice de busca; uma falha aqui não invalida o processamento"""
+        try:
+            if SEARCH_INDEX.update_lesson(output_dir):
+                print(f"🔎 Aula indexada para busca: {SEARCH_INDEX_PATH}")
+        except Exception as e:
+            print(f"⚠️  Não foi possível atualizar o índice de busca: {e}")
+
+    def _find_duplicate(self, video_path: str) -> Tuple[Optional[Dict[str, Any]], Optional[Any]]:
+        """Aula já gerada com o mesmo áudio (ou None) e a impressão digital deste vídeo"""
+        if not AUDIO_DEDUP:
+            return None, None
+        if not NUMPY_AVAILABLE:
+            debug_print("numpy não instalado: deduplicação pelo áudio desabilitada")
+            return None, None
+        try:
+            media = probe_media(video_path)
+            if media is None:
+                return None, None
+            fingerprint = FINGERPRINT_INDEX.fingerprint_for(video_path)
+            if fingerprint is None:
+                fingerprint = audio_fingerprint(video_path)
+            if fingerprint is None:
+                return None, None
+            return FINGERPRINT_INDEX.find(video_path, fingerprint, media.duration), fingerprint
+        except Exception as e:
+            print(f"⚠️  Não foi possível verificar duplicatas: {e}")
+            return None, None
+
+    def _record_fingerprint(self, video_path: str, output_dir: str, fingerprint: Optional[Any]):
+        """Registra a aula no índice de impressões digitais; uma falha aqui não invalida o processamento"""
+        if not AUDIO_DEDUP or not NUMPY_AVAILABLE:
+            return
+        try:
+            media = probe_media(video_path)
+            if fingerprint is None:
+                fingerprint = FINGERPRINT_INDEX.fingerprint_for(video_path)
+            if fingerprint is None:
+                fingerprint = audio_fingerprint(video_path)
+            if media is not None and fingerprint is not None:
+                FINGERPRINT_INDEX.add(video_path, fingerprint, media.duration, output_dir)
+        except Exception as e:
+            print(f"⚠️  Não foi possível registrar a impressão digital: {e}")
+
+    def _reuse_duplicate(self, video_path: str, modulo: int, aula: int, duplicate: Dict[str, Any],
+                         fingerprint: Any) -> Optional[Dict[str, Any]]:
+        """
+        Gera a aula deste vídeo com a transcrição e a análise da aula que tem o mesmo
+        áudio; None se elas não puderem ser lidas (o vídeo segue o processamento normal)
+        """
+        print(f"♻️  Mesmo áudio de {os.path.basename(duplicate['video'])} "
+              f"({(1 - duplicate['distance']) * 100:.0f}% igual, deslocamento {duplicate['offset_seconds']:+.1f}s)")
+        print(f"   Reaproveitando transcrição e análise de {duplicate['output_dir']}")
+        with METRICS.span("stage.dedup", original=duplicate["video"]):
+            source_dir = Path(duplicate["output_dir"])
+            # _lesson_transcript ignora um .tcol mais antigo que o .json (sobra de outro render)
+            source_transcript = _lesson_transcript(source_dir)
+            if source_transcript is None:
+                print("⚠️  A aula original não tem transcrição. Processando normalmente.")
+                return None
+            try:
+                transcription = load_transcription(str(source_transcript))
+                with open(source_dir / "analise.json", "r", encoding="utf-8") as f:
+                    analysis = AnalysisResult(**json.load(f))
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                print(f"⚠️  Não foi possível reaproveitar a aula: {e}. Processando normalmente.")
+                return None
+            if transcription.metadata.get("missing_chunks"):
+                print("⚠️  A transcrição original tem pedaços faltando. Processando normalmente.")
+                return None
+            file_name, _ = os.path.splitext(os.path.basename(video_path))
+            transcription.metadata = dict(transcription.metadata, file_name=file_name, original_path=video_path,
+                                          deduplicated_from=duplicate["video"])
+
+            print("📁 Criando estrutura...")
+            output_dir = self.generate_directory_structure(analysis, modulo, aula)
+            print("💾 Salvando arquivos...")
+            files_created = self.save_analysis_files(transcription, analysis, output_dir)
+        if files_created is None:
+            return {"status": "error", "message": "Falha ao salvar os arquivos da aula",
+                    "stages": {stage: "dedup" for stage in PIPELINE_STAGES}, "output_dir": output_dir}
+        self._record_fingerprint(video_path, output_dir, fingerprint)
+        if SEARCH_INDEX_AUTO:
+            self._update_search_index(output_dir)
+
+        print(f"\n✅ PROCESSAMENTO CONCLUÍDO (duplicata, sem chamadas às APIs)")
+        print(f"📁 Aula criada em: {output_dir}")
+        print(f"⏱️  {transcription.duration/60:.1f} minutos de áudio sem transcrever")
+        return {
+            "status": "success",
+            "stages": {stage: "dedup" for stage in PIPELINE_STAGES},
+            "output_dir": output_dir,
+            "files_created": files_created,
+            "transcription_stats": {"duration": transcription.duration, "words": len(transcription.words),
+                                    "segments": len(transcription.segments)},
+            "analysis": {"titulo": analysis.titulo_sugerido, "nivel": analysis.nivel_dificuldade,
+                         "duracao": analysis.duracao_estimada,
+                         "tecnologias": len(analysis.tecnologias_mencionadas),
+                         "conceitos": len(analysis.conceitos_importantes)},
+            "deduplicated": {"original": duplicate["video"], "original_output_dir": duplicate["output_dir"],
+                             "audio_seconds": transcription.duration, "distance": duplicate["distance"]},
+        }
+
+    def process_video_complete(self, video_path: str, modulo: int = 1, aula: int = 1,
+                               resume: bool = False, stages: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Processa um vídeo completamente: transcrição + análise + documentação.
+        Cada etapa (PIPELINE_STAGES) grava sua saída em temp/ e é pulada quando o
+        fingerprint das suas entradas não mudou. Com stages (--only/--from), essas
+        etapas são refeitas, as anteriores são lidas do disco e as posteriores não rodam.
+        """
+        with video_metrics(video_path) as video_record:
+            result = self._process_video_stages(video_path, modulo, aula, resume, stages)
+            # Duplicata não transcreve nada: não entra no fator de tempo real
+            if not result.get("deduplicated"):
+                video_record["audio_seconds"] = (result.get("transcription_stats") or {}).get("duration", 0)
+        return result
+
+    def _process_video_stages(self, video_path: str, modulo: int, aula: int, resume: bool,
+                              stages: Optional[List[str]]) -> Dict[str, Any]:
         print(f"\n{'='*60}")
         print(f"🚀 PROCESSAMENTO COMPLETO - {os.path.basename(video_path)}")
         print(f"{'='*60}")
         
+        stage_span: List[Dict[str, Any]] = []
         try:
-            # 1. Transcrever vídeo
+            state = StageState(_video_temp_path(video_path, "stages.json"))
+            last_stage = stages[-1] if stages else PIPELINE_STAGES[-1]
+            result: Dict[str, Any] = {"status": "success", "stages": {}}
+
+            def action(stage: str, fingerprint: Optional[str]) -> str:
+                if stages is None:
+                    chosen = "skip" if state.is_fresh(stage, fingerprint) else "run"
+                else:
+                    chosen = "run" if stage in stages else "load"
+                result["stages"][stage] = chosen
+                # Cada etapa é medida até a próxima começar
+                if stage_span:
+                    METRICS.finish(stage_span.pop())
+                stage_span.append(METRICS.start(f"stage.{stage}", action=chosen))
+                if chosen == "skip":
+                    print(f"⏭️  Etapa {stage}: entradas inalteradas - usando resultado salvo")
+                elif chosen == "load" and state.output(stage):
+                    print(f"📂 Etapa {stage}: usando resultado salvo")
+                return chosen
+
+            def missing(stage: str) -> Dict[str, Any]:
+                message = f"Etapa {stage} ainda não foi executada para este vídeo"
+                print(f"❌ {message}")
+                return {"status": "error", "message": message, "stages": result["stages"]}
+
+            # 0. Mesma aula já processada com outro nome: reaproveita transcrição e análise
+            video_key = _video_key(video_path)
+            fingerprint = None
+            if stages is None and not state.is_fresh("transcribe", video_key):
+                duplicate, fingerprint = self._find_duplicate(video_path)
+                reused = self._reuse_duplicate(video_path, modulo, aula, duplicate, fingerprint) if duplicate else None
+                if reused:
+                    return reused
+
+            # 1. Extrair + transcrever (fundidas: cada pedaço é enviado assim que é extraído)
             print("📹 Etapa 1/4: Transcrevendo vídeo...")
-            transcription = self.transcribe_video(video_path)
-            if not transcription:
-                return {"status": "error", "message": "Falha na transcrição"}
+            if action("transcribe", video_key) == "run":
+                if not self.transcription_available:
+                    print("❌ Backend de transcrição não disponível. Não é possível transcrever.")
+                    return {"status": "error", "message": "Falha na transcrição"}
+                prepared = transcribe_chunks(video_path, resume=resume)
+                if not prepared:
+                    return {"status": "error", "message": "Falha na transcrição"}
+                checkpoint, num_chunks = prepared
+                if checkpoint.is_complete():
+                    for stage in FUSED_STAGES:
+                        state.record(stage, video_key, [checkpoint.path],
+                                     video_key=video_key, num_chunks=num_chunks)
+            else:
+                output = state.output("transcribe")
+                if not output:
+                    return missing("transcribe")
+                checkpoint = ChunkCheckpoint(output["files"][0], output["video_key"])
+                num_chunks = output["num_chunks"]
+                if not checkpoint.load():
+                    return missing("transcribe")
+            result["stages"]["extract"] = result["stages"]["transcribe"]
+            if last_stage in FUSED_STAGES:
+                return result
+
+            # 2. Juntar os pedaços na transcrição final
+            transcription_path = _video_temp_path(video_path, "transcription.json")
+            merge_fingerprint = _cache_key(video_key, _hash_file(checkpoint.path))
+            if action("merge", merge_fingerprint) == "run":
+                transcription_data = merge_transcription(video_path, checkpoint, num_chunks)
+                if not transcription_data["metadata"]["missing_chunks"]:
+                    state.record("merge", merge_fingerprint, [transcription_path])
+            else:
+                if not state.output("merge"):
+                    return missing("merge")
+                transcription_data = read_transcription_json(transcription_path)
+            transcription = self._to_transcription_result(transcription_data, video_path)
+            result["transcription_stats"] = {
+                "duration": transcription.duration,
+                "words": len(transcription.words),
+                "segments": len(transcription.segments)
+            }
+            if last_stage == "merge":
+                return result
             
-            # 2. Analisar conteúdo
+            # 3. Analisar conteúdo
             print("🧠 Etapa 2/4: Analisando conteúdo...")
-            analysis = self.analyze_content_with_gemini(transcription)
-            if not analysis:
-                return {"status": "error", "message": "Falha na análise"}
-            
-            # 3. Criar estrutura de diretórios
-            print("📁 Etapa 3/4: Criando estrutura...")
-            output_dir = self.generate_directory_structure(analysis, modulo, aula)
-            
-            # 4. Salvar todos os arquivos
-            print("💾 Etapa 4/4: Salvando arquivos...")
-            files_created = self.save_analysis_files(transcription, analysis, output_dir)
-            
-            result = {
-                "status": "success",
-                "output_dir": output_dir,
-                "files_created": files_created,
-                "analysis": {
-                    "titulo": analysis.titulo_sugerido,
-                    "nivel": analysis.nivel_dificuldade,
-                    "duracao": analysis.duracao_estimada,
-                    "tecnologias": len(analysis.tecnologias_mencionadas),
-                    "conceitos": len(analysis.conceitos_importantes)
-                },
-                "transcription_stats": {
-                    "duration": transcription.duration,
-                    "words": len(transcription.words),
-                    "segments": len(transcription.segments)
-                }
+            analysis_path = _video_temp_path(video_path, "analysis.json")
+            # Com --only/--from sem analyse o fingerprint não é usado (e evita carregar o pydantic)
+            analysis_fingerprint = self._analysis_fingerprint(transcription) \
+                if stages is None or "analyse" in stages else None
+            if action("analyse", analysis_fingerprint) == "run":
+                analysis, source = self._analyze(transcription)
+                if not analysis:
+                    return {"status": "error", "message": "Falha na análise"}
+                with open(analysis_path, "w", encoding="utf-8") as f:
+                    json.dump(asdict(analysis), f, ensure_ascii=False, indent=2)
+                # Fallback após erro do Gemini não conta como concluída: a próxima execução tenta de novo
+                if source != "fallback":
+                    state.record("analyse", analysis_fingerprint, [analysis_path], source=source)
+            else:
+                if not state.output("analyse"):
+                    return missing("analyse")
+                with open(analysis_path, "r", encoding="utf-8") as f:
+                    analysis = AnalysisResult(**json.load(f))
+            result["analysis"] = {
+                "titulo": analysis.titulo_sugerido,
+                "nivel": analysis.nivel_dificuldade,
+                "duracao": analysis.duracao_estimada,
+                "tecnologias": len(analysis.tecnologias_mencionadas),
+                "conceitos": len(analysis.conceitos_importantes)
             }
+            if last_stage == "analyse":
+                return result
+            
+            # 4. Criar estrutura de diretórios e salvar todos os arquivos
+            render_fingerprint = _cache_key(_hash_file(transcription_path), _hash_file(analysis_path),
+                                            modulo, aula, OUTPUT_BASE_DIR, AULA_DIR_PATTERN,
+                                            COMPACT_TRANSCRIPT, README_TEMPLATE_VERSION)
+            if action("render", render_fingerprint) == "run":
+                print("📁 Etapa 3/4: Criando estrutura...")
+                output_dir = self.generate_directory_structure(analysis, modulo, aula)
+                
+                print("💾 Etapa 4/4: Salvando arquivos...")
+                files_created = self.save_analysis_files(transcription, analysis, output_dir)
+                if files_created is None:
+                    return {"status": "error", "message": "Falha ao salvar os arquivos da aula",
+                            "stages": result["stages"], "output_dir": output_dir}
+                state.record("render", render_fingerprint, files_created, output_dir=output_dir)
+                if SEARCH_INDEX_AUTO:
+                    self._update_search_index(output_dir)
+                self._record_fingerprint(video_path, output_dir, fingerprint)
+            else:
+                output = state.output("render")
+                if not output:
+                    return missing("render")
+                output_dir, files_created = output["output_dir"], output["files"]
+            result["output_dir"] = output_dir
+            result["files_created"] = files_created
             
             print(f"\n✅ PROCESSAMENTO CONCLUÍDO COM SUCESSO!")
             print(f"📁 Aula criada em: {output_dir}")
@@ -854,73 +4326,293 @@ Seja detalhado na análise e precise nas informações extraídas."""
         except Exception as e:
             print(f"❌ ERRO NO PROCESSAMENTO: {e}")
             return {"status": "error", "message": str(e)}
+        finally:
+            if stage_span:
+                METRICS.finish(stage_span.pop())
+
+    def _process_batch_item(self, video_path: Path, i: int, total: int, start_modulo: int,
+                            resume: bool, stages: Optional[List[str]] = None,
+                            manifest: Optional[BatchManifest] = None) -> Dict[str, Any]:
+        """Processa um vídeo do lote, determinando módulo e aula pelo nome do arquivo"""
+        print(f"\n{'='*60}")
+        print(f"🎬 VÍDEO {i}/{total}: {video_path.name}")
+        print(f"{'='*60}")
+        
+        # Determinar módulo e aula
+        modulo = start_modulo
+        aula = i
+        
+        # Tentar extrair números do nome do arquivo
+        filename = video_path.stem
+        modulo_match = re.search(r'modulo[-_]?(\d+)', filename, re.IGNORECASE)
+        aula_match = re.search(r'aula[-_]?(\d+)', filename, re.IGNORECASE)
+        
+        if modulo_match:
+            modulo = int(modulo_match.group(1))
+        if aula_match:
+            aula = int(aula_match.group(1))
+        
+        print(f"📊 Processando como: Módulo {modulo}, Aula {aula}")
+        
+        result = self.process_video_complete(str(video_path), modulo, aula, resume=resume, stages=stages)
+        result['video_info'] = {
+            'filename': video_path.name,
+            'modulo': modulo,
+            'aula': aula,
+            'index': i
+        }
+        if manifest is not None:
+            manifest.record(str(video_path), result)
+        return result
+
+    def _batch_process_parallel(self, items: List[Tuple[int, Path]], total: int, start_modulo: int,
+                                resume: bool, jobs: int, stages: Optional[List[str]] = None,
+                                manifest: Optional[BatchManifest] = None) -> List[Dict[str, Any]]:
+        """
+        Processa vários vídeos ao mesmo tempo. O ffmpeg já roda em processos próprios,
+        então threads bastam; as chamadas à API de todos os vídeos passam pelo pool
+        compartilhado de pedaços (MAX_CONCURRENT_CHUNKS). A saída de cada vídeo é
+        prefixada com seu número para continuar legível.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        finished = 0
 
-    def batch_process_videos(self, videos_dir: str = "videos", start_modulo: int = 1) -> List[Dict[str, Any]]:
-        """Processa todos os vídeos em lote"""
+        def run(i: int, video_path: Path) -> Dict[str, Any]:
+            _LOG_PREFIX.set(f"[{i:02d}/{total:02d}] ")
+            try:
+                return self._process_batch_item(video_path, i, total, start_modulo, resume, stages, manifest)
+            except Exception as e:
+                print(f"❌ ERRO NO PROCESSAMENTO: {e}")
+                return {"status": "error", "message": str(e),
+                        "video_info": {"filename": video_path.name, "index": i}}
+
+        original_stdout = sys.stdout
+        sys.stdout = _PrefixedOutput(original_stdout)
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = {_submit(executor, run, i, video_path): position
+                           for position, (i, video_path) in enumerate(items)}
+                for future in as_completed(futures):
+                    position = futures[future]
+                    results[position] = future.result()
+                    finished += 1
+                    status = "✅" if results[position].get("status") == "success" else "❌"
+                    print(f"{status} [{finished}/{len(items)} concluídos] {items[position][1].name}")
+        finally:
+            sys.stdout = original_stdout
+
+        return results
+
+    def watch_folder(self, videos_dir: str = "videos", start_modulo: int = 1, resume: bool = False,
+                     jobs: int = 1, stages: Optional[List[str]] = None):
+        """
+        Modo contínuo: monitora a pasta (inotify ou varredura), espera cada vídeo ficar
+        estável por WATCH_STABLE_SECONDS (cópia concluída) e o coloca em uma fila limitada
+        consumida por `jobs` workers. Usa o manifesto incremental, então vídeos já
+        processados não são refeitos. Ctrl+C/SIGTERM param de aceitar vídeos e esperam
+        os que estão em andamento; um segundo sinal encerra na hora (--resume retoma).
+        """
+        os.makedirs(videos_dir, exist_ok=True)
+        manifest = BatchManifest()
+        work_queue: "queue.Queue[str]" = queue.Queue(maxsize=WATCH_QUEUE_SIZE)
+        stop = threading.Event()
+        active = set()
+        active_lock = threading.Lock()
+        report_lock = threading.Lock()
+        results: List[Dict[str, Any]] = []
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    path = work_queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+                try:
+                    if not os.path.exists(path) or manifest.status(path) == "unchanged":
+                        debug_print(f"Watch: {path} já processado e inalterado")
+                        continue
+                    videos = find_videos(videos_dir)
+                    video_path = Path(path)
+                    i = next((n for n, video in enumerate(videos, 1) if video.resolve() == video_path.resolve()),
+                             len(videos))
+                    _LOG_PREFIX.set(f"[{video_path.name}] ")
+                    result = self._process_batch_item(video_path, i, len(videos), start_modulo, resume,
+                                                      stages, manifest)
+                    results.append(result)
+                    status = "✅" if result.get("status") == "success" else "❌"
+                    _LOG_PREFIX.set("")
+                    print(f"{status} {video_path.name} → {result.get('output_dir') or result.get('message')}")
+                    # Sessão sem fim previsto: relatório e Prometheus atualizados a cada vídeo
+                    with report_lock:
+                        write_batch_report(watch_record, final=False)
+                except Exception as e:
+                    print(f"❌ ERRO NO PROCESSAMENTO: {e}")
+                finally:
+                    _LOG_PREFIX.set("")
+                    with active_lock:
+                        active.discard(path)
+                    work_queue.task_done()
+
+        def handle_signal(signum, frame):
+            if stop.is_set():
+                raise KeyboardInterrupt
+            print("\n🛑 Encerrando: aguardando os vídeos em andamento "
+                  "(sinal de novo para sair já; use --resume depois)")
+            stop.set()
+
+        watch_record = METRICS.start("watch")
+        watcher, poll_timeout = create_folder_watcher(videos_dir)
+        previous_handlers = {sig: signal.signal(sig, handle_signal) for sig in (signal.SIGINT, signal.SIGTERM)}
+        original_stdout = sys.stdout
+        sys.stdout = _PrefixedOutput(original_stdout)
+        workers = [threading.Thread(target=contextvars.copy_context().run, args=(worker,),
+                                    name=f"watch-{n}", daemon=True) for n in range(jobs)]
+        for thread in workers:
+            thread.start()
+
+        print(f"\n{'='*60}")
+        mode = "inotify" if isinstance(watcher, _InotifyWatcher) else f"varredura a cada {poll_timeout:.0f}s"
+        print(f"👀 MONITORANDO {videos_dir} ({mode}, {jobs} worker(s))")
+        print(f"{'='*60}")
+        print(f"⏳ Vídeos são processados após {WATCH_STABLE_SECONDS:.0f}s sem alterações. Ctrl+C para sair.")
+
+        # Vídeos já presentes também passam pela checagem de estabilidade e do manifesto
+        now = time.monotonic()
+        pending: Dict[str, Tuple[float, Optional[Tuple[int, float]]]] = {
+            str(video): (now, _stat_signature(str(video))) for video in find_videos(videos_dir)
+        }
+        try:
+            while not stop.is_set():
+                for path in watcher.poll(poll_timeout):
+                    if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+                        pending[path] = (time.monotonic(), _stat_signature(path))
+
+                now = time.monotonic()
+                for path, (changed_at, signature) in list(pending.items()):
+                    if stop.is_set():
+                        break
+                    current = _stat_signature(path)
+                    if current is None:
+                        del pending[path]  # Removido ou renomeado antes de estabilizar
+                    elif current != signature:
+                        pending[path] = (now, current)
+                    elif now - changed_at >= WATCH_STABLE_SECONDS:
+                        with active_lock:
+                            if path in active:
+                                continue  # Ainda em processamento; reavaliado no próximo ciclo
+                            try:
+                                work_queue.put_nowait(path)
+                            except queue.Full:
+                                continue  # Fila cheia: fica pendente até liberar espaço
+                            active.add(path)
+                        del pending[path]
+                        print(f"📥 Na fila: {os.path.basename(path)} ({work_queue.qsize()}/{WATCH_QUEUE_SIZE})")
+
+            while any(thread.is_alive() for thread in workers):
+                for thread in workers:
+                    thread.join(timeout=0.5)
+        finally:
+            watcher.close()
+            sys.stdout = original_stdout
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+
+        # Relatório da sessão de monitoramento
+        write_batch_report(watch_record)
+
+        successful = len([r for r in results if r.get("status") == "success"])
+        print(f"👋 Monitoramento encerrado: {successful} sucesso(s), {len(results) - successful} falha(s); "
+              f"{work_queue.qsize()} vídeo(s) na fila ficam para a próxima execução")
+        return results
+
+    def _plan_incremental(self, manifest: BatchManifest, videos_dir: str, items: List[Tuple[int, Path]],
+                          prune: bool, dry_run: bool) -> List[Tuple[int, Path]]:
+        """Mostra o plano do lote incremental e retorna apenas os vídeos a processar"""
+        plan = manifest.plan(videos_dir, [video_path for _, video_path in items], persist=not dry_run)
+        print(f"\n📋 Modo incremental: {len(plan['new'])} novo(s), {len(plan['changed'])} alterado(s), "
+              f"{len(plan['failed'])} com falha anterior, {len(plan['unchanged'])} sem alterações, "
+              f"{len(plan['deleted'])} removido(s)")
+
+        labels = {"new": "➕ novo", "changed": "✏️  alterado", "failed": "🔁 falhou antes"}
+        selected = []
+        for i, video_path in items:
+            key = os.path.abspath(video_path)
+            for status, label in labels.items():
+                if key in plan[status]:
+                    print(f"   {label}: {video_path.name}")
+                    selected.append((i, video_path))
+
+        for key in plan["deleted"]:
+            output_dir = manifest.videos[key].get("output_dir") or "-"
+            if not prune:
+                print(f"   🗑️  removido: {os.path.basename(key)} (saída: {output_dir}; use --prune para apagar)")
+            elif dry_run:
+                print(f"   🗑️  removido: {os.path.basename(key)} → apagaria {output_dir}")
+            else:
+                for path in manifest.prune(key):
+                    print(f"   🗑️  removido: {os.path.basename(key)} → apagado {path}")
+        return selected
+
+    def batch_process_videos(self, videos_dir: str = "videos", start_modulo: int = 1,
+                             resume: bool = False, jobs: int = 1,
+                             stages: Optional[List[str]] = None, incremental: bool = False,
+                             prune: bool = False, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """
+        Processa todos os vídeos em lote. Com incremental, usa o BatchManifest para
+        processar apenas vídeos novos, alterados ou que falharam antes; prune remove
+        as saídas de vídeos apagados e dry_run só mostra o que seria feito.
+        """
         print(f"\n{'='*60}")
         print(f"🎬 PROCESSAMENTO EM LOTE - {videos_dir}")
         print(f"{'='*60}")
         
-        # Extensões de vídeo suportadas
-        video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v']
         results = []
         
         if not os.path.exists(videos_dir):
             print(f"❌ Diretório {videos_dir} não encontrado")
             return results
             
-        # Encontrar todos os vídeos
-        video_files = []
-        for ext in video_extensions:
-            video_files.extend(Path(videos_dir).glob(f"**/*{ext}"))
+        # Encontrar todos os vídeos (ordenados por nome)
+        video_files = find_videos(videos_dir)
         
         if not video_files:
             print(f"❌ Nenhum vídeo encontrado em {videos_dir}")
             return results
-            
-        # Ordenar por nome
-        video_files = sorted(video_files)
         
         print(f"📹 Encontrados {len(video_files)} vídeos para processar")
         print("📁 Vídeos encontrados:")
         for i, video in enumerate(video_files, 1):
             print(f"   {i:2d}. {video.name}")
         
-        # Processar cada vídeo
-        for i, video_path in enumerate(video_files, 1):
-            print(f"\n{'='*60}")
-            print(f"🎬 VÍDEO {i}/{len(video_files)}: {video_path.name}")
-            print(f"{'='*60}")
-            
-            # Determinar módulo e aula
-            modulo = start_modulo
-            aula = i
-            
-            # Tentar extrair números do nome do arquivo
-            filename = video_path.stem
-            modulo_match = re.search(r'modulo[-_]?(\d+)', filename, re.IGNORECASE)
-            aula_match = re.search(r'aula[-_]?(\d+)', filename, re.IGNORECASE)
-            
-            if modulo_match:
-                modulo = int(modulo_match.group(1))
-            if aula_match:
-                aula = int(aula_match.group(1))
-            
-            print(f"📊 Processando como: Módulo {modulo}, Aula {aula}")
-            
-            result = self.process_video_complete(str(video_path), modulo, aula)
-            result['video_info'] = {
-                'filename': video_path.name,
-                'modulo': modulo,
-                'aula': aula,
-                'index': i
-            }
-            results.append(result)
-            
-            # Pequena pausa entre processamentos
-            if i < len(video_files):
-                print("⏳ Aguardando 3 segundos...")
-                time.sleep(3)
+        # O número da aula vem da posição no lote completo, mesmo pulando vídeos
+        total = len(video_files)
+        items = list(enumerate(video_files, 1))
+        manifest = None
+        if incremental:
+            manifest = BatchManifest()
+            items = self._plan_incremental(manifest, videos_dir, items, prune, dry_run)
+        print_batch_estimate([video_path for _, video_path in items])
+        if dry_run:
+            print("🔎 Dry run: nenhum vídeo foi processado")
+            return results
+        if not items:
+            print("✅ Nada a fazer: todos os vídeos já foram processados")
+            return results
+
+        with batch_metrics("batch"):
+            # Processar cada vídeo
+            if jobs > 1:
+                print(f"⚡ Processando {min(jobs, len(items))} vídeos em paralelo")
+                results = self._batch_process_parallel(items, total, start_modulo, resume, jobs, stages, manifest)
+            else:
+                for position, (i, video_path) in enumerate(items, 1):
+                    results.append(self._process_batch_item(video_path, i, total, start_modulo, resume,
+                                                            stages, manifest))
+
+                    # Pequena pausa entre processamentos
+                    if position < len(items) and BATCH_PAUSE_SECONDS > 0:
+                        print(f"⏳ Aguardando {BATCH_PAUSE_SECONDS} segundos...")
+                        time.sleep(BATCH_PAUSE_SECONDS)
         
         # Relatório final
         print(f"\n{'='*60}")
@@ -932,6 +4624,20 @@ Seja detalhado na análise e precise nas informações extraídas."""
         
         print(f"✅ Sucessos: {len(successful)}")
         print(f"❌ Falhas: {len(failed)}")
+        if TRANSCRIPTION_CACHE.enabled:
+            print(f"♻️  Cache de transcrições: {TRANSCRIPTION_CACHE.summary()}")
+        if ANALYSIS_CACHE.enabled and (ANALYSIS_CACHE.hits or ANALYSIS_CACHE.misses):
+            print(f"♻️  Cache de análises: {ANALYSIS_CACHE.summary()} | "
+                  f"{self.analysis_tokens_saved:,} tokens economizados")
+        
+        deduplicated = [r for r in successful if r.get("deduplicated")]
+        if deduplicated:
+            saved_seconds = sum(r["deduplicated"]["audio_seconds"] for r in deduplicated)
+            print(f"♻️  Duplicatas reaproveitadas: {len(deduplicated)} | "
+                  f"{saved_seconds / 60:.1f} min de áudio sem transcrever")
+            for result in deduplicated:
+                info = result.get('video_info', {})
+                print(f"   • {info.get('filename', 'N/A')} = {os.path.basename(result['deduplicated']['original'])}")
         
         if successful:
             print(f"\n📁 Aulas criadas com sucesso:")
@@ -949,16 +4655,54 @@ Seja detalhado na análise e precise nas informações extraídas."""
 
 # --- FUNÇÃO PRINCIPAL ---
 
+def _pop_flag(args: List[str], flag: str) -> bool:
+    """Remove uma flag booleana da lista de argumentos, retornando se estava presente"""
+    if flag in args:
+        args.remove(flag)
+        return True
+    return False
+
+def _pop_option(args: List[str], name: str, default: Optional[str] = None) -> Optional[str]:
+    """Remove uma opção com valor (--nome valor ou --nome=valor) da lista de argumentos"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(f"{name}="):
+            del args[i]
+            return arg.split("=", 1)[1]
+    return default
+
 def main():
     """Função principal com compatibilidade total"""
-    
+
+    # Opções que valem para qualquer modo
+    args = sys.argv[1:]
+    resume = _pop_flag(args, "--resume")
+    jobs = max(1, int(_pop_option(args, "--jobs", "1")))
+    if _pop_flag(args, "--no-cache"):
+        # Ignora resultados guardados (transcrições, análises e duplicatas); os novos substituem os antigos
+        TRANSCRIPTION_CACHE.bypass = True
+        ANALYSIS_CACHE.bypass = True
+        MEDIA_CACHE.bypass = True
+        FINGERPRINT_INDEX.bypass = True
+    prune = _pop_flag(args, "--prune")
+    dry_run = _pop_flag(args, "--dry-run")
+    incremental = _pop_flag(args, "--incremental") or prune or dry_run
+    stages = select_stages(_pop_option(args, "--only"), _pop_option(args, "--from"))
+    if stages == []:
+        sys.exit(1)
+
     # Verificar se é chamada no modo original (transcribe.py compatibility)
-    if len(sys.argv) == 2 and not sys.argv[1].startswith('--'):
+    if len(args) == 1 and not args[0].startswith('--'):
         # Modo compatibilidade com transcribe.py original
-        video_file = sys.argv[1]
+        video_file = args[0]
         if os.path.exists(video_file):
             print("🔄 Modo compatibilidade - usando função original")
-            result = transcribe_video_original(video_file)
+            with video_metrics(video_file) as video_record:
+                result = transcribe_video_original(video_file, resume=resume)
+                video_record["audio_seconds"] = result["duration"] if result else 0
             if result:
                 sys.exit(0)
             else:
@@ -968,7 +4712,7 @@ def main():
             sys.exit(1)
     
     # Modo enhanced
-    if len(sys.argv) < 2:
+    if len(args) < 1 or args[0] in ("--help", "-h"):
         print("""
 🤖 Sistema Avançado de Transcrição e Análise de Vídeos Educacionais
 
@@ -983,14 +4727,50 @@ MODOS DE USO:
 3. MODO LOTE (processar pasta inteira):
    python transcribe.py --batch [pasta_videos] [modulo_inicial]
 
+4. MODO CONTÍNUO (monitora a pasta e processa cada vídeo novo):
+   python transcribe.py --watch [pasta_videos] [modulo_inicial]
+
+5. BUSCA NAS AULAS (índice das transcrições em modulo-XX/aula-*):
+   python transcribe.py --index [pasta_aulas]
+   python transcribe.py --search "consulta" [--limit N]
+
+6. CONSULTA POR TEMPO (o que foi dito em um instante ou intervalo de uma aula):
+   python transcribe.py --query <pasta_aula|transcricao> <tempo> [fim] [--json]
+
+OPÇÕES:
+   --resume        - Retoma do checkpoint, refazendo apenas pedaços ausentes ou com falha
+   --jobs N        - Nos modos lote e contínuo, processa N vídeos em paralelo
+   --no-cache      - Ignora transcrições, análises, metadados em cache e duplicatas (refaz as chamadas às APIs)
+   --only ETAPAS   - Refaz só as etapas indicadas (separadas por vírgula), lendo as anteriores do disco
+   --from ETAPA    - Refaz a partir da etapa indicada
+                     Etapas: extract, transcribe, merge, analyse, render
+                     Sem essas opções, cada etapa é pulada se suas entradas não mudaram
+   --incremental   - No modo lote, processa só vídeos novos, alterados ou que falharam antes
+   --prune         - Com --incremental, apaga as saídas de vídeos removidos da pasta
+   --dry-run       - Com --incremental, apenas mostra o que seria feito
+
 EXEMPLOS:
    python transcribe.py videos/aula01.mp4              # Modo legado
    python transcribe.py --complete videos/aula01.mp4 1 1    # Modo completo
    python transcribe.py --batch videos 1                     # Lote
    python transcribe.py --batch                              # Lote pasta padrão
+   python transcribe.py --batch videos 1 --jobs 4            # Lote com 4 vídeos em paralelo
+   python transcribe.py --complete videos/aula01.mp4 1 1 --resume  # Retomar
+   python transcribe.py --complete videos/aula01.mp4 1 1 --no-cache  # Sem cache
+   python transcribe.py --batch videos 1 --only render       # Regerar só os READMEs
+   python transcribe.py --batch videos 1 --from analyse      # Reanalisar e regerar
+   python transcribe.py --batch videos 1 --incremental       # Só vídeos novos/alterados
+   python transcribe.py --batch videos 1 --incremental --dry-run  # Ver o plano
+   python transcribe.py --watch videos 1 --jobs 2            # Monitorar a pasta
+   python transcribe.py --index                              # Indexar aulas novas/alteradas
+   python transcribe.py --search 'docker swarm'              # Aulas com os dois termos
+   python transcribe.py --search '"docker swarm"'            # Frase exata
+   python transcribe.py --query modulo-01/aula-01-intro 12:30 14:00  # Trecho da aula
+   python transcribe.py --query modulo-01/aula-01-intro 12:30 --json  # Dito aos 12:30, em JSON
 
 VARIÁVEIS DE AMBIENTE:
-   GROQ_API_KEY    - Obrigatória para transcrição
+   GROQ_API_KEY    - Obrigatória para transcrição (exceto com TRANSCRIBE_BACKEND=local)
+   TRANSCRIBE_BACKEND - groq (padrão) ou local (faster-whisper na CPU)
    GEMINI_API_KEY  - Opcional para análise inteligente
    
 ESTRUTURA DE ARQUIVOS:
@@ -998,42 +4778,82 @@ ESTRUTURA DE ARQUIVOS:
    modulo-XX/      - Aulas organizadas serão criadas aqui
    temp/           - Arquivos temporários
         """)
-        sys.exit(1)
+        sys.exit(0 if args else 1)
+
+    # Busca, indexação e consultas não precisam das APIs
+    if args[0] == "--index":
+        root = args[1] if len(args) > 1 else "."
+        started = time.perf_counter()
+        counts = SEARCH_INDEX.sync(root)
+        print(f"🔎 Índice de busca atualizado em {time.perf_counter() - started:.1f}s: "
+              f"{counts['added']} nova(s), {counts['updated']} alterada(s), {counts['removed']} removida(s), "
+              f"{counts['unchanged']} sem mudança ({SEARCH_INDEX_PATH})")
+        sys.exit(0)
+    if args[0] == "--search":
+        limit = int(_pop_option(args, "--limit", "10"))
+        if len(args) < 2:
+            print("❌ Informe a consulta: --search \"termos\"")
+            sys.exit(1)
+        print_search_results(" ".join(args[1:]), limit)
+        sys.exit(0)
+    if args[0] == "--query":
+        as_json = _pop_flag(args, "--json")
+        if len(args) not in (3, 4):
+            print("❌ Uso: --query <pasta_aula|transcricao> <tempo> [fim] (ex.: 12:30 14:00)")
+            sys.exit(1)
+        try:
+            times = [parse_timestamp(value) for value in args[2:]]
+            if len(times) == 2 and times[1] <= times[0]:
+                raise ValueError("O fim do intervalo deve ser depois do início")
+            reader = TranscriptReader(args[1])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print_transcript_query(reader, *times, as_json=as_json)
+        sys.exit(0)
     
     try:
         system = EnhancedTranscriptionSystem()
         
-        command = sys.argv[1]
+        command = args[0]
         
         if command == "--batch":
             # Processamento em lote
-            videos_dir = sys.argv[2] if len(sys.argv) > 2 else "videos"
-            start_modulo = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+            videos_dir = args[1] if len(args) > 1 else "videos"
+            start_modulo = int(args[2]) if len(args) > 2 else 1
             
-            results = system.batch_process_videos(videos_dir, start_modulo)
+            results = system.batch_process_videos(videos_dir, start_modulo, resume=resume, jobs=jobs, stages=stages,
+                                                  incremental=incremental, prune=prune, dry_run=dry_run)
             
-            # Determinar código de saída
+            # Determinar código de saída (no incremental, "nada a fazer" também é sucesso)
             successful = len([r for r in results if r.get("status") == "success"])
-            if successful > 0:
+            if successful > 0 or (incremental and not results and os.path.isdir(videos_dir)):
                 sys.exit(0)
             else:
                 sys.exit(1)
                 
+        elif command == "--watch":
+            # Monitoramento contínuo da pasta
+            videos_dir = args[1] if len(args) > 1 else VIDEOS_DIR
+            start_modulo = int(args[2]) if len(args) > 2 else 1
+            system.watch_folder(videos_dir, start_modulo, resume=resume, jobs=jobs, stages=stages)
+            sys.exit(0)
+                
         elif command == "--complete":
             # Processamento completo individual
-            if len(sys.argv) < 3:
+            if len(args) < 2:
                 print("❌ Modo completo requer pelo menos o caminho do vídeo")
                 sys.exit(1)
                 
-            video_path = sys.argv[2]
-            modulo = int(sys.argv[3]) if len(sys.argv) > 3 else 1
-            aula = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+            video_path = args[1]
+            modulo = int(args[2]) if len(args) > 2 else 1
+            aula = int(args[3]) if len(args) > 3 else 1
             
             if not os.path.exists(video_path):
                 print(f"❌ Arquivo não encontrado: {video_path}")
                 sys.exit(1)
                 
-            result = system.process_video_complete(video_path, modulo, aula)
+            result = system.process_video_complete(video_path, modulo, aula, resume=resume, stages=stages)
             
             if result.get("status") == "success":
                 sys.exit(0)